@@ -7,6 +7,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'UnScraper_Django.settings')
 
 application = get_asgi_application()
 
+# Launch the shared browser pool with the app instead of on the first scrape
+from scraper_app.browser_pool import prewarm_browser_pool  # noqa: E402
+prewarm_browser_pool()
+
 urlpatterns = [
     path('', scrape_website),
 ]
\ No newline at end of file
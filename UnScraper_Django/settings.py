@@ -59,6 +59,10 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 USE_X_FORWARDED_HOST = True
 USE_X_FORWARDED_PORT = True
 
+# Reverse proxies (addresses or networks, comma separated) whose X-Forwarded-For is believed
+# when identifying clients; without them clients are told apart by REMOTE_ADDR alone
+TRUSTED_PROXIES = [proxy.strip() for proxy in os.environ.get('TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+
 
 # Application definition
 
@@ -168,3 +172,157 @@ if not DEBUG:
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Scraper runtime
+# Directory for scraper state that should survive restarts (caches, learned site hints, ...)
+SCRAPER_STATE_DIR = os.environ.get('SCRAPER_STATE_DIR', os.path.join(BASE_DIR, 'scraper_state'))
+
+# Long-lived Chromium browsers shared by all scrape requests of a worker process.
+# Set BROWSER_POOL_SLOT_DIR and BROWSER_POOL_GLOBAL_MAX to cap browsers across all workers
+# on a node, or BROWSER_POOL_WS_ENDPOINTS (comma separated) to use shared Playwright servers.
+BROWSER_POOL = {
+    'MAX_BROWSERS': int(os.environ.get('BROWSER_POOL_MAX_BROWSERS', 2)),
+    'MAX_CONTEXTS_PER_BROWSER': int(os.environ.get('BROWSER_POOL_MAX_CONTEXTS', 4)),
+    'MAX_PAGES_PER_BROWSER': int(os.environ.get('BROWSER_POOL_MAX_PAGES', 100)),
+    'MAX_BROWSER_MEMORY_MB': int(os.environ.get('BROWSER_POOL_MAX_MEMORY_MB', 1024)),
+    'ACQUIRE_TIMEOUT': 60,
+    'PREWARM': os.environ.get('BROWSER_POOL_PREWARM', 'true').lower() == 'true',
+    'SLOT_DIR': os.environ.get('BROWSER_POOL_SLOT_DIR'),
+    'GLOBAL_MAX_BROWSERS': int(os.environ['BROWSER_POOL_GLOBAL_MAX']) if os.environ.get('BROWSER_POOL_GLOBAL_MAX') else None,
+    'WS_ENDPOINTS': [endpoint for endpoint in os.environ.get('BROWSER_POOL_WS_ENDPOINTS', '').split(',') if endpoint],
+}
+
+# Lazy-load scrolling: stop once the page stops growing or the per-page budget is spent
+SCRAPER_SCROLL = {
+    'TIME_BUDGET': float(os.environ.get('SCRAPER_SCROLL_BUDGET', 8.0)),
+    'MAX_ROUNDS': 60,
+    'QUIET_MS': 150,
+    'MAX_ROUND_WAIT_MS': 1500,
+    'STABLE_ROUNDS': 2,
+}
+
+# LLM extraction: process-wide concurrency and per-API-key quotas (match your Groq plan);
+# OUTPUT_MODE 'stream' parses listings as they are generated, 'json' uses Groq JSON mode
+LLM = {
+    'MAX_CONCURRENCY': int(os.environ.get('LLM_MAX_CONCURRENCY', 8)),
+    'REQUESTS_PER_MINUTE': int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 30)),
+    'TOKENS_PER_MINUTE': int(os.environ.get('LLM_TOKENS_PER_MINUTE', 15000)),
+    'COMPLETION_TOKENS': 2048,
+    'OUTPUT_MODE': os.environ.get('LLM_OUTPUT_MODE', 'stream'),
+}
+
+# Model routing: latency/error telemetry window, circuit breakers and 429 backoff per model
+LLM_ROUTER = {
+    'WINDOW': 50,
+    'FAILURE_THRESHOLD': 3,
+    'ERROR_RATE_THRESHOLD': 0.5,
+    'COOLDOWN': float(os.environ.get('LLM_ROUTER_COOLDOWN', 30.0)),
+    'MAX_WAIT': float(os.environ.get('LLM_ROUTER_MAX_WAIT', 60.0)),
+    # The synchronous process_chunk blocks a request thread, so it fails with the retry-after sooner
+    'MAX_SYNC_WAIT': float(os.environ.get('LLM_ROUTER_MAX_SYNC_WAIT', 10.0)),
+}
+
+# Cache of LLM extraction results (in-memory LRU in front of the database)
+LLM_CACHE = {
+    'ENABLED': os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true',
+    'TTL': int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600)),
+    'MEMORY_ENTRIES': 512,
+    'MAX_DB_ENTRIES': 20000,
+    'MAX_DB_BYTES': 200 * 1024 * 1024,
+}
+
+# Compressed snapshots of rendered pages, so retries with different fields skip the browser
+SNAPSHOT_CACHE = {
+    'ENABLED': os.environ.get('SNAPSHOT_CACHE_ENABLED', 'true').lower() == 'true',
+    'TTL': int(os.environ.get('SNAPSHOT_CACHE_TTL', 15 * 60)),
+    'MAX_AGE': 24 * 3600,
+    'MAX_BYTES': int(os.environ.get('SNAPSHOT_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+}
+
+# Chunking of page text for extraction, sized in estimated tokens for the target models
+CHUNKING = {
+    'MAX_CHUNK_TOKENS': int(os.environ.get('CHUNKING_MAX_CHUNK_TOKENS', 6000)),
+    'OVERLAP_TOKENS': int(os.environ.get('CHUNKING_OVERLAP_TOKENS', 150)),
+    'PROMPT_RESERVE_TOKENS': 400,
+}
+
+# HTML cleaning runs on a process pool; PARSER 'lxml' is faster, 'html.parser' needs no lxml
+CLEANING = {
+    'PARSER': os.environ.get('CLEANING_PARSER', 'lxml'),
+    'PROCESS_WORKERS': int(os.environ.get('CLEANING_PROCESS_WORKERS', max(1, (os.cpu_count() or 2) // 2))),
+}
+
+# Listing grids (repeated sibling subtrees) are sent to the LLM as one compact line per record
+RECORDS = {
+    'ENABLED': os.environ.get('RECORDS_ENABLED', 'true').lower() == 'true',
+    'MIN_RECORDS': 3,
+    'MIN_COVERAGE': 0.15,
+    'MAX_RECORD_CHARS': 3000,
+}
+
+# CSS extraction rules learned per host and field set from LLM output, checked against the LLM now and then
+EXTRACTION_RULES = {
+    'ENABLED': os.environ.get('EXTRACTION_RULES_ENABLED', 'true').lower() == 'true',
+    'MIN_AGREEMENT': 0.9,
+    'VALIDATE_EVERY': int(os.environ.get('EXTRACTION_RULES_VALIDATE_EVERY', 5)),
+    'VALIDATE_RECORDS': 5,
+}
+
+# Prometheus-format pipeline metrics at /metrics, for staff users and holders of METRICS_TOKEN (as a bearer token)
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', 'true').lower() == 'true',
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+}
+
+# Staff users (or holders of PROFILING_TOKEN) can profile a scrape, upload or download with ?profile=1
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true',
+    'TOKEN': os.environ.get('PROFILING_TOKEN', ''),
+    'MAX_PROFILES': int(os.environ.get('PROFILING_MAX_PROFILES', 50)),
+}
+
+# Pages rendered ahead of extraction before the browser waits for the LLM to catch up
+PIPELINE = {
+    'PAGES_IN_FLIGHT': int(os.environ.get('PIPELINE_PAGES_IN_FLIGHT', 3)),
+}
+
+# Durable scrape job queue drained by `manage.py scrape_worker` processes
+SCRAPE_JOBS = {
+    'LEASE_SECONDS': int(os.environ.get('SCRAPE_JOBS_LEASE_SECONDS', 60)),
+    'HEARTBEAT_SECONDS': int(os.environ.get('SCRAPE_JOBS_HEARTBEAT_SECONDS', 15)),
+    'MAX_ATTEMPTS': int(os.environ.get('SCRAPE_JOBS_MAX_ATTEMPTS', 3)),
+    'JOB_TIMEOUT': int(os.environ.get('SCRAPE_JOBS_TIMEOUT', 15 * 60)),
+    'POLL_INTERVAL': 2.0,
+    'CONCURRENCY': int(os.environ.get('SCRAPE_JOBS_CONCURRENCY', 2)),
+    # Politeness towards scraped sites, enforced across all workers
+    'HOST_CONCURRENCY': int(os.environ.get('SCRAPE_JOBS_HOST_CONCURRENCY', 2)),
+    'HOST_DELAY': float(os.environ.get('SCRAPE_JOBS_HOST_DELAY', 2.0)),
+    'MAX_BATCH_SIZE': 500,
+    # Without it, API callers must send their own groq_api_key or be logged in
+    'SERVER_KEY_FALLBACK': os.environ.get('SCRAPE_JOBS_SERVER_KEY_FALLBACK', 'false').lower() == 'true',
+}
+
+# Result downloads are streamed in batches; Parquet and Arrow exports need pyarrow (requirements-optional.txt)
+EXPORTS = {
+    'BATCH_ROWS': int(os.environ.get('EXPORTS_BATCH_ROWS', 1000)),
+    'GZIP': os.environ.get('EXPORTS_GZIP', 'true').lower() == 'true',
+}
+
+# Scraped rows are stored server-side and served by result ID (see scraper_app/results.py)
+RESULTS = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+    'MAX_AGE_DAYS': int(os.environ.get('RESULTS_MAX_AGE_DAYS', 30)),
+}
+
+# Uploaded files are read in chunks and downcast; above MEMORY_LIMIT_MB they are sampled
+VISUALIZATION = {
+    'CHUNK_ROWS': 100_000,
+    'MEMORY_LIMIT_MB': int(os.environ.get('VISUALIZATION_MEMORY_LIMIT_MB', 256)),
+    'CATEGORY_RATIO': 0.5,
+    # Dashboards embed their data, so bigger frames are downsampled; generated pages are cached
+    'MAX_ROWS': int(os.environ.get('VISUALIZATION_MAX_ROWS', 50_000)),
+    'STRATIFY_MAX_GROUPS': 50,
+    'CACHE_ENTRIES': 32,
+    'CACHE_MB': int(os.environ.get('VISUALIZATION_CACHE_MB', 256)),
+}
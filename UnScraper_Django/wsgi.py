@@ -15,4 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'UnScraper_Django.settings')
 
 application = get_wsgi_application()
 
+# Launch the shared browser pool with the app instead of on the first scrape
+from scraper_app.browser_pool import prewarm_browser_pool  # noqa: E402
+prewarm_browser_pool()
+
 app = application
\ No newline at end of file
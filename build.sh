@@ -3,6 +3,8 @@ set -o errexit
 
 # Install Python dependencies
 pip install -r requirements.txt
+# Optional extras; the build goes on without them
+pip install -r requirements-optional.txt || echo "Optional dependencies not installed"
 
 # Install only Chromium browser
 playwright install chromium
@@ -1,3 +1,22 @@
 from django.contrib import admin
 
+from .models import ScrapeJob, ScrapeResult
+
 # Register your models here.
+
+
+@admin.register(ScrapeJob)
+class ScrapeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'url', 'status', 'attempts', 'pages_done', 'row_count', 'worker', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('url', 'user')
+    exclude = ('api_key',)
+    readonly_fields = ('result',)
+
+
+@admin.register(ScrapeResult)
+class ScrapeResultAdmin(admin.ModelAdmin):
+    list_display = ('id', 'url', 'row_count', 'job', 'user', 'created_at')
+    search_fields = ('url', 'user')
+    raw_id_fields = ('job',)
+    readonly_fields = ('columns',)
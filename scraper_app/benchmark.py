@@ -0,0 +1,416 @@
+# scraper_app/benchmark.py
+import json
+import logging
+import random
+import re
+import resource
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .metrics import get_metrics
+
+try:
+    import psutil
+except ImportError:  # Peak RSS falls back to the process's lifetime maximum
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAKE_LLM_SETTINGS = {
+    'LATENCY': 0.2,             # Seconds before the first token
+    'TOKENS_PER_SECOND': 400,   # Generation speed once the completion starts
+    'RATE_LIMIT_RATE': 0.0,     # Share of calls answered with a 429
+    'MALFORMED_RATE': 0.0,      # Share of completions cut off mid-JSON or wrapped in prose
+    'RETRY_AFTER': 1,           # Seconds announced in the retry-after header of a 429
+    'SEED': 0,
+}
+
+# Fixture sites: path, pages to request, and how the listings arrive
+FIXTURE_SITES = {
+    'static': {'path': '/static/', 'pages': 1, 'items': 48},
+    'lazy': {'path': '/lazy/', 'pages': 1, 'items': 48},
+    'paginated': {'path': '/paginated/', 'pages': 3, 'items': 16},
+    'infinite': {'path': '/infinite/', 'pages': 1, 'items': 60},
+}
+
+BATCH_SIZE = 12
+
+BENCHMARK_FIELDS = ['name', 'price']
+
+# Listings as the fixture sites render them, in a card or flattened to text
+LISTING_PATTERN = re.compile(r'(Benchmark item \d+)[^$]{0,300}?\$(\d[\d,]*\.\d{2})')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{title}</title>
+<style>.grid {{ display: grid; grid-template-columns: repeat(4, 1fr); }} .card {{ height: 320px; }}</style>
+</head><body>
+<header><nav><a href="/">Home</a> <a href="/deals">Deals</a> <a href="/help">Help</a></nav></header>
+<main><h1>{title}</h1><div class="grid" id="grid">{cards}</div>{pager}</main>
+<footer><p>Benchmark fixture shop. Prices include VAT. Free returns within 30 days.</p></footer>
+{script}
+</body></html>"""
+
+# Appends a batch of cards whenever the bottom of the grid scrolls into view
+SCROLL_LOADER = """<script>
+let loaded = {loaded}, loading = false;
+window.addEventListener('scroll', async () => {{
+  if (loading || loaded >= {total}) return;
+  if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+  loading = true;
+  {load}
+  loaded += {batch};
+  loading = false;
+}});
+</script>"""
+
+LAZY_LOAD = "await new Promise(r => setTimeout(r, 150)); document.getElementById('grid').insertAdjacentHTML('beforeend', CARDS[loaded / {batch}]);"
+INFINITE_LOAD = "const response = await fetch('/infinite/items?offset=' + loaded); document.getElementById('grid').insertAdjacentHTML('beforeend', await response.text());"
+
+
+def listing_price(index: int) -> str:
+    """Deterministic price of a fixture listing, with thousands separators now and then"""
+    if index % 7 == 0:
+        return f'{(index * 137) % 3000 + 1000:,}.99'
+    return f'{(index * 37) % 500 + 9}.99'
+
+
+def fixture_card(index: int) -> str:
+    colour = ('black', 'white', 'red', 'blue')[index % 4]
+    return (
+        f'<div class="card"><h3 class="title">Benchmark item {index}</h3>'
+        f'<span class="price">${listing_price(index)}</span>'
+        f'<p class="desc">Colour {colour}, size {38 + index % 8}. Ships in {1 + index % 5} days.</p>'
+        f'<a href="/item/{index}">Details</a></div>'
+    )
+
+
+def fixture_page(site: str, page: int = 1) -> str:
+    """Render a page of a fixture site"""
+    options = FIXTURE_SITES[site]
+    script = pager = ''
+    if site == 'static':
+        cards = ''.join(fixture_card(index) for index in range(options['items']))
+    elif site == 'paginated':
+        first = (page - 1) * options['items']
+        cards = ''.join(fixture_card(index) for index in range(first, first + options['items']))
+        if page < options['pages']:
+            pager = f'<nav class="pagination"><a rel="next" href="/paginated/?page={page + 1}">Next</a></nav>'
+    else:
+        cards = ''.join(fixture_card(index) for index in range(BATCH_SIZE))
+        if site == 'lazy':
+            batches = [''.join(fixture_card(index) for index in range(start, start + BATCH_SIZE))
+                       for start in range(0, options['items'], BATCH_SIZE)]
+            load = f'<script>const CARDS = {json.dumps(batches)};</script>'
+            script = load + SCROLL_LOADER.format(
+                loaded=BATCH_SIZE, total=options['items'], batch=BATCH_SIZE, load=LAZY_LOAD.format(batch=BATCH_SIZE)
+            )
+        else:
+            script = SCROLL_LOADER.format(
+                loaded=BATCH_SIZE, total=options['items'], batch=BATCH_SIZE, load=INFINITE_LOAD
+            )
+    return PAGE_TEMPLATE.format(title=f'Benchmark {site} shop', cards=cards, pager=pager, script=script)
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _FixtureHandler(_QuietHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/infinite/items':
+            # A slow API keeps requests pending, like a real infinite scroll
+            time.sleep(0.1)
+            offset = int(query.get('offset', ['0'])[0])
+            body = ''.join(fixture_card(index) for index in range(offset, offset + BATCH_SIZE))
+            return self.send_body(200, body.encode(), 'text/html; charset=utf-8')
+        for site, options in FIXTURE_SITES.items():
+            if url.path == options['path']:
+                page = int(query.get('page', ['1'])[0])
+                return self.send_body(200, fixture_page(site, page).encode(), 'text/html; charset=utf-8')
+        self.send_body(404, b'Not found', 'text/plain')
+
+
+class _FakeLLMHandler(_QuietHandler):
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            return self.send_body(404, b'{"error": {"message": "Not found"}}', 'application/json')
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.owner.respond(self, request)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _Background:
+    """An HTTP server on a localhost port (a free one by default), served from a daemon thread"""
+    handler = None
+
+    def __init__(self, port: int = 0):
+        self.port = port
+
+    def start(self) -> str:
+        self._server = _Server(('127.0.0.1', self.port), self.handler)
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FixtureSites(_Background):
+    """Serves the fixture sites (static, lazy-loaded, paginated, infinite scroll) locally"""
+    handler = _FixtureHandler
+
+    def site_url(self, site: str) -> str:
+        return self.url + FIXTURE_SITES[site]['path']
+
+
+class FakeLLMServer(_Background):
+    """
+    A local Groq/OpenAI-compatible chat completions endpoint.
+
+    It "extracts" the fixture listings it finds in the prompt, after a
+    configurable latency and at a configurable generation speed, streaming
+    like Groq (usage in x_groq of the last part) or answering in one piece.
+    A share of calls can be answered with 429s or with malformed output.
+    Point a Groq client at it with GROQ_BASE_URL.
+    """
+    handler = _FakeLLMHandler
+
+    def __init__(self, port: int = 0, **options):
+        super().__init__(port)
+        self.options = {**DEFAULT_FAKE_LLM_SETTINGS, **options}
+        self._random = random.Random(self.options['SEED'])
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {'ok': 0, 'rate_limited': 0, 'malformed': 0}
+
+    def _draw(self) -> str:
+        with self._lock:
+            draw = self._random.random()
+            if draw < self.options['RATE_LIMIT_RATE']:
+                outcome = 'rate_limited'
+            elif draw < self.options['RATE_LIMIT_RATE'] + self.options['MALFORMED_RATE']:
+                outcome = 'malformed'
+            else:
+                outcome = 'ok'
+            self.calls[outcome] += 1
+            return outcome
+
+    def reset(self):
+        with self._lock:
+            self.calls = dict.fromkeys(self.calls, 0)
+
+    def completion(self, request: dict, outcome: str) -> str:
+        prompt = next((message['content'] for message in reversed(request.get('messages', []))
+                       if message.get('role') == 'user'), '')
+        listings = [{'name': name, 'price': price} for name, price in LISTING_PATTERN.findall(prompt)]
+        text = json.dumps({'listings': listings}, indent=1)
+        if outcome == 'malformed':
+            # Cut off mid-listing half the time, the rest wrapped in prose with a trailing comma
+            if self._random.random() < 0.5:
+                return text[:len(text) * 2 // 3]
+            return f'Here are the listings:\n```json\n{{"listings": {json.dumps(listings)[:-1]},]}}\n```'
+        return text
+
+    def respond(self, handler: _FakeLLMHandler, request: dict):
+        outcome = self._draw()
+        time.sleep(self.options['LATENCY'])
+        if outcome == 'rate_limited':
+            body = json.dumps({'error': {
+                'message': 'Rate limit reached for model. Please try again later.',
+                'type': 'tokens', 'code': 'rate_limit_exceeded',
+            }}).encode()
+            return handler.send_body(429, body, 'application/json', {'retry-after': str(self.options['RETRY_AFTER'])})
+
+        text = self.completion(request, outcome)
+        prompt_tokens = sum(len(message.get('content') or '') for message in request.get('messages', [])) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text) // 4 + 1,
+                 'total_tokens': prompt_tokens + len(text) // 4 + 1}
+        generation_time = (len(text) / 4) / self.options['TOKENS_PER_SECOND']
+        base = {'id': f'chatcmpl-{uuid.uuid4().hex}', 'created': int(time.time()), 'model': request.get('model')}
+
+        if not request.get('stream'):
+            time.sleep(generation_time)
+            body = json.dumps({**base, 'object': 'chat.completion', 'usage': usage, 'choices': [
+                {'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}
+            ]}).encode()
+            return handler.send_body(200, body, 'application/json')
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        handler.close_connection = True
+        parts = [text[start:start + 64] for start in range(0, len(text), 64)]
+        for part in parts:
+            time.sleep(generation_time / len(parts))
+            chunk = {**base, 'object': 'chat.completion.chunk',
+                     'choices': [{'index': 0, 'delta': {'content': part}, 'finish_reason': None}]}
+            handler.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+        last = {**base, 'object': 'chat.completion.chunk', 'x_groq': {'usage': usage},
+                'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+        handler.wfile.write(f'data: {json.dumps(last)}\n\ndata: [DONE]\n\n'.encode())
+        handler.wfile.flush()
+
+
+class PeakMemory:
+    """Sample the RSS of this process and its children (the browsers) while a benchmark runs"""
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if psutil is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, self._rss())
+        else:
+            # Kilobytes on Linux; the maximum over the process's lifetime, not just this benchmark
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def _histogram_delta(name: str, before: Dict[tuple, tuple], label: str) -> Dict[str, dict]:
+    """Seconds and counts a histogram gained since before, by one of its labels"""
+    delta = {}
+    for labels, (total, count) in get_metrics().totals(name).items():
+        previous_total, previous_count = before.get(labels, (0.0, 0))
+        if count == previous_count:
+            continue
+        key = dict(labels)[label]
+        entry = delta.setdefault(key, {'seconds': 0.0, 'count': 0})
+        entry['seconds'] = round(entry['seconds'] + total - previous_total, 4)
+        entry['count'] += count - previous_count
+    return delta
+
+
+def measure(name: str, target: Callable[[], Optional[int]], llm: FakeLLMServer = None, repeat: int = 1,
+            **details) -> dict:
+    """
+    Run a benchmark target repeat times and collect what it cost.
+
+    Args:
+        target: runs the code under test once and returns the rows it extracted, if that applies
+        llm: the fake LLM server whose calls are counted
+
+    Returns:
+        dict: median and per-run wall time, per-stage and per-model LLM time (totals over all
+        runs), peak RSS, LLM calls by outcome, rows of the last run, and the error if a run failed
+    """
+    metrics = get_metrics()
+    stages_before = metrics.totals('unscraper_stage_seconds')
+    calls_before = metrics.totals('unscraper_llm_call_seconds')
+    if llm is not None:
+        llm.reset()
+
+    walls, rows, error = [], None, None
+    with PeakMemory() as memory:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            try:
+                rows = target()
+            except Exception as e:
+                logger.error(f"Benchmark {name} failed: {e}", exc_info=True)
+                error = f'{type(e).__name__}: {e}'
+                break
+            walls.append(round(time.perf_counter() - started, 4))
+
+    return {
+        'name': name,
+        **details,
+        'runs': len(walls),
+        'wall_seconds': round(statistics.median(walls), 4) if walls else None,
+        'wall_seconds_runs': walls,
+        'stages': _histogram_delta('unscraper_stage_seconds', stages_before, 'stage'),
+        'llm_time': _histogram_delta('unscraper_llm_call_seconds', calls_before, 'model'),
+        'llm_calls': dict(llm.calls) if llm is not None else {},
+        'peak_rss_mb': memory.peak_mb,
+        'rows': rows,
+        'error': error,
+    }
+
+
+def git_commit(path: str) -> str:
+    """Short hash of the commit checked out at path, so results can be told apart"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict) -> List[str]:
+    """Lines comparing the median wall time of every benchmark with a baseline result file"""
+    previous = {benchmark['name']: benchmark for benchmark in baseline.get('benchmarks', [])}
+    lines = [f"{'benchmark':<36} {'wall (s)':>10} {'baseline':>10} {'change':>8}"]
+    for benchmark in results['benchmarks']:
+        wall = benchmark['wall_seconds']
+        before = previous.get(benchmark['name'], {}).get('wall_seconds')
+        change = f'{(wall - before) / before:+.0%}' if wall is not None and before else '-'
+        lines.append(
+            f"{benchmark['name']:<36} {wall if wall is not None else 'failed':>10} "
+            f"{before if before is not None else '-':>10} {change:>8}"
+        )
+    return lines
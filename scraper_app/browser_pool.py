@@ -0,0 +1,358 @@
+# scraper_app/browser_pool.py
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from playwright.async_api import async_playwright
+
+from .metrics import stage
+from .runtime import get_background_loop, register_shutdown_hook
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process browser slots
+    fcntl = None
+
+try:
+    import psutil
+except ImportError:  # Memory-based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SETTINGS = {
+    'MAX_BROWSERS': 2,               # Browsers per worker process
+    'MAX_CONTEXTS_PER_BROWSER': 4,   # Concurrent jobs sharing one browser
+    'MAX_PAGES_PER_BROWSER': 100,    # Recycle a browser after this many pages
+    'MAX_BROWSER_MEMORY_MB': 1024,   # Recycle a browser above this RSS (needs psutil)
+    'ACQUIRE_TIMEOUT': 60,           # Seconds to wait for a free context
+    'PREWARM': True,                 # Launch one browser when the app starts
+    'SLOT_DIR': None,                # Lock directory bounding browsers across processes
+    'GLOBAL_MAX_BROWSERS': None,     # Number of lock slots in SLOT_DIR
+    'WS_ENDPOINTS': [],              # Shared Playwright servers to connect to instead of launching
+    'LAUNCH_ARGS': [],
+}
+
+
+class _BrowserSlot:
+    """An exclusive lock file bounding the number of browsers across worker processes"""
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class PooledBrowser:
+    """A browser owned by the pool together with its usage counters"""
+    def __init__(self, browser, slot: _BrowserSlot = None, marker: str = None):
+        self.browser = browser
+        self.slot = slot
+        self.marker = marker
+        self.pid = None
+        self.pages_served = 0
+        self.active_contexts = 0
+        self.retiring = False
+
+    @property
+    def connected(self) -> bool:
+        return self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    A size-bounded pool of long-lived Chromium browsers.
+
+    Every job receives a fresh, isolated browser context; browsers themselves are
+    reused and recycled after serving MAX_PAGES_PER_BROWSER pages or growing above
+    MAX_BROWSER_MEMORY_MB. With SLOT_DIR set, the total number of local browsers
+    is bounded across all worker processes on the node; with WS_ENDPOINTS set,
+    workers share remote browsers started with ``playwright run-server``.
+    All methods must run on the background loop (see runtime.py).
+    """
+    def __init__(self, **options):
+        self.options = {**DEFAULT_POOL_SETTINGS, **options}
+        self._playwright = None
+        self._browsers = []
+        self._launching = 0
+        self._endpoint_index = 0
+        self._condition = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    @property
+    def max_browsers(self) -> int:
+        return self.options['MAX_BROWSERS']
+
+    @property
+    def max_contexts(self) -> int:
+        return self.options['MAX_CONTEXTS_PER_BROWSER']
+
+    async def start(self, prewarm: int = 0):
+        """Start Playwright and optionally launch browsers ahead of the first job"""
+        async with self._start_lock:
+            if not self._started:
+                self._playwright = await async_playwright().start()
+                self._started = True
+                logger.info("Browser pool started")
+        for _ in range(max(0, min(prewarm, self.max_browsers) - len(self._browsers))):
+            await self._launch()
+
+    async def stop(self):
+        """Close every browser and stop Playwright"""
+        for entry in list(self._browsers):
+            await self._close(entry)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._started = False
+        logger.info("Browser pool stopped")
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Lease a new isolated browser context for a single job"""
+        await self.start()
+        with stage('browser_acquire'):
+            entry = await self._acquire()
+        context = None
+        try:
+            context = await entry.browser.new_context(**context_options)
+            context.on('page', lambda page: self._watch_page(entry, page))
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f"Error closing browser context: {e}")
+            await self._release(entry)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool's size and usage"""
+        return {
+            'browsers': len(self._browsers),
+            'launching': self._launching,
+            'active_contexts': sum(entry.active_contexts for entry in self._browsers),
+            'pages_served': [entry.pages_served for entry in self._browsers],
+        }
+
+    def _watch_page(self, entry: PooledBrowser, page):
+        """Count every document a tab loads in its main frame, so paginated scrapes count each page"""
+        def navigated(frame):
+            if frame == page.main_frame:
+                self._count_page(entry)
+        page.on('framenavigated', navigated)
+
+    def _count_page(self, entry: PooledBrowser):
+        entry.pages_served += 1
+        if entry.pages_served >= self.options['MAX_PAGES_PER_BROWSER']:
+            entry.retiring = True
+
+    async def _acquire(self) -> PooledBrowser:
+        deadline = time.monotonic() + self.options['ACQUIRE_TIMEOUT']
+        async with self._condition:
+            while True:
+                # Prefer the least busy healthy browser
+                candidates = [
+                    entry for entry in self._browsers
+                    if entry.connected and not entry.retiring and entry.active_contexts < self.max_contexts
+                ]
+                if candidates:
+                    entry = min(candidates, key=lambda candidate: candidate.active_contexts)
+                    entry.active_contexts += 1
+                    return entry
+
+                if len(self._browsers) + self._launching < self.max_browsers:
+                    self._launching += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free browser context")
+                try:
+                    await asyncio.wait_for(self._condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    raise TimeoutError("Timed out waiting for a free browser context")
+
+        # Launch outside the lock so other jobs keep flowing meanwhile
+        try:
+            return await self._launch(deadline, counted=True, reserve=True)
+        finally:
+            async with self._condition:
+                self._launching -= 1
+                self._condition.notify_all()
+
+    async def _release(self, entry: PooledBrowser):
+        over_memory_limit = not entry.retiring and await self._over_memory_limit(entry)
+        async with self._condition:
+            entry.active_contexts -= 1
+            if over_memory_limit:
+                logger.info(f"Recycling browser above {self.options['MAX_BROWSER_MEMORY_MB']} MB")
+                entry.retiring = True
+            close = (entry.retiring or not entry.connected) and entry.active_contexts == 0
+            if close and entry in self._browsers:
+                self._browsers.remove(entry)
+            self._condition.notify_all()
+        if close:
+            await self._close(entry)
+
+    async def _launch(self, deadline: float = None, counted: bool = False, reserve: bool = False) -> PooledBrowser:
+        if not counted:
+            # Prewarm path: reserve capacity just like a regular acquire
+            async with self._condition:
+                if len(self._browsers) + self._launching >= self.max_browsers:
+                    return None
+                self._launching += 1
+            try:
+                return await self._launch(deadline, counted=True)
+            finally:
+                async with self._condition:
+                    self._launching -= 1
+                    self._condition.notify_all()
+
+        endpoints = self.options['WS_ENDPOINTS']
+        if endpoints:
+            endpoint = endpoints[self._endpoint_index % len(endpoints)]
+            self._endpoint_index += 1
+            with stage('browser_launch'):
+                browser = await self._playwright.chromium.connect(endpoint)
+            entry = PooledBrowser(browser)
+            logger.info(f"Connected to shared browser at {endpoint}")
+        else:
+            slot = await self._acquire_slot(deadline)
+            marker = f'--unscraper-pool={uuid.uuid4().hex}'
+            try:
+                with stage('browser_launch'):
+                    browser = await self._playwright.chromium.launch(
+                        headless=True,
+                        args=[*self.options['LAUNCH_ARGS'], marker],
+                    )
+            except BaseException:
+                if slot is not None:
+                    slot.release()
+                raise
+            entry = PooledBrowser(browser, slot=slot, marker=marker)
+            entry.pid = await asyncio.to_thread(self._find_browser_pid, marker)
+            logger.info("Launched pooled Chromium browser")
+
+        browser.on('disconnected', lambda _: self._forget(entry))
+        # Hand the new browser to the job that launched it before anyone else sees it
+        entry.active_contexts = 1 if reserve else 0
+        async with self._condition:
+            self._browsers.append(entry)
+            self._condition.notify_all()
+        return entry
+
+    async def _acquire_slot(self, deadline: float = None) -> _BrowserSlot:
+        slot_dir = self.options['SLOT_DIR']
+        slot_count = self.options['GLOBAL_MAX_BROWSERS']
+        if not slot_dir or not slot_count or fcntl is None:
+            return None
+
+        os.makedirs(slot_dir, exist_ok=True)
+        while True:
+            for index in range(slot_count):
+                slot = _BrowserSlot(os.path.join(slot_dir, f'browser-slot-{index}.lock'))
+                if slot.try_acquire():
+                    return slot
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("All browser slots are in use by other worker processes")
+            await asyncio.sleep(0.25)
+
+    async def _close(self, entry: PooledBrowser):
+        try:
+            if entry.connected:
+                await entry.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+        finally:
+            if entry.slot is not None:
+                entry.slot.release()
+                entry.slot = None
+
+    def _forget(self, entry: PooledBrowser):
+        """Drop a browser that crashed or disconnected"""
+        if entry in self._browsers and entry.active_contexts == 0:
+            self._browsers.remove(entry)
+        entry.retiring = True
+        if entry.slot is not None:
+            entry.slot.release()
+            entry.slot = None
+
+    async def _over_memory_limit(self, entry: PooledBrowser) -> bool:
+        limit = self.options['MAX_BROWSER_MEMORY_MB']
+        if psutil is None or entry.pid is None or not limit:
+            return False
+        rss = await asyncio.to_thread(self._browser_rss, entry.pid)
+        return rss > limit * 1024 * 1024
+
+    @staticmethod
+    def _find_browser_pid(marker: str):
+        if psutil is None:
+            return None
+        for process in psutil.process_iter(['pid', 'cmdline']):
+            cmdline = process.info.get('cmdline') or []
+            # The browser process is the one carrying our marker without a --type switch
+            if marker in cmdline and not any(arg.startswith('--type=') for arg in cmdline):
+                return process.info['pid']
+        return None
+
+    @staticmethod
+    def _browser_rss(pid: int) -> int:
+        try:
+            process = psutil.Process(pid)
+            processes = [process, *process.children(recursive=True)]
+        except psutil.Error:
+            return 0
+        total = 0
+        for child in processes:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+
+_browser_pool = None
+_browser_pool_pid = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide browser pool configured from settings.BROWSER_POOL"""
+    global _browser_pool, _browser_pool_pid
+    # A pool inherited through fork belongs to the parent's loop and Playwright driver
+    if _browser_pool is None or _browser_pool_pid != os.getpid():
+        _browser_pool = BrowserPool(**getattr(settings, 'BROWSER_POOL', {}))
+        _browser_pool_pid = os.getpid()
+        register_shutdown_hook(_browser_pool.stop)
+    return _browser_pool
+
+
+def prewarm_browser_pool():
+    """Start the pool and launch a first browser in the background when the app starts"""
+    pool = get_browser_pool()
+    if not pool.options['PREWARM']:
+        return
+    def log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Browser pool prewarm failed: {future.exception()}")
+
+    get_background_loop().submit(pool.start(prewarm=1)).add_done_callback(log_failure)
@@ -0,0 +1,208 @@
+# scraper_app/chunking.py
+import re
+from typing import List, NamedTuple
+
+from django.conf import settings
+
+from .llm import DEFAULT_LLM_SETTINGS, EXTRACTION_MODELS, MODEL_CONTEXT_TOKENS, estimate_tokens
+
+DEFAULT_CHUNKING_SETTINGS = {
+    'MAX_CHUNK_TOKENS': 6000,       # Upper bound even for long-context models
+    'OVERLAP_TOKENS': 150,          # Trailing context repeated at the start of the next chunk
+    'PROMPT_RESERVE_TOKENS': 400,   # System prompt and instructions around each chunk
+}
+
+# Markdown lines that start a new block (and usually a new record)
+BLOCK_START = re.compile(r'^(?:#{1,6}\s|\*\*\*|---|\|?\s*:?-{3,})')
+
+HEADING = re.compile(r'^#{1,6}\s')
+
+WHITESPACE = re.compile(r'\s+')
+
+
+class Chunk(NamedTuple):
+    """A piece of page text sent to the LLM; ``overlap`` is the prefix repeated from the previous chunk"""
+    text: str
+    overlap: str = ''
+
+
+def chunking_settings() -> dict:
+    return {**DEFAULT_CHUNKING_SETTINGS, **getattr(settings, 'CHUNKING', {})}
+
+
+def chunk_token_budget(models: List[str] = None) -> int:
+    """
+    Largest chunk, in estimated tokens, that fits the context window of every target model.
+
+    Pages are chunked before the router picks a model for each chunk, so by
+    default the budget fits all EXTRACTION_MODELS and any of them can take a
+    chunk over when another one fails or is rate limited.
+    """
+    options = chunking_settings()
+    completion_tokens = {**DEFAULT_LLM_SETTINGS, **getattr(settings, 'LLM', {})}['COMPLETION_TOKENS']
+    context = min(MODEL_CONTEXT_TOKENS.get(model, 8192) for model in (models or EXTRACTION_MODELS))
+    available = context - completion_tokens - options['PROMPT_RESERVE_TOKENS']
+    return max(256, min(options['MAX_CHUNK_TOKENS'], available))
+
+
+def split_blocks(content: str) -> List[str]:
+    """Split markdown into blocks at blank lines and headings / horizontal rules"""
+    blocks = []
+    current = []
+    for line in content.split('\n'):
+        if not line.strip():
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        if current and BLOCK_START.match(line.lstrip()):
+            blocks.append('\n'.join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+def group_sections(blocks: List[str]) -> List[List[str]]:
+    """Group blocks into sections that start at a heading, keeping a record's title with its details"""
+    sections = []
+    for block in blocks:
+        if not sections or HEADING.match(block):
+            sections.append([block])
+        else:
+            sections[-1].append(block)
+    return sections
+
+
+def _split_oversized(block: str, budget: int) -> List[str]:
+    """Split a block larger than the budget at line, then word boundaries"""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for line in block.split('\n'):
+        line_tokens = estimate_tokens(line)
+        if line_tokens > budget:
+            # A single huge line: cut it at whitespace every ~budget tokens
+            words = line.split(' ')
+            line_parts, part, part_tokens = [], [], 0
+            for word in words:
+                word_tokens = estimate_tokens(word + ' ')
+                if part and part_tokens + word_tokens > budget:
+                    line_parts.append(' '.join(part))
+                    part, part_tokens = [], 0
+                part.append(word)
+                part_tokens += word_tokens
+            if part:
+                line_parts.append(' '.join(part))
+        else:
+            line_parts = [line]
+
+        for part in line_parts:
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > budget:
+                pieces.append('\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append('\n'.join(current))
+    return pieces
+
+
+def chunk_content(content: str, models: List[str] = None, overlap_tokens: int = None) -> List[Chunk]:
+    """
+    Split page text into token-budgeted chunks without cutting through blocks.
+
+    Heading sections, or failing that blocks (paragraphs, list entries, table
+    rows), are packed greedily up to the budget of the target models; only
+    pieces larger than a whole chunk get split further. Each chunk after the first repeats the trailing
+    blocks of the previous one (up to overlap_tokens) so that records at the
+    boundary are seen whole at least once.
+    """
+    budget = chunk_token_budget(models)
+    if overlap_tokens is None:
+        overlap_tokens = chunking_settings()['OVERLAP_TOKENS']
+
+    pieces = []
+    for section in group_sections(split_blocks(content)):
+        section_text = '\n\n'.join(section)
+        if estimate_tokens(section_text) <= budget:
+            pieces.append(section_text)
+            continue
+        for block in section:
+            if estimate_tokens(block) <= budget:
+                pieces.append(block)
+            else:
+                pieces.extend(_split_oversized(block, budget))
+
+    chunks = []
+    current, current_tokens = [], 0
+    overlap = []
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > budget:
+            chunks.append(Chunk('\n\n'.join(current), '\n\n'.join(overlap)))
+
+            # Carry the tail of this chunk over as context for the next one
+            overlap, carried = [], 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if carried + previous_tokens > overlap_tokens or len(overlap) == len(current) - 1:
+                    break
+                overlap.insert(0, previous)
+                carried += previous_tokens
+            if carried + piece_tokens > budget:
+                overlap, carried = [], 0
+            current, current_tokens = list(overlap), carried
+
+        current.append(piece)
+        current_tokens += piece_tokens
+
+    if current:
+        chunks.append(Chunk('\n\n'.join(current), '\n\n'.join(overlap)))
+    return chunks
+
+
+def _normalize(value) -> str:
+    return WHITESPACE.sub(' ', str(value)).strip().lower()
+
+
+def _listing_key(listing: dict) -> tuple:
+    return tuple(sorted((str(key).lower(), _normalize(value)) for key, value in listing.items()))
+
+
+def _in_overlap(listing: dict, overlap: str) -> bool:
+    """Whether a listing's values were visible in the repeated overlap text"""
+    values = [_normalize(value) for value in listing.values() if value not in (None, '')]
+    values = [value for value in values if len(value) >= 3]
+    return bool(values) and any(value in overlap for value in values)
+
+
+class ListingMerger:
+    """
+    Merges per-chunk listings in chunk order, dropping records extracted twice from an overlap.
+
+    A listing is treated as a duplicate only if the previous chunk produced an
+    identical listing and its values occur in the overlap text, so genuinely
+    repeated records elsewhere on a page are kept.
+    """
+    def __init__(self):
+        self.previous_keys = set()
+
+    def add(self, chunk: Chunk, listings) -> List[dict]:
+        """Return the new listings of the next chunk"""
+        merged = []
+        keys = set()
+        overlap = _normalize(chunk.overlap) if chunk.overlap else ''
+        for listing in listings if isinstance(listings, list) else []:
+            if not isinstance(listing, dict):
+                continue
+            key = _listing_key(listing)
+            keys.add(key)
+            if overlap and key in self.previous_keys and _in_overlap(listing, overlap):
+                continue
+            merged.append(listing)
+        self.previous_keys = keys
+        return merged
+
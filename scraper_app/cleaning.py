@@ -0,0 +1,178 @@
+# scraper_app/cleaning.py
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import re
+import threading
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+import html2text
+
+from .metrics import stage
+from .profiling import is_profiling
+from .records import DEFAULT_RECORD_SETTINGS, container_selector, find_record_elements, record_fields, record_text
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # The lxml cleaner is optional
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+# Elements that never hold listing data
+REMOVED_TAGS = ['script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe']
+
+DEFAULT_CLEANING_SETTINGS = {
+    'PARSER': 'lxml',                                   # 'lxml' or 'html.parser'
+    'PROCESS_WORKERS': max(1, (os.cpu_count() or 2) // 2),  # 0 cleans in a thread instead
+}
+
+# One linear scan: URLs are dropped, runs of blank lines become a single blank
+# line, spaces around line breaks are trimmed and other whitespace runs become
+# one space. A URL is matched with the whitespace around it, which is replaced
+# the same way, so removing it never leaves a trailing space or an extra blank
+# line. Whitespace that is already normal (a single space, a single line
+# break, exactly one blank line) never matches, so it costs no replacement
+# call. The URL character class is the set the previous url_pattern accepted.
+NORMALIZE_PATTERN = re.compile(
+    # Cheap first-character check so most positions are rejected without trying each branch
+    r'(?=[\sh])'
+    r'(?:(?P<url>\s*https?://[!$-_a-zA-Z]+(?:\s+https?://[!$-_a-zA-Z]+)*\s*)'
+    r'|(?P<blank>[^\S\n]+\n(?:[^\S\n]*\n)+[^\S\n]*'
+    r'|\n(?:[^\S\n]*\n){2,}[^\S\n]*|\n[^\S\n]+\n(?:[^\S\n]*\n)*[^\S\n]*|\n\n[^\S\n]+)'
+    r'|(?P<line>[^\S\n]+\n[^\S\n]*|\n[^\S\n]+)'
+    r'|(?P<space>[^\S\n]{2,}|[^\S \n]))'
+)
+
+
+NORMALIZED = {'blank': '\n\n', 'line': '\n', 'space': ' '}
+
+
+def _normalize_match(match) -> str:
+    if match.lastgroup != 'url':
+        return NORMALIZED[match.lastgroup]
+    text = match.group()
+    line_breaks = text.count('\n')
+    if line_breaks:
+        return '\n\n' if line_breaks > 1 else '\n'
+    return ' ' if text[0].isspace() or text[-1].isspace() else ''
+
+
+def normalize_text(text: str) -> str:
+    """Strip URLs and collapse whitespace in a single pass, keeping blank lines between blocks"""
+    return NORMALIZE_PATTERN.sub(_normalize_match, text).strip()
+
+
+def _markdown_converter() -> html2text.HTML2Text:
+    markdown_converter = html2text.HTML2Text()
+    markdown_converter.ignore_links = False
+    markdown_converter.ignore_images = True
+    markdown_converter.ignore_emphasis = False
+    markdown_converter.ignore_tables = False
+    markdown_converter.body_width = 0
+    return markdown_converter
+
+
+def _parse_with_lxml(html: str):
+    try:
+        document = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(document, *REMOVED_TAGS, with_tail=False)
+    return document
+
+
+def _strip_with_soup(html: str) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup.find_all(REMOVED_TAGS):
+        element.decompose()
+    return str(soup)
+
+
+def clean_page(html: str, parser: str = 'lxml', record_options: dict = None) -> dict:
+    """
+    Remove non-content elements from rendered HTML and convert it to normalized markdown.
+
+    With record_options (see records.py) and the lxml parser, the repeated
+    records of a listing grid are also flattened to one line each, so they can
+    be sent instead of the whole page, and mapped out field by field for
+    extraction rules (see extraction_rules.py). Runs in a worker process, so it
+    must stay a plain module-level function and gets its settings passed in.
+
+    Returns:
+        dict: 'content' with the page markdown; 'records' with one record per
+        paragraph, 'record_selector' and 'record_fields' (CSS path -> text per
+        record), all None if no listing grid was found
+    """
+    page = {'content': '', 'records': None, 'record_selector': None, 'record_fields': None}
+    if parser == 'lxml' and lxml_html is not None:
+        document = _parse_with_lxml(html)
+        if document is None:
+            return page
+        if record_options is not None and record_options['ENABLED']:
+            records = find_record_elements(document, **record_options)
+            if records:
+                page.update({
+                    'records': '\n\n'.join(map(record_text, records)),
+                    'record_selector': container_selector(records),
+                    'record_fields': [record_fields(record) for record in records],
+                })
+        markup = lxml_html.tostring(document, encoding='unicode')
+    else:
+        markup = _strip_with_soup(html)
+    page['content'] = normalize_text(_markdown_converter().handle(markup))
+    return page
+
+
+def clean_html(html: str, parser: str = 'lxml') -> str:
+    """Remove non-content elements from rendered HTML and convert it to normalized markdown"""
+    return clean_page(html, parser)['content']
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _cleaning_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Never fork a process that runs Playwright and event loop threads
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(method)
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool(broken_pool):
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+
+
+async def clean_page_async(html: str) -> dict:
+    """Clean rendered HTML and find its records on the process pool so the event loop stays responsive"""
+    options = {**DEFAULT_CLEANING_SETTINGS, **getattr(settings, 'CLEANING', {})}
+    record_options = {**DEFAULT_RECORD_SETTINGS, **getattr(settings, 'RECORDS', {})}
+    with stage('clean'):
+        # A profile samples this process only, so clean in a thread while one is recorded
+        if not options['PROCESS_WORKERS'] or is_profiling():
+            return await asyncio.to_thread(clean_page, html, options['PARSER'], record_options)
+
+        pool = _cleaning_pool(options['PROCESS_WORKERS'])
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, clean_page, html, options['PARSER'], record_options)
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool next time and clean this page in a thread
+            logger.warning("HTML cleaning pool broke, falling back to a thread")
+            _reset_pool(pool)
+            return await asyncio.to_thread(clean_page, html, options['PARSER'], record_options)
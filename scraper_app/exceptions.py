@@ -0,0 +1,5 @@
+# scraper_app/exceptions.py
+
+class ScraperError(Exception):
+    """Custom exception for scraper-related errors"""
+    pass
@@ -0,0 +1,202 @@
+# scraper_app/exports.py
+import csv
+import io
+import json
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from django.conf import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow exports are optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_SETTINGS = {
+    'BATCH_ROWS': 1000,       # Rows serialized per chunk of the response
+    'GZIP': True,             # Compress text exports for clients that accept gzip
+}
+
+# Export format -> (content type, file extension, columnar)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'json': ('application/json', 'json', False),
+    'ndjson': ('application/x-ndjson', 'ndjson', False),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow', True),
+}
+
+
+def export_settings() -> dict:
+    """Return the effective export settings"""
+    return {**DEFAULT_EXPORT_SETTINGS, **getattr(settings, 'EXPORTS', {})}
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def row_columns(rows: Iterable[dict], columns: Dict[str, str] = None) -> Dict[str, str]:
+    """
+    Collect the columns of all rows in first-seen order, with the kind of values they hold.
+
+    Rows with different currencies have different price columns, so looking at
+    the first row alone would drop data. Pass the columns of earlier rows to
+    extend them with more rows.
+
+    Returns:
+        dict: column name -> 'number', 'bool', 'string' or 'null' (only empty values so far)
+    """
+    columns = {} if columns is None else columns
+    for row in rows:
+        for name, value in row.items():
+            if value is None:
+                kind = 'null'
+            elif _is_number(value):
+                kind = 'number'
+            else:
+                kind = 'bool' if isinstance(value, bool) else 'string'
+            seen = columns.get(name)
+            if seen is None or seen == 'null':
+                columns[name] = kind
+            elif seen != kind and kind != 'null':
+                columns[name] = 'string'
+    return columns
+
+
+def iter_csv(rows: Iterable[dict], batch_size: int, columns: Dict[str, str] = None) -> Iterator[str]:
+    """Yield CSV text batch by batch"""
+    columns = list(columns or row_columns(rows))
+    if not columns:
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for batch in _batches(rows, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_json(rows: Iterable[dict], batch_size: int) -> Iterator[str]:
+    """Yield a compact JSON array batch by batch"""
+    separator = '['
+    for batch in _batches(rows, batch_size):
+        yield separator + ','.join(json.dumps(row, separators=(',', ':')) for row in batch)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+def iter_ndjson(rows: Iterable[dict], batch_size: int) -> Iterator[str]:
+    """Yield one JSON object per line, batch by batch"""
+    for batch in _batches(rows, batch_size):
+        yield ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in batch)
+
+
+class _ChunkSink:
+    """Write-only file that keeps written bytes until the response takes them"""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+ARROW_TYPES = {'number': 'float64', 'bool': 'bool_', 'string': 'string', 'null': 'string'}
+
+
+def _arrow_batch(batch: List[dict], columns: Dict[str, str], schema):
+    arrays = []
+    for name, kind in columns.items():
+        values = [row.get(name) for row in batch]
+        if kind in ('string', 'null'):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _iter_columnar(rows: Iterable[dict], batch_size: int, file_format: str,
+                   columns: Dict[str, str] = None) -> Iterator[bytes]:
+    columns = columns or row_columns(rows)
+    schema = pa.schema([(name, getattr(pa, ARROW_TYPES[kind])()) for name, kind in columns.items()])
+    sink = _ChunkSink()
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='snappy')
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    try:
+        for batch in _batches(rows, batch_size):
+            # Each batch becomes its own row group, so it can leave as soon as it is written
+            if file_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([_arrow_batch(batch, columns, schema)]))
+            else:
+                writer.write_batch(_arrow_batch(batch, columns, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(export_format: str, rows: Iterable[dict], columns: Dict[str, str] = None) -> Iterator:
+    """
+    Serialize rows in the given export format, one batch of rows at a time.
+
+    Unless their columns are given (see row_columns), CSV, Parquet and Arrow
+    look at all rows once to collect them before writing, so rows must then be
+    a list or another iterable that can be read twice.
+
+    Yields:
+        str or bytes: the next part of the file
+    """
+    batch_size = export_settings()['BATCH_ROWS']
+    if export_format == 'csv':
+        return iter_csv(rows, batch_size, columns)
+    if export_format == 'json':
+        return iter_json(rows, batch_size)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows, batch_size)
+    if export_format in ('parquet', 'arrow'):
+        if pa is None:
+            raise ValueError(f"{export_format.title()} export requires pyarrow")
+        return _iter_columnar(rows, batch_size, export_format, columns)
+    raise ValueError(f"Unknown export format: {export_format}")
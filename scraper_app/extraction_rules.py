@@ -0,0 +1,171 @@
+# scraper_app/extraction_rules.py
+import asyncio
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .host_memory import get_host_memory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULE_SETTINGS = {
+    'ENABLED': True,
+    'MIN_LISTINGS': 3,         # Listings the LLM must have found on a page before rules are learned from it
+    'MIN_AGREEMENT': 0.9,      # Share of listings the rules must reproduce, when learned and when checked
+    'EMPTY_RATIO': 0.1,        # Fields filled in fewer listings than this are left empty by the rules
+    'VALIDATE_EVERY': 5,       # Check the rules against the LLM on the first and every Nth page they extract
+    'VALIDATE_RECORDS': 5,     # Records sampled for such a check
+}
+
+# Host memory key of the learned rules, keyed by field set
+HOST_MEMORY_KEY = 'extraction_rules'
+
+WHITESPACE = re.compile(r'\s+')
+
+# Values shorter than this ("1", "$", "New") must equal an element's whole text to match it
+MIN_PARTIAL_MATCH = 4
+
+
+def rule_settings() -> dict:
+    """Return the effective extraction rule settings"""
+    return {**DEFAULT_RULE_SETTINGS, **getattr(settings, 'EXTRACTION_RULES', {})}
+
+
+def _normalize(value) -> str:
+    return WHITESPACE.sub(' ', str(value if value is not None else '')).strip().lower()
+
+
+def fields_key(fields: List[str]) -> str:
+    """Key of a field set, independent of order and letter case"""
+    return ','.join(sorted({_normalize(field) for field in fields}))
+
+
+def load_rule(url: str, fields: List[str]) -> Optional[dict]:
+    """Return the rule learned for a URL's host and a field set, if any"""
+    return get_host_memory().get(url, HOST_MEMORY_KEY, {}).get(fields_key(fields))
+
+
+def save_rule(url: str, fields: List[str], rule: Optional[dict]):
+    """Remember a rule for a URL's host and a field set, or forget it with None"""
+    get_host_memory().update_entry(url, HOST_MEMORY_KEY, fields_key(fields), rule)
+
+
+async def aload_rule(url: str, fields: List[str]) -> Optional[dict]:
+    return await asyncio.to_thread(load_rule, url, fields)
+
+
+async def asave_rule(url: str, fields: List[str], rule: Optional[dict]):
+    await asyncio.to_thread(save_rule, url, fields, rule)
+
+
+def _matches(value: str, text: str) -> bool:
+    """
+    Whether an element's normalized text holds a normalized value.
+
+    The value must be the whole text, or whole tokens of it and at least
+    MIN_PARTIAL_MATCH characters long, so "120.00" matches "$120.00" but "1"
+    doesn't match "12 reviews".
+    """
+    if value == text:
+        return True
+    if len(value) < MIN_PARTIAL_MATCH:
+        return False
+    return re.search(rf'(?<!\w){re.escape(value)}(?!\w)', text) is not None
+
+
+def _locate(value: str, texts: Dict[str, Counter]) -> Optional[str]:
+    """Path of the element most likely holding a value: an exact text match, else the smallest containing text"""
+    if value in texts:
+        return min(texts[value], key=lambda path: (len(path), path))
+    containing = [(len(text), paths) for text, paths in texts.items() if _matches(value, text)]
+    if not containing:
+        return None
+    _, paths = min(containing, key=lambda item: item[0])
+    return min(paths, key=lambda path: (len(path), path))
+
+
+def learn_rule(record_selector: str, record_fields: List[Dict[str, str]], listings: List[dict],
+               **options) -> Optional[dict]:
+    """
+    Induce extraction rules by aligning the values the LLM returned with the record elements.
+
+    Every value votes for the element path that holds it in any record; a
+    field's rule is the path with most votes. Fields the LLM rarely filled stay
+    empty. The rules are kept only if applying them to the same records gives
+    back at least MIN_AGREEMENT of the LLM's listings.
+
+    Args:
+        record_selector: CSS selector of the record containers (see records.py)
+        record_fields: CSS path -> text of every record on the page
+        listings: what the LLM extracted from those records
+
+    Returns:
+        dict: 'container' selector and 'fields' (field name -> path or None), or None if no reliable rule was found
+    """
+    options = {**DEFAULT_RULE_SETTINGS, **options}
+    listings = [listing for listing in listings if isinstance(listing, dict)]
+    if len(listings) < options['MIN_LISTINGS']:
+        return None
+
+    # Normalized text -> the paths that hold it, over all records
+    texts: Dict[str, Counter] = {}
+    for record in record_fields:
+        for path, text in record.items():
+            texts.setdefault(_normalize(text), Counter())[path] += 1
+
+    names = list(dict.fromkeys(name for listing in listings for name in listing))
+    rule_fields = {}
+    for name in names:
+        values = [_normalize(listing.get(name)) for listing in listings]
+        values = [value for value in values if value]
+        if len(values) < options['EMPTY_RATIO'] * len(listings):
+            rule_fields[name] = None
+            continue
+        votes = Counter(path for path in (_locate(value, texts) for value in values) if path)
+        if not votes:
+            logger.info(f"No element holds the values of field {name}; not learning rules")
+            return None
+        rule_fields[name] = votes.most_common(1)[0][0]
+
+    rule = {'container': record_selector, 'fields': rule_fields}
+    score = agreement(apply_rule(rule, record_fields), listings)
+    if score < options['MIN_AGREEMENT']:
+        logger.info(f"Induced rules reproduce only {score:.0%} of the listings; not learning them")
+        return None
+    return rule
+
+
+def apply_rule(rule: dict, record_fields: List[Dict[str, str]]) -> List[dict]:
+    """Extract listings from records with learned rules, skipping records where every field is empty"""
+    rows = []
+    for record in record_fields:
+        row = {name: record.get(path, '') if path else '' for name, path in rule['fields'].items()}
+        if any(row.values()):
+            rows.append(row)
+    return rows
+
+
+def agreement(rows: List[dict], listings: List[dict]) -> float:
+    """
+    Share of listings that rule rows reproduce, penalized for extra rows.
+
+    A listing is reproduced by a row holding each of its non-empty values
+    (rules keep the element text, so "$120.00" reproduces "120.00"; see _matches).
+    """
+    listings = [listing for listing in listings if isinstance(listing, dict)]
+    if not listings and not rows:
+        return 1.0
+    remaining = [{name: _normalize(value) for name, value in row.items()} for row in rows]
+    matched = 0
+    for listing in listings:
+        values = [(name, _normalize(value)) for name, value in listing.items()]
+        values = [(name, value) for name, value in values if value]
+        for index, row in enumerate(remaining):
+            if all(_matches(value, row.get(name, '')) for name, value in values):
+                matched += 1
+                del remaining[index]
+                break
+    return matched / max(len(listings), len(rows))
@@ -0,0 +1,114 @@
+# scraper_app/host_memory.py
+import asyncio
+import json
+import logging
+import os
+import threading
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased host of a URL, without a leading www."""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class HostMemory:
+    """
+    Small per-host hints learned while scraping (scroll depth, pagination selector, ...).
+
+    Hints are kept in memory and written through to a JSON file in
+    SCRAPER_STATE_DIR so they survive restarts and are picked up by other workers.
+    Code running on the event loop should use aget/aupdate, which do the file
+    I/O in a thread.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hosts = None
+        self._mtime = None
+
+    def get(self, url_or_host: str, key: str, default=None):
+        """Return a remembered value for a host"""
+        host = host_of(url_or_host) if '//' in url_or_host else url_or_host
+        with self._lock:
+            self._load()
+            return self._hosts.get(host, {}).get(key, default)
+
+    def update(self, url_or_host: str, **values):
+        """Remember values for a host and persist them"""
+        host = host_of(url_or_host) if '//' in url_or_host else url_or_host
+        with self._lock:
+            self._load()
+            hints = self._hosts.setdefault(host, {})
+            if all(key in hints and hints[key] == value for key, value in values.items()):
+                return
+            hints.update(values)
+            self._save()
+
+    def update_entry(self, url_or_host: str, key: str, name: str, value):
+        """Set one entry of a dict-valued hint, or remove it with None, and persist it"""
+        host = host_of(url_or_host) if '//' in url_or_host else url_or_host
+        with self._lock:
+            self._load()
+            entries = self._hosts.setdefault(host, {}).setdefault(key, {})
+            if entries.get(name) == value:
+                return
+            if value is None:
+                entries.pop(name)
+            else:
+                entries[name] = value
+            self._save()
+
+    async def aget(self, *args):
+        return await asyncio.to_thread(self.get, *args)
+
+    async def aupdate(self, url_or_host: str, **values):
+        await asyncio.to_thread(self.update, url_or_host, **values)
+
+    async def aupdate_entry(self, *args):
+        await asyncio.to_thread(self.update_entry, *args)
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        # Re-read when another process has written newer hints
+        if self._hosts is not None and mtime == self._mtime:
+            return
+        self._hosts = {}
+        self._mtime = mtime
+        if mtime is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._hosts = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable host memory {self.path}: {e}")
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._hosts, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist host memory: {e}")
+
+
+_host_memory = None
+
+
+def get_host_memory() -> HostMemory:
+    """Return the process-wide host memory"""
+    global _host_memory
+    if _host_memory is None:
+        _host_memory = HostMemory(os.path.join(settings.SCRAPER_STATE_DIR, 'host_memory.json'))
+    return _host_memory
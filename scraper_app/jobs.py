@@ -0,0 +1,370 @@
+# scraper_app/jobs.py
+import asyncio
+import contextlib
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from dotenv import dotenv_values
+
+from .exceptions import ScraperError
+from .llm import EXTRACTION_SYSTEM_MESSAGE
+from .host_memory import host_of
+from .models import ScrapeBatch, ScrapeJob
+from .pipeline import stream_listings
+from .prices import parse_price_fields
+from .results import save_result
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_SETTINGS = {
+    'LEASE_SECONDS': 60,          # A job whose lease isn't renewed in time goes back to the queue
+    'HEARTBEAT_SECONDS': 15,      # How often a worker renews the leases of its jobs
+    'MAX_ATTEMPTS': 3,            # Claims per job before it is failed for good
+    'JOB_TIMEOUT': 15 * 60,       # Seconds a single attempt may run
+    'POLL_INTERVAL': 2.0,         # Seconds an idle worker waits before looking for work again
+    'CONCURRENCY': 2,             # Jobs run at once by one worker process
+    'HOST_CONCURRENCY': 2,        # Jobs running at once against one host, across all workers
+    'HOST_DELAY': 2.0,            # Minimum seconds between starting two jobs on one host
+    'MAX_BATCH_SIZE': 500,        # URLs accepted in one batch submission
+    'SERVER_KEY_FALLBACK': False, # Let anonymous API callers without a key use the server's GROQ_API_KEY
+}
+
+
+def job_settings() -> dict:
+    """Return the effective job queue settings"""
+    return {**DEFAULT_JOB_SETTINGS, **getattr(settings, 'SCRAPE_JOBS', {})}
+
+
+def server_api_key() -> str:
+    """The server's own Groq key, which jobs submitted without a key of their own run with"""
+    env_variables = dotenv_values(os.path.join(settings.BASE_DIR, '.env'))
+    return env_variables.get('GROQ_API_KEY') or os.environ.get('GROQ_API_KEY', '')
+
+
+def submit_job(url: str, fields: List[str], page_count: int, api_key: str, user: str = '') -> ScrapeJob:
+    """
+    Queue a scrape for the workers.
+
+    Args:
+        api_key: the caller's Groq key, kept only until a worker claims the job;
+            empty to run the job with the server's key
+    """
+    job = ScrapeJob.objects.create(
+        url=url, host=host_of(url), fields=fields, page_count=page_count, api_key=api_key or '',
+        server_key=not api_key, user=user,
+    )
+    logger.info(f"Queued scrape job {job.pk} for {url}")
+    return job
+
+
+def submit_batch(items: List[dict], api_key: str, user: str = '') -> ScrapeBatch:
+    """
+    Queue a batch of scrapes in one transaction.
+
+    Args:
+        items: dicts with url, fields and page_count, already validated
+        api_key: as for submit_job
+    """
+    with transaction.atomic():
+        batch = ScrapeBatch.objects.create(user=user, size=len(items))
+        ScrapeJob.objects.bulk_create([
+            ScrapeJob(
+                batch=batch, url=item['url'], host=host_of(item['url']), fields=item['fields'],
+                page_count=item['page_count'], api_key=api_key or '', server_key=not api_key, user=user,
+            )
+            for item in items
+        ])
+    logger.info(f"Queued scrape batch {batch.pk} with {len(items)} jobs")
+    return batch
+
+
+def cancel_job(job_id) -> bool:
+    """Cancel a job that hasn't finished; its worker notices at the next heartbeat"""
+    cancelled = ScrapeJob.objects.filter(pk=job_id).exclude(status__in=ScrapeJob.FINISHED_STATUSES).update(
+        status=ScrapeJob.CANCELLED, finished_at=timezone.now(), lease_expires_at=None, api_key=''
+    )
+    return bool(cancelled)
+
+
+def cancel_batch(batch_id) -> int:
+    """Cancel every unfinished job of a batch"""
+    return ScrapeJob.objects.filter(batch_id=batch_id).exclude(status__in=ScrapeJob.FINISHED_STATUSES).update(
+        status=ScrapeJob.CANCELLED, finished_at=timezone.now(), lease_expires_at=None, api_key=''
+    )
+
+
+def fail_abandoned_jobs() -> int:
+    """
+    Fail jobs whose lease expired and that can't be retried.
+
+    That is after their last allowed attempt, or when they ran with the
+    caller's API key, which was cleared when the job was claimed.
+    """
+    now = timezone.now()
+    abandoned = ScrapeJob.objects.filter(status=ScrapeJob.RUNNING, lease_expires_at__lt=now)
+    failed = {'status': ScrapeJob.FAILED, 'finished_at': now, 'lease_expires_at': None, 'api_key': ''}
+    return abandoned.filter(attempts__gte=job_settings()['MAX_ATTEMPTS']).update(
+        error='The job was abandoned by its workers too many times', **failed
+    ) + abandoned.filter(server_key=False).update(
+        error='The worker running the job stopped and the API key is not kept once a job starts; submit it again',
+        **failed
+    )
+
+
+def busy_hosts(now) -> List[str]:
+    """
+    Hosts that must not get another job yet.
+
+    A host is busy while HOST_CONCURRENCY jobs hold a live lease on it, or for
+    HOST_DELAY seconds after a job on it was started.
+    """
+    options = job_settings()
+    recently_started = ScrapeJob.objects.filter(
+        started_at__gte=now - timedelta(seconds=options['HOST_DELAY'])
+    ).values_list('host', flat=True)
+    at_capacity = ScrapeJob.objects.filter(
+        status=ScrapeJob.RUNNING, lease_expires_at__gte=now
+    ).values('host').annotate(running=Count('pk')).filter(
+        running__gte=options['HOST_CONCURRENCY']
+    ).values_list('host', flat=True)
+    return list(set(recently_started) | set(at_capacity))
+
+
+def has_queued_jobs() -> bool:
+    return ScrapeJob.objects.filter(status=ScrapeJob.QUEUED).exists()
+
+
+def claim_job(worker_id: str) -> Optional[ScrapeJob]:
+    """
+    Claim the oldest queued job, or a running job whose lease expired, on a host that isn't busy.
+
+    Host limits are checked just before the claim, so workers racing for
+    different jobs on the same host can exceed them by one job each at most.
+    Only jobs that run with the server's key are reclaimed; the caller's key is
+    cleared from the row by the first claim and lives on in the returned job only.
+    """
+    options = job_settings()
+    fail_abandoned_jobs()
+
+    now = timezone.now()
+    candidates = ScrapeJob.objects.filter(
+        Q(status=ScrapeJob.QUEUED)
+        | Q(status=ScrapeJob.RUNNING, lease_expires_at__lt=now, attempts__lt=options['MAX_ATTEMPTS'], server_key=True)
+    ).exclude(host__in=busy_hosts(now)).order_by('created_at').values_list(
+        'pk', 'status', 'lease_expires_at', 'api_key'
+    )[:10]
+
+    for candidate in candidates:
+        job = try_claim(worker_id, *candidate)
+        if job is not None:
+            return job
+    return None
+
+
+def try_claim(worker_id: str, job_id, status: str, lease_expires_at, api_key: str) -> Optional[ScrapeJob]:
+    """
+    Claim one job as it was last seen, unless another worker got to it first.
+
+    The claim is a conditional UPDATE on the job's status and lease as seen, so
+    any number of workers on any number of nodes can race for the same job
+    through a shared database and exactly one of them wins.
+    """
+    now = timezone.now()
+    claimed = ScrapeJob.objects.filter(
+        pk=job_id, status=status, lease_expires_at=lease_expires_at
+    ) if lease_expires_at is not None else ScrapeJob.objects.filter(
+        pk=job_id, status=status, lease_expires_at__isnull=True
+    )
+    if not claimed.update(
+        status=ScrapeJob.RUNNING,
+        worker=worker_id,
+        lease_expires_at=now + timedelta(seconds=job_settings()['LEASE_SECONDS']),
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+        started_at=now,
+        api_key='',
+    ):
+        return None
+    if status == ScrapeJob.RUNNING:
+        logger.warning(f"Reclaimed scrape job {job_id} after its lease expired")
+    job = ScrapeJob.objects.get(pk=job_id)
+    job.api_key = api_key
+    return job
+
+
+def renew_lease(job_id, worker_id: str, **progress) -> bool:
+    """Extend a job's lease; False means the worker lost the job (cancelled or reclaimed)"""
+    now = timezone.now()
+    return bool(ScrapeJob.objects.filter(pk=job_id, worker=worker_id, status=ScrapeJob.RUNNING).update(
+        lease_expires_at=now + timedelta(seconds=job_settings()['LEASE_SECONDS']),
+        heartbeat_at=now,
+        **progress,
+    ))
+
+
+def finish_job(job_id, worker_id: str, status: str, **values) -> bool:
+    """Record the outcome of a job, unless the worker no longer holds it"""
+    return bool(ScrapeJob.objects.filter(pk=job_id, worker=worker_id, status=ScrapeJob.RUNNING).update(
+        status=status, finished_at=timezone.now(), lease_expires_at=None, api_key='', **values
+    ))
+
+
+def complete_job(job: ScrapeJob, worker_id: str, listings: List[dict], **progress) -> bool:
+    """Mark a job succeeded and store its rows as one result, unless the worker no longer holds it"""
+    with transaction.atomic():
+        if not finish_job(job.pk, worker_id, ScrapeJob.SUCCEEDED, error='', **progress):
+            return False
+        save_result(job.url, parse_price_fields({'rows': listings})['rows'], user=job.user, job=job)
+    return True
+
+
+def release_job(job_id, worker_id: str, error: str, api_key: str = '') -> bool:
+    """
+    Put a job that failed unexpectedly back in the queue while it has attempts left.
+
+    Args:
+        api_key: the caller's key the job was claimed with, stored again for the next claim
+    """
+    released = ScrapeJob.objects.filter(
+        pk=job_id, worker=worker_id, status=ScrapeJob.RUNNING, attempts__lt=job_settings()['MAX_ATTEMPTS']
+    ).update(status=ScrapeJob.QUEUED, worker='', lease_expires_at=None, error=error, api_key=api_key)
+    return bool(released) or finish_job(job_id, worker_id, ScrapeJob.FAILED, error=error)
+
+
+async def _db(func, *args, **kwargs):
+    """Run a blocking ORM call in a thread, dropping connections that went stale"""
+    def call():
+        close_old_connections()
+        return func(*args, **kwargs)
+    return await asyncio.to_thread(call)
+
+
+class JobWorker:
+    """
+    Drains the scrape job queue, running up to CONCURRENCY jobs at a time.
+
+    Each running job holds a lease that a heartbeat renews every
+    HEARTBEAT_SECONDS. If the worker dies, the lease runs out and another worker
+    reclaims the job; if the job is cancelled or reclaimed meanwhile, the
+    heartbeat fails and the scrape is stopped. Must run on the background loop
+    (see runtime.py) so it shares the browser pool and extraction engine.
+    """
+    def __init__(self, concurrency: int = None, name: str = None):
+        self.options = job_settings()
+        self.concurrency = concurrency or self.options['CONCURRENCY']
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = asyncio.Event()
+        self._running = set()
+
+    def stop(self):
+        """Stop claiming new jobs; jobs already running are finished first"""
+        self._stopping.set()
+
+    def abort(self):
+        """Stop now, handing running jobs back to the queue"""
+        self._stopping.set()
+        for task in list(self._running):
+            task.cancel()
+
+    async def run(self, burst: bool = False):
+        """Claim and run jobs until stopped (or, in burst mode, until the queue is empty)"""
+        logger.info(f"Scrape worker {self.name} started with concurrency {self.concurrency}")
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                try:
+                    job = await _db(claim_job, self.name)
+                except DatabaseError as e:
+                    logger.error(f"Could not claim a scrape job: {e}")
+                    job = None
+
+                if job is None:
+                    slots.release()
+                    # Jobs may still be waiting for a busy host to become available
+                    if burst and not self._running and not await _db(has_queued_jobs):
+                        break
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._stopping.wait(), self.options['POLL_INTERVAL'])
+                    continue
+
+                task = asyncio.ensure_future(self.run_job(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                task.add_done_callback(lambda _: slots.release())
+        finally:
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+        logger.info(f"Scrape worker {self.name} stopped")
+
+    async def run_job(self, job: ScrapeJob):
+        """Run one claimed job under its lease and record the outcome"""
+        logger.info(f"Running scrape job {job.pk} (attempt {job.attempts}) for {job.url}")
+        progress = {'pages_done': 0, 'row_count': 0}
+        listings = []
+        api_key = job.api_key or (server_api_key() if job.server_key else '')
+
+        async def scrape():
+            async with contextlib.aclosing(stream_listings(
+                job.url, job.page_count, api_key, EXTRACTION_SYSTEM_MESSAGE, job.fields, user=job.user or 'anonymous'
+            )) as events:
+                async for event in events:
+                    if event['event'] == 'page':
+                        progress['pages_done'] = event['page']
+                    elif event['event'] == 'rows':
+                        listings.extend(event['rows'])
+                        progress['row_count'] = len(listings)
+                    elif event['event'] == 'timings':
+                        logger.info(f"Job {job.pk} stage timings: {event['timings']}")
+
+        scrape_task = asyncio.ensure_future(asyncio.wait_for(scrape(), self.options['JOB_TIMEOUT']))
+        try:
+            while not scrape_task.done():
+                await asyncio.wait({scrape_task}, timeout=self.options['HEARTBEAT_SECONDS'])
+                if scrape_task.done():
+                    break
+                try:
+                    held = await _db(renew_lease, job.pk, self.name, **progress)
+                except DatabaseError as e:
+                    # Keep going; the lease only runs out if the database stays unreachable
+                    logger.warning(f"Could not renew lease of scrape job {job.pk}: {e}")
+                    continue
+                if not held:
+                    logger.info(f"Scrape job {job.pk} was cancelled or reclaimed, stopping it")
+                    scrape_task.cancel()
+                    await asyncio.gather(scrape_task, return_exceptions=True)
+                    return
+        except asyncio.CancelledError:
+            # The worker is shutting down: hand the job back to the queue right away
+            scrape_task.cancel()
+            await asyncio.gather(scrape_task, return_exceptions=True)
+            with contextlib.suppress(DatabaseError):
+                await _db(release_job, job.pk, self.name, 'The worker was stopped', job.api_key)
+            raise
+
+        try:
+            if scrape_task.exception() is None:
+                await _db(complete_job, job, self.name, listings, **progress)
+                logger.info(f"Scrape job {job.pk} succeeded with {len(listings)} rows")
+            else:
+                error = scrape_task.exception()
+                if isinstance(error, asyncio.TimeoutError):
+                    await _db(finish_job, job.pk, self.name, ScrapeJob.FAILED,
+                              error='The scrape took too long', **progress)
+                elif isinstance(error, ScraperError):
+                    # Bad input or credentials; retrying won't help
+                    await _db(finish_job, job.pk, self.name, ScrapeJob.FAILED, error=str(error), **progress)
+                else:
+                    logger.error(f"Scrape job {job.pk} failed: {error}", exc_info=error)
+                    await _db(release_job, job.pk, self.name, f'An unexpected error occurred: {str(error)}',
+                              job.api_key)
+        except DatabaseError as e:
+            # The lease runs out and the job is retried elsewhere
+            logger.error(f"Could not record the outcome of scrape job {job.pk}: {e}")
@@ -0,0 +1,136 @@
+# scraper_app/listing_parser.py
+import json
+import logging
+import re
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Characters that change the parser state outside and inside strings; everything else is skipped in one jump
+STRUCTURE = re.compile(r'["{}\[\]]')
+STRING_END = re.compile(r'["\\]')
+
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+REASONING_OPEN = '<think>'
+REASONING_CLOSE = '</think>'
+
+
+def _load_listing(text: str):
+    """Parse one listing object, forgiving trailing commas"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA.sub(r'\1', text))
+    except ValueError:
+        logger.warning(f"Skipping malformed listing: {text[:200]}")
+        return None
+
+
+class ListingParser:
+    """
+    Incremental, tolerant parser of the listings in a JSON completion.
+
+    Text is fed as it arrives. Each object directly inside the first array of
+    the completion (the "listings" array of {"listings": [...]}, or a bare
+    array) is parsed as soon as its closing brace arrives, so a truncated or
+    partly malformed completion still yields every listing that was complete.
+    Prose or code fences around the JSON and a leading <think> block of
+    reasoning models are ignored.
+    """
+    def __init__(self):
+        self.text = ''
+        self.listings = []
+        self.seen_array = False     # The listings array has started
+        self.complete = False       # ... and has been closed
+        self._position = 0
+        self._stack = []
+        self._in_string = False
+        self._records_depth = None
+        self._array_start = None
+        self._record_start = None
+        self._started = False
+
+    def feed(self, text: str) -> List[dict]:
+        """Add the next part of the completion and return the listings it completed"""
+        self.text += text
+        if not self._started:
+            head = self.text.lstrip()
+            if len(head) < len(REASONING_OPEN) and REASONING_OPEN.startswith(head):
+                return []
+            if head.startswith(REASONING_OPEN):
+                end = self.text.find(REASONING_CLOSE)
+                if end < 0:
+                    return []
+                self._position = end + len(REASONING_CLOSE)
+            self._started = True
+        return self._scan()
+
+    def _scan(self) -> List[dict]:
+        found = []
+        text = self.text
+        position = self._position
+        while not self.complete:
+            if self._in_string:
+                match = STRING_END.search(text, position)
+                if match is None:
+                    position = len(text)
+                    break
+                if match.group() == '\\':
+                    if match.end() >= len(text):
+                        # The escaped character has not arrived yet
+                        position = match.start()
+                        break
+                    position = match.end() + 1
+                    continue
+                self._in_string = False
+                position = match.end()
+                continue
+
+            match = STRUCTURE.search(text, position)
+            if match is None:
+                position = len(text)
+                break
+            char = match.group()
+            position = match.end()
+            if char == '"':
+                # Strings only matter inside the JSON; quotes in prose before it are ignored
+                self._in_string = bool(self._stack)
+            elif char in '{[':
+                if char == '{' and len(self._stack) == self._records_depth:
+                    self._record_start = match.start()
+                self._stack.append(char)
+                if char == '[' and self._records_depth is None:
+                    self._records_depth = len(self._stack)
+                    self._array_start = position
+                    self.seen_array = True
+            elif self._stack:
+                self._stack.pop()
+                if char == '}' and self._record_start is not None and len(self._stack) == self._records_depth:
+                    listing = _load_listing(text[self._record_start:position])
+                    self._record_start = None
+                    if isinstance(listing, dict):
+                        found.append(listing)
+                elif char == ']' and self._records_depth is not None and len(self._stack) < self._records_depth:
+                    if self.listings or found or not text[self._array_start:match.start()].strip():
+                        self.complete = True
+                    else:
+                        # Brackets without objects, like "[link](...)" in prose before the JSON
+                        self._records_depth = None
+                        self.seen_array = False
+        self._position = position
+        self.listings.extend(found)
+        return found
+
+    def finish(self) -> List[dict]:
+        """
+        Return all listings of the completion.
+
+        Raises:
+            ValueError: if the completion never started a listings array
+        """
+        if not self.seen_array:
+            raise ValueError("Missing 'listings' array")
+        return self.listings
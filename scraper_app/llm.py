@@ -0,0 +1,550 @@
+# scraper_app/llm.py
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from django.conf import settings
+from groq import AsyncGroq, Groq
+
+from .exceptions import ScraperError
+from .listing_parser import ListingParser
+from .llm_cache import get_extraction_cache
+from .metrics import add_timing, get_metrics
+from .model_router import ModelRouter
+
+logger = logging.getLogger(__name__)
+
+
+def groq_connection(api_key: str) -> Groq:
+    """Initialize Groq client with error handling"""
+    try:
+        return Groq(api_key=api_key)
+    except Exception as e:
+        logger.error(f"Error creating Groq client: {e}")
+        raise ScraperError(f"Failed to initialize Groq API: {str(e)}")
+
+
+def process_chunk(client: Groq, sys_message: str, chunk: str, fields: List[str]) -> List[dict]:
+    """Process a chunk of text using Groq API, with the model picked by the shared router"""
+    # Reuse a previous extraction of the identical chunk if we have one
+    cache = get_extraction_cache()
+    cached_listings = cache.get(sys_message, fields, chunk, EXTRACTION_MODELS)
+    if cached_listings is not None:
+        logger.info("Using cached extraction for chunk")
+        return cached_listings
+
+    # The router is shared with the async engine, so both see the same model health
+    engine = get_extraction_engine()
+    router = engine.router
+    api_key = getattr(client, 'api_key', '') or ''
+    messages = build_extraction_messages(sys_message, chunk, fields)
+    tokens = estimate_tokens(sys_message + messages[1]['content']) + engine.options['COMPLETION_TOKENS']
+    error_details = None
+    failed = ()
+    # This blocks a request thread, so the sleeps of all attempts share one budget
+    sleep_budget = min(router.options['MAX_WAIT'], router.options['MAX_SYNC_WAIT'])
+    retry_after = None
+
+    # Retry loop with a maximum of 3 attempts
+    for _ in range(3):
+        llm, wait = router.choose(api_key, tokens, exclude=failed)
+        if wait > sleep_budget:
+            retry_after = wait
+            break
+        if wait:
+            logger.info(f"Waiting {wait:.1f}s for model {llm}")
+            time.sleep(wait)
+            sleep_budget -= wait
+
+        if not router.begin_call(llm):
+            # Another call is probing the model's breaker; pick again
+            failed = (llm,)
+            continue
+
+        logger.info(f"Processing chunk with model {llm}")
+        started = time.monotonic()
+        try:
+            # Make API call to Groq
+            response = client.chat.completions.create(messages=messages, model=llm, temperature=0.1)
+        except Exception as e:
+            logger.error(f"Error in process_chunk: {e}")
+            error_details = _record_error(router, api_key, llm, e, time.monotonic() - started)
+            failed = (llm,)
+            continue
+
+        # Extract completion from response
+        completion = response.choices[0].message.content
+        logger.info(f"Raw LLM Response (truncated): {completion[:200]}...")
+
+        try:
+            # Clean and parse JSON response
+            listings = parse_listings(completion)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Error parsing response: {e}")
+            router.record_failure(llm, time.monotonic() - started)
+            error_details = {'error_type': 'parsing_error', 'message': str(e)}
+            failed = (llm,)
+            continue
+
+        router.record_success(llm, time.monotonic() - started, api_key)
+        if listings:
+            cache.set(sys_message, fields, chunk, llm, listings)
+        return listings
+
+    # If we exit the retry loop without success, raise an exception with error details
+    if retry_after is not None:
+        raise ScraperError(f"All models are rate limited or failing. Please try again in {math.ceil(retry_after)}s.")
+    if error_details is None:
+        raise ScraperError("All models are rate limited or failing. Please try again in a minute.")
+    if error_details['error_type'] != 'parsing_error':
+        raise ScraperError(error_details['message'])
+    return []
+
+
+# System prompt for listing extraction
+EXTRACTION_SYSTEM_MESSAGE = """
+                You are a data extraction expert. Extract structured information from the given text.
+                Return ONLY a valid JSON object containing the requested fields.
+                The response MUST be in this exact format, with no additional text:
+                {"listings": [{"field1": "value1", "field2": "value2"}, ...]}
+                Each listing must include all requested fields. Use an empty string if a field is not found.
+                Ensure all quotes are double quotes and there are no trailing commas.
+                """
+
+# Models the router picks from; ties in expected latency go to the earlier one
+EXTRACTION_MODELS = [
+    'llama-3.3-70b-versatile',
+    'llama-3.1-70b-versatile',
+    'llama-3.3-70b-specdec',
+    'llama3-70b-8192',
+    'deepseek-r1-distill-llama-70b',
+]
+
+# Context windows (prompt + completion tokens) of the extraction models
+MODEL_CONTEXT_TOKENS = {
+    'llama-3.3-70b-versatile': 128000,
+    'llama-3.1-70b-versatile': 128000,
+    'llama-3.3-70b-specdec': 8192,
+    'llama3-70b-8192': 8192,
+    'deepseek-r1-distill-llama-70b': 128000,
+}
+
+DEFAULT_LLM_SETTINGS = {
+    'MAX_CONCURRENCY': 8,           # Concurrent LLM calls per worker process
+    'REQUESTS_PER_MINUTE': 30,      # Request quota per API key
+    'TOKENS_PER_MINUTE': 15000,     # Token quota per API key
+    'COMPLETION_TOKENS': 2048,      # Completion tokens reserved per call until usage is known
+    'MAX_CLIENTS': 32,              # Cached AsyncGroq clients (one per API key)
+    'OUTPUT_MODE': 'stream',        # 'stream': parse listings as they arrive; 'json': Groq JSON mode (not streamable)
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for English text (roughly four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def listing_schema(fields: List[str]) -> dict:
+    """JSON schema of the completion: a listings array of objects with every field as a string"""
+    return {
+        'type': 'object',
+        'properties': {'listings': {'type': 'array', 'items': {
+            'type': 'object',
+            'properties': {field: {'type': 'string'} for field in fields},
+            'required': list(fields),
+        }}},
+        'required': ['listings'],
+    }
+
+
+def build_extraction_messages(sys_message: str, chunk: str, fields: List[str]) -> List[dict]:
+    """Build the chat messages asking the model to extract fields from a chunk"""
+    return [
+        {"role": "system", "content": sys_message},
+        {"role": "user", "content": (
+            f'Extract these fields from the text: {", ".join(fields)}.\n'
+            f'Return JSON matching this schema: {json.dumps(listing_schema(fields), separators=(",", ":"))}\n'
+            f'Content:\n{chunk}'
+        )}
+    ]
+
+
+def parse_listings(completion: str) -> List[dict]:
+    """Parse every complete listing out of a completion, raising ValueError if it has no listings array"""
+    parser = ListingParser()
+    parser.feed(completion)
+    return parser.finish()
+
+
+def _failed_generation(e: Exception) -> Optional[str]:
+    """The output Groq rejected in JSON mode (json_validate_failed), which often holds usable listings"""
+    body = getattr(e, 'body', None)
+    error = body.get('error', body) if isinstance(body, dict) else None
+    return error.get('failed_generation') if isinstance(error, dict) else None
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at capacity / period.
+
+    Waiters are served first come, first served. Usage reported after the fact
+    can push the balance below zero, which delays later callers accordingly.
+    """
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) tokens once actual usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute quotas for a single API key"""
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        try:
+            await self.tokens.acquire(tokens)
+        except asyncio.CancelledError:
+            self.requests.adjust(-1)
+            raise
+
+    def release(self, tokens: int):
+        """Hand back a reservation that was never used for a call"""
+        self.requests.adjust(-1)
+        self.tokens.adjust(-tokens)
+
+
+class FairScheduler:
+    """
+    A concurrency limit whose free slots are handed out round-robin across users,
+    so one large scrape cannot starve everybody else's chunks.
+    """
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._queues = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, user: str):
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(future)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the cancellation arrived
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.active < self.max_concurrency and self._queues:
+            user, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            # Move the user to the back of the line
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            if future.done():
+                continue
+            future.set_result(None)
+            self.active += 1
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """Read the retry-after hint of a Groq rate-limit error, if any"""
+    response = getattr(e, 'response', None)
+    header = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        match = re.search(r'try again in ([\d.]+)s', str(e))
+        return float(match.group(1)) if match else None
+
+
+def _record_error(router: ModelRouter, api_key: str, llm: str, e: Exception, latency: float) -> dict:
+    """
+    Classify a failed API call and report it to the router.
+
+    Rate limits park the model for this API key only; other errors count
+    against the model's health and may open its circuit breaker.
+
+    Returns:
+        dict: error_type and a message for the user
+
+    Raises:
+        ScraperError: for errors no other model can fix (bad API key, exhausted quota)
+    """
+    error_message = str(e).lower()
+    if "invalid_api_key" in error_message or "authentication" in error_message:
+        raise ScraperError('Invalid API key. Please check your API key and try again.')
+    if "insufficient_quota" in error_message:
+        raise ScraperError('API quota exceeded. Please check your subscription or switch to a different API key.')
+
+    if "rate_limit" in error_message or "429" in error_message:
+        wait = router.record_rate_limit(api_key, llm, _retry_after(e))
+        return {
+            'error_type': 'rate_limit',
+            'message': f'Rate limit reached. Please wait {wait:.0f}s or switch to a custom API key.'
+        }
+
+    router.record_failure(llm, latency)
+    if "503" in error_message:
+        return {
+            'error_type': 'unavailable',
+            'message': 'Groq API is temporarily unavailable. Please try again in a few minutes.'
+        }
+    if "400" in error_message or "bad request" in error_message:
+        return {
+            'error_type': 'bad_request',
+            'message': f'Bad request error. Please check your input format. Details: {str(e)}'
+        }
+    return {'error_type': 'general_error', 'message': f'An error occurred: {str(e)}'}
+
+
+def _observe_call(llm: str, outcome: str, latency: float, usage=None):
+    """Count an LLM call, its latency and tokens in the metrics and the current scrape's timings"""
+    metrics = get_metrics()
+    metrics.observe('unscraper_llm_call_seconds', latency, model=llm, outcome=outcome)
+    metrics.inc('unscraper_llm_calls_total', model=llm, outcome=outcome)
+    if usage is not None:
+        for direction in ('prompt', 'completion'):
+            tokens = getattr(usage, f'{direction}_tokens', None)
+            if tokens:
+                metrics.inc('unscraper_llm_tokens_total', tokens, model=llm, direction=direction)
+    add_timing('llm', latency)
+
+
+class ExtractionEngine:
+    """
+    Runs chunk extraction on the async Groq client.
+
+    All calls in the worker process share one fair scheduler (bounding concurrent
+    calls) and a rate limiter per API key sized to its RPM/TPM quotas, so
+    simultaneous scrapes queue up instead of stampeding the API into 429s.
+    Models are picked per call by a ModelRouter from their recent latency,
+    errors and rate limits (see model_router.py).
+    Completions are streamed and their listings parsed as they arrive (see
+    listing_parser.py), so a cut-off or slightly malformed completion keeps
+    its complete listings instead of costing another call.
+    Must be used from the background loop (see runtime.py).
+    """
+    def __init__(self, **options):
+        self.options = {**DEFAULT_LLM_SETTINGS, **options}
+        self.scheduler = FairScheduler(self.options['MAX_CONCURRENCY'])
+        self.router = ModelRouter(EXTRACTION_MODELS, MODEL_CONTEXT_TOKENS, **getattr(settings, 'LLM_ROUTER', {}))
+        self._limiters = {}
+        self._clients = OrderedDict()
+
+    def client(self, api_key: str) -> AsyncGroq:
+        """Return a cached AsyncGroq client for an API key"""
+        if api_key in self._clients:
+            self._clients.move_to_end(api_key)
+            return self._clients[api_key]
+        try:
+            client = AsyncGroq(api_key=api_key)
+        except Exception as e:
+            logger.error(f"Error creating Groq client: {e}")
+            raise ScraperError(f"Failed to initialize Groq API: {str(e)}")
+        self._clients[api_key] = client
+        while len(self._clients) > self.options['MAX_CLIENTS']:
+            self._clients.popitem(last=False)
+        return client
+
+    def limiter(self, api_key: str) -> RateLimiter:
+        if api_key not in self._limiters:
+            self._limiters[api_key] = RateLimiter(
+                self.options['REQUESTS_PER_MINUTE'], self.options['TOKENS_PER_MINUTE']
+            )
+        return self._limiters[api_key]
+
+    @asynccontextmanager
+    async def _reserved_slot(self, limiter: RateLimiter, tokens: int, user: str):
+        """
+        Reserve the API key's quota, then a scheduler slot for the call.
+
+        The quota comes first so a key that is out of quota waits without
+        holding a slot other keys could use. If the caller is cancelled while
+        waiting for the slot, the reservation is handed back.
+        """
+        await limiter.acquire(tokens)
+        granted = False
+        try:
+            async with self.scheduler.slot(user):
+                granted = True
+                yield
+        except asyncio.CancelledError:
+            if not granted:
+                limiter.release(tokens)
+            raise
+
+    async def _complete(self, client: AsyncGroq, llm: str, messages: List[dict]) -> tuple:
+        """
+        Run one completion, parsing listings while it is generated.
+
+        Returns:
+            tuple: the ListingParser fed with the completion, token usage (or None) and finish reason
+        """
+        parser = ListingParser()
+        if self.options['OUTPUT_MODE'] != 'stream':
+            response = await client.chat.completions.create(
+                messages=messages, model=llm, temperature=0.1, response_format={'type': 'json_object'}
+            )
+            parser.feed(response.choices[0].message.content or '')
+            return parser, getattr(response, 'usage', None), response.choices[0].finish_reason
+
+        stream = await client.chat.completions.create(messages=messages, model=llm, temperature=0.1, stream=True)
+        usage = finish_reason = None
+        async for part in stream:
+            if part.choices:
+                parser.feed(part.choices[0].delta.content or '')
+                finish_reason = part.choices[0].finish_reason or finish_reason
+            # Groq reports usage on the last part of a stream
+            x_groq = getattr(part, 'x_groq', None)
+            usage = getattr(x_groq, 'usage', None) or usage
+        return parser, usage, finish_reason
+
+    async def extract(self, client: AsyncGroq, api_key: str, sys_message: str, chunk: str,
+                      fields: List[str], user: str = 'anonymous') -> List[dict]:
+        """Extract listings from one chunk on the model the router picks, switching models on failures"""
+        cache = get_extraction_cache()
+        cached_listings = await cache.aget(sys_message, fields, chunk, EXTRACTION_MODELS)
+        if cached_listings is not None:
+            logger.info("Using cached extraction for chunk")
+            return cached_listings
+
+        messages = build_extraction_messages(sys_message, chunk, fields)
+        reserved_tokens = estimate_tokens(sys_message + messages[1]['content']) + self.options['COMPLETION_TOKENS']
+        limiter = self.limiter(api_key)
+
+        error_details = None
+        failed = ()
+        for attempt in range(3):
+            llm, wait = self.router.choose(api_key, reserved_tokens, exclude=failed)
+            if wait > self.router.options['MAX_WAIT']:
+                break
+            if attempt:
+                get_metrics().inc('unscraper_llm_retries_total', model=llm)
+            if wait:
+                # Wait outside the scheduler, so the slot serves other calls meanwhile
+                logger.info(f"Waiting {wait:.1f}s for model {llm}")
+                await asyncio.sleep(wait)
+
+            async with self._reserved_slot(limiter, reserved_tokens, user):
+                if not self.router.begin_call(llm):
+                    # Another call is probing the model's breaker; pick again
+                    limiter.release(reserved_tokens)
+                    failed = (llm,)
+                    continue
+                started = time.monotonic()
+                try:
+                    logger.info(f"Processing chunk with model {llm}")
+                    parser, usage, finish_reason = await self._complete(client, llm, messages)
+                except Exception as e:
+                    generation = _failed_generation(e)
+                    if generation is None:
+                        limiter.tokens.adjust(-reserved_tokens)
+                        logger.error(f"Error in extraction: {e}")
+                        latency = time.monotonic() - started
+                        details = None
+                        try:
+                            details = _record_error(self.router, api_key, llm, e, latency)
+                        finally:
+                            rate_limited = details is not None and details['error_type'] == 'rate_limit'
+                            _observe_call(llm, 'rate_limited' if rate_limited else 'error', latency)
+                        error_details = details
+                        failed = (llm,)
+                        continue
+                    # JSON mode rejected slightly malformed output; the tolerant parser can still use it
+                    logger.warning(f"Model {llm} produced invalid JSON, parsing what it generated")
+                    parser, usage, finish_reason = ListingParser(), None, None
+                    parser.feed(generation)
+            latency = time.monotonic() - started
+
+            # Settle the token reservation against what was actually used
+            if usage is not None and getattr(usage, 'total_tokens', None):
+                limiter.tokens.adjust(usage.total_tokens - reserved_tokens)
+
+            logger.info(f"Raw LLM Response (truncated): {parser.text[:200]}...")
+            try:
+                listings = parser.finish()
+            except ValueError as e:
+                logger.error(f"Error parsing response: {e}")
+                _observe_call(llm, 'parse_error', latency, usage)
+                get_metrics().inc('unscraper_llm_parse_failures_total', model=llm)
+                self.router.record_failure(llm, latency)
+                error_details = {'error_type': 'parsing_error', 'message': str(e)}
+                failed = (llm,)
+                continue
+
+            _observe_call(llm, 'ok', latency, usage)
+            self.router.record_success(llm, latency, api_key)
+            if not parser.complete:
+                # Retrying would be cut off the same way; keep the listings that were complete
+                logger.warning(f"Completion of {llm} ended early ({finish_reason}); kept {len(listings)} listings")
+            elif listings:
+                await cache.aset(sys_message, fields, chunk, llm, listings)
+            return listings
+
+        if error_details is None:
+            raise ScraperError("All models are rate limited or failing. Please try again in a minute.")
+        if error_details['error_type'] != 'parsing_error':
+            raise ScraperError(error_details['message'])
+        return []
+
+
+_extraction_engine = None
+_extraction_engine_pid = None
+
+
+def get_extraction_engine() -> ExtractionEngine:
+    """Return the process-wide extraction engine configured from settings.LLM"""
+    global _extraction_engine, _extraction_engine_pid
+    if _extraction_engine is None or _extraction_engine_pid != os.getpid():
+        _extraction_engine = ExtractionEngine(**getattr(settings, 'LLM', {}))
+        _extraction_engine_pid = os.getpid()
+    return _extraction_engine
+
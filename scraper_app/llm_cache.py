@@ -0,0 +1,205 @@
+# scraper_app/llm_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'TTL': 7 * 24 * 3600,                 # Seconds an extraction stays valid
+    'MEMORY_ENTRIES': 512,                # In-memory LRU tier size
+    'MAX_DB_ENTRIES': 20000,              # Persistent tier size limits
+    'MAX_DB_BYTES': 200 * 1024 * 1024,
+    'EVICT_EVERY': 100,                   # Check persistent limits every N writes
+}
+
+
+def extraction_key(sys_message: str, fields: List[str], chunk: str, model: str) -> str:
+    """Hash everything that determines an extraction result"""
+    digest = hashlib.sha256()
+    for part in (sys_message, '\x1f'.join(fields), chunk, model):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of LLM extraction results.
+
+    A bounded in-memory LRU sits in front of ExtractionCacheEntry rows in the
+    project database. Entries expire after TTL seconds; the database tier is
+    trimmed to MAX_DB_ENTRIES / MAX_DB_BYTES by least recent use.
+    """
+    def __init__(self, **options):
+        self.options = {**DEFAULT_CACHE_SETTINGS, **options}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.options['ENABLED']
+
+    def get(self, sys_message: str, fields: List[str], chunk: str, models: List[str]) -> Optional[List[dict]]:
+        """Return cached listings produced by any of the given models, or None"""
+        if not self.enabled:
+            return None
+        keys = [extraction_key(sys_message, fields, chunk, model) for model in models]
+
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                expires_at, payload = entry
+                if expires_at < now:
+                    del self._memory[key]
+                    continue
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                break
+            else:
+                payload = None
+        if payload is not None:
+            # Every hit gets its own rows, so callers may change them
+            return json.loads(payload)
+
+        listings = self._get_from_db(keys)
+        with self._lock:
+            self.counters['db_hits' if listings is not None else 'misses'] += 1
+        return listings
+
+    def set(self, sys_message: str, fields: List[str], chunk: str, model: str, listings: List[dict]):
+        """Store listings extracted by a model in both tiers"""
+        if not self.enabled:
+            return
+        key = extraction_key(sys_message, fields, chunk, model)
+        payload = json.dumps(listings)
+        self._remember(key, payload, time.time() + self.options['TTL'])
+
+        now = timezone.now()
+        try:
+            ExtractionCacheEntry.objects.update_or_create(key=key, defaults={
+                'model': model,
+                'listings': payload,
+                'size': len(payload),
+                'created_at': now,
+                'last_used_at': now,
+            })
+        except DatabaseError as e:
+            logger.warning(f"Could not persist extraction cache entry: {e}")
+            return
+
+        with self._lock:
+            self.counters['sets'] += 1
+            self._writes += 1
+            evict = self._writes % self.options['EVICT_EVERY'] == 0
+        if evict:
+            self.evict()
+
+    async def aget(self, *args) -> Optional[List[dict]]:
+        return await asyncio.to_thread(self.get, *args)
+
+    async def aset(self, *args):
+        await asyncio.to_thread(self.set, *args)
+
+    def evict(self):
+        """Drop expired rows and trim the persistent tier to its size limits"""
+        try:
+            cutoff = timezone.now() - timedelta(seconds=self.options['TTL'])
+            evicted, _ = ExtractionCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+            entries = ExtractionCacheEntry.objects.order_by('-last_used_at')
+            extra = entries.count() - self.options['MAX_DB_ENTRIES']
+            if extra > 0:
+                stale = list(entries.reverse().values_list('key', flat=True)[:extra])
+                evicted += ExtractionCacheEntry.objects.filter(key__in=stale).delete()[0]
+
+            total_bytes = entries.aggregate(total=Sum('size'))['total'] or 0
+            if total_bytes > self.options['MAX_DB_BYTES']:
+                # Walk from the least recently used entry until enough bytes are freed
+                excess = total_bytes - self.options['MAX_DB_BYTES']
+                stale = []
+                for key, size in entries.reverse().values_list('key', 'size').iterator():
+                    if excess <= 0:
+                        break
+                    stale.append(key)
+                    excess -= size
+                evicted += ExtractionCacheEntry.objects.filter(key__in=stale).delete()[0]
+        except DatabaseError as e:
+            logger.warning(f"Extraction cache eviction failed: {e}")
+            return
+
+        with self._lock:
+            self.counters['evictions'] += evicted
+        if evicted:
+            logger.info(f"Evicted {evicted} extraction cache entries")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the in-memory tier size"""
+        with self._lock:
+            lookups = self.counters['memory_hits'] + self.counters['db_hits'] + self.counters['misses']
+            hits = self.counters['memory_hits'] + self.counters['db_hits']
+            return {
+                **self.counters,
+                'memory_entries': len(self._memory),
+                'hit_rate': hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, payload: str, expires_at: float):
+        # The memory tier keeps serialized listings, like the database tier
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.options['MEMORY_ENTRIES']:
+                self._memory.popitem(last=False)
+
+    def _get_from_db(self, keys: List[str]) -> Optional[List[dict]]:
+        cutoff = timezone.now() - timedelta(seconds=self.options['TTL'])
+        try:
+            rows = {
+                entry.key: entry for entry in
+                ExtractionCacheEntry.objects.filter(key__in=keys, created_at__gte=cutoff)
+            }
+            for key in keys:
+                entry = rows.get(key)
+                if entry is None:
+                    continue
+                ExtractionCacheEntry.objects.filter(key=key).update(
+                    hits=F('hits') + 1, last_used_at=timezone.now()
+                )
+                listings = json.loads(entry.listings)
+                expires_at = entry.created_at.timestamp() + self.options['TTL']
+                self._remember(key, entry.listings, expires_at)
+                return listings
+        except (DatabaseError, ValueError) as e:
+            logger.warning(f"Extraction cache lookup failed: {e}")
+        return None
+
+
+_extraction_cache = None
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Return the process-wide extraction cache configured from settings.LLM_CACHE"""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(**getattr(settings, 'LLM_CACHE', {}))
+    return _extraction_cache
@@ -0,0 +1,295 @@
+# scraper_app/loadtest.py
+import csv
+import io
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .benchmark import BENCHMARK_FIELDS, listing_price
+
+try:
+    import psutil
+except ImportError:  # Process counts and memory are left out of the timeline
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ('scrape', 'csv', 'json', 'upload')
+
+# Process names of the browsers Playwright launches
+CHROMIUM_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def sample_rows(count: int) -> List[dict]:
+    """Listing rows like a scrape of the fixture sites returns"""
+    colours = ('black', 'white', 'red', 'blue')
+    return [
+        {'name': f'Benchmark item {index}', 'price': f'${listing_price(index)}', 'colour': colours[index % 4]}
+        for index in range(count)
+    ]
+
+
+class Workload:
+    """
+    The requests virtual users send, as the browser UI sends them.
+
+    Scrapes post the index form in NDJSON streaming mode and read the stream to
+    its 'done' or 'error' event; exports post JSON rows to /download/csv/ and
+    /download/json/; uploads post a CSV file to /upload/. Every call returns
+    None on success or a short error description.
+    """
+    def __init__(self, base_url: str, sites: List[Tuple[str, int]], api_key: str = 'loadtest-key',
+                 export_rows: int = 500, upload_rows: int = 2000):
+        self.base_url = base_url.rstrip('/')
+        self.sites = sites
+        self.api_key = api_key
+        self.export_body = json.dumps({'rows': sample_rows(export_rows)})
+        upload = io.StringIO()
+        writer = csv.DictWriter(upload, fieldnames=['name', 'price', 'colour'])
+        writer.writeheader()
+        writer.writerows(sample_rows(upload_rows))
+        self.upload_file = upload.getvalue().encode()
+
+    def session(self, user: int) -> requests.Session:
+        """A session for one virtual user, with its own CSRF token and client address"""
+        session = requests.Session()
+        # The app shares LLM capacity fairly between client addresses; servers believe this
+        # header only when the load test's address is in their TRUSTED_PROXIES
+        session.headers['X-Forwarded-For'] = f'10.{user // 65536 % 256}.{user // 256 % 256}.{user % 256}'
+        response = session.get(self.base_url + '/', timeout=60)
+        response.raise_for_status()
+        session.headers['X-CSRFToken'] = session.cookies.get('csrftoken', '')
+        return session
+
+    def scrape(self, session: requests.Session, user: int) -> Optional[str]:
+        url, page_count = self.sites[user % len(self.sites)]
+        form = {
+            'url': url,
+            'groq_api_key': self.api_key,
+            'fields': ','.join(BENCHMARK_FIELDS),
+            'page_count': page_count,
+            'stream': 'ndjson',
+        }
+        with session.post(self.base_url + '/', data=form, stream=True, timeout=600) as response:
+            if response.status_code != 200:
+                return f'HTTP {response.status_code}'
+            last = None
+            for line in response.iter_lines():
+                if line:
+                    last = json.loads(line)
+        if last is None or last.get('event') != 'done':
+            return (last or {}).get('message', 'stream ended without a result')[:120]
+        return None
+
+    def export(self, session: requests.Session, export_format: str) -> Optional[str]:
+        response = session.post(
+            f'{self.base_url}/download/{export_format}/', data=self.export_body,
+            headers={'Content-Type': 'application/json'}, timeout=120,
+        )
+        if response.status_code != 200:
+            return f'HTTP {response.status_code}'
+        return None if response.content else 'empty export'
+
+    def upload(self, session: requests.Session) -> Optional[str]:
+        response = session.post(
+            self.base_url + '/upload/', files={'file': ('loadtest.csv', self.upload_file, 'text/csv')}, timeout=300,
+        )
+        if response.status_code != 200:
+            return f'HTTP {response.status_code}'
+        return None if response.json().get('status') == 'success' else response.json().get('message', 'failed')[:120]
+
+    def call(self, endpoint: str, session: requests.Session, user: int) -> Optional[str]:
+        if endpoint == 'scrape':
+            return self.scrape(session, user)
+        if endpoint == 'upload':
+            return self.upload(session)
+        return self.export(session, endpoint)
+
+
+class ProcessMonitor:
+    """Samples Chromium processes on this machine and the memory of the server's worker processes"""
+    def __init__(self, server_pid: int = None):
+        self.server_pid = server_pid
+
+    def sample(self) -> dict:
+        if psutil is None:
+            return {}
+        chromium = []
+        for process in psutil.process_iter(['name']):
+            name = (process.info['name'] or '').lower()
+            if any(browser in name for browser in CHROMIUM_NAMES):
+                chromium.append(process)
+        # Browser processes launched by the pool (renderers, GPU, ...) all count
+        sample = {
+            'chromium_processes': len(chromium),
+            'chromium_rss_mb': round(sum(self._rss(process) for process in chromium) / (1024 * 1024), 1),
+        }
+        if self.server_pid is not None:
+            try:
+                server = psutil.Process(self.server_pid)
+                workers = [server] + [
+                    process for process in server.children(recursive=True)
+                    if not any(browser in process.name().lower() for browser in CHROMIUM_NAMES)
+                ]
+            except psutil.Error:
+                workers = []
+            sample['server_processes'] = len(workers)
+            sample['server_rss_mb'] = round(sum(self._rss(process) for process in workers) / (1024 * 1024), 1)
+        return sample
+
+    @staticmethod
+    def _rss(process) -> int:
+        try:
+            return process.memory_info().rss
+        except psutil.Error:
+            return 0
+
+
+class LoadTest:
+    """
+    Drive the endpoints with concurrent virtual users for a fixed time.
+
+    Users start evenly spread over the ramp-up, so the timeline shows how
+    throughput, latency and errors change as concurrency grows. Each user
+    picks endpoints at random according to the mix, one request at a time.
+    """
+    def __init__(self, workload: Workload, mix: Dict[str, float], users: int, duration: float,
+                 ramp_up: float = 0.0, seed: int = 0):
+        self.workload = workload
+        self.mix = {endpoint: weight for endpoint, weight in mix.items() if weight > 0}
+        self.users = users
+        self.duration = duration
+        self.ramp_up = min(ramp_up, duration)
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._samples: List[tuple] = []      # endpoint, finished (seconds since start), latency, error
+        self._active = 0
+        self._in_flight = 0
+
+    def _record(self, endpoint: str, finished: float, latency: float, error: Optional[str]):
+        with self._lock:
+            self._samples.append((endpoint, finished, latency, error))
+
+    def _user(self, user: int, started: float, deadline: float):
+        time.sleep(self.ramp_up * user / max(1, self.users))
+        choice = random.Random(self.seed + user)
+        endpoints, weights = list(self.mix), list(self.mix.values())
+        with self._lock:
+            self._active += 1
+        try:
+            try:
+                session = self.workload.session(user)
+            except Exception as e:
+                self._record('session', time.monotonic() - started, 0.0, f'{type(e).__name__}: {e}'[:120])
+                return
+            while time.monotonic() < deadline:
+                endpoint = choice.choices(endpoints, weights)[0]
+                with self._lock:
+                    self._in_flight += 1
+                request_started = time.monotonic()
+                try:
+                    error = self.workload.call(endpoint, session, user)
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'[:120]
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+                finished = time.monotonic()
+                self._record(endpoint, finished - started, finished - request_started, error)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def run(self, monitor: ProcessMonitor = None, interval: float = 5.0,
+            on_interval: Callable[[dict], None] = None) -> dict:
+        """
+        Run the load test and summarize it.
+
+        Args:
+            monitor: samples browser and server processes at every interval
+            on_interval: called with every timeline point as it is taken
+
+        Returns:
+            dict: 'endpoints' and 'overall' summaries (throughput, latency percentiles,
+            error rate, most common errors) and the 'timeline' sampled every interval
+        """
+        started = time.monotonic()
+        deadline = started + self.duration
+        threads = [
+            threading.Thread(target=self._user, args=(user, started, deadline), daemon=True)
+            for user in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+
+        timeline = []
+        seen = 0
+        last_point = started
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(max(0.0, last_point + interval - time.monotonic()))
+            now, last_point = time.monotonic(), max(last_point + interval, time.monotonic())
+            with self._lock:
+                recent = self._samples[seen:]
+                seen = len(self._samples)
+                point = {
+                    'elapsed': round(now - started, 1),
+                    'active_users': self._active,
+                    'in_flight': self._in_flight,
+                }
+            latencies = [latency for _, _, latency, error in recent if error is None]
+            point.update({
+                'completed': len(recent),
+                'errors': sum(1 for *_, error in recent if error is not None),
+                'throughput': round(len(recent) / interval, 2),
+                'p50': percentile(latencies, 0.5),
+                'p99': percentile(latencies, 0.99),
+                **(monitor.sample() if monitor is not None else {}),
+            })
+            timeline.append(point)
+            if on_interval is not None:
+                on_interval(point)
+
+        elapsed = time.monotonic() - started
+        by_endpoint = {}
+        for endpoint, _, latency, error in self._samples:
+            by_endpoint.setdefault(endpoint, []).append((latency, error))
+        return {
+            'users': self.users,
+            'duration': round(elapsed, 1),
+            'mix': self.mix,
+            'endpoints': {endpoint: self._summary(results, elapsed) for endpoint, results in sorted(by_endpoint.items())},
+            'overall': self._summary([(latency, error) for _, _, latency, error in self._samples], elapsed),
+            'timeline': timeline,
+        }
+
+    @staticmethod
+    def _summary(results: List[tuple], elapsed: float) -> dict:
+        latencies = [latency for latency, error in results if error is None]
+        errors = Counter(error for _, error in results if error is not None)
+        return {
+            'requests': len(results),
+            'errors': sum(errors.values()),
+            'error_rate': round(sum(errors.values()) / len(results), 4) if results else 0.0,
+            'throughput': round(len(results) / elapsed, 3) if elapsed else 0.0,
+            **{name: round(value, 4) if value is not None else None for name, value in (
+                ('p50', percentile(latencies, 0.5)),
+                ('p90', percentile(latencies, 0.9)),
+                ('p99', percentile(latencies, 0.99)),
+                ('max', max(latencies) if latencies else None),
+            )},
+            'top_errors': errors.most_common(5),
+        }
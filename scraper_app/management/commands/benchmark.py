@@ -0,0 +1,183 @@
+# scraper_app/management/commands/benchmark.py
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from scraper_app.benchmark import (
+    BENCHMARK_FIELDS, FIXTURE_SITES, FakeLLMServer, FixtureSites, compare, fixture_page, git_commit, listing_price,
+    measure,
+)
+from scraper_app.chunking import chunk_content
+from scraper_app.cleaning import clean_html
+from scraper_app.llm import EXTRACTION_SYSTEM_MESSAGE, groq_connection, process_chunk
+from scraper_app.prices import parse_price_fields
+from scraper_app.views import fetch_and_clean_html
+
+BENCHMARKS = ('prices', 'process_chunk', 'fetch', 'scrape')
+
+# Quotas of the real API would throttle the benchmark itself; the fake server injects 429s instead
+UNLIMITED_QUOTAS = {'REQUESTS_PER_MINUTE': 10 ** 6, 'TOKENS_PER_MINUTE': 10 ** 9}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the scraper offline: local fixture sites (static, lazy-loaded, paginated, infinite scroll) '
+            'and a fake Groq-compatible LLM server, results saved as JSON for comparison across commits')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                            help=f"Comma-separated benchmarks to run (default: {','.join(BENCHMARKS)})")
+        parser.add_argument('--sites', default=','.join(FIXTURE_SITES),
+                            help=f"Comma-separated fixture sites for fetch and scrape (default: {','.join(FIXTURE_SITES)})")
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark; the median wall time is kept')
+        parser.add_argument('--llm-latency', type=float, default=0.2, help='Fake LLM seconds before the first token')
+        parser.add_argument('--llm-tokens-per-second', type=float, default=400, help='Fake LLM generation speed')
+        parser.add_argument('--llm-429-rate', type=float, default=0.0, help='Share of fake LLM calls answered with 429')
+        parser.add_argument('--llm-malformed-rate', type=float, default=0.0,
+                            help='Share of fake LLM completions that are truncated or malformed')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the fake LLM failure injection')
+        parser.add_argument('--rules', action='store_true',
+                            help='Let learned extraction rules replace LLM calls (off: every page goes to the LLM)')
+        parser.add_argument('--output', help='Result file (default: benchmark_results/<time>-<commit>.json)')
+        parser.add_argument('--compare', help='Earlier result file to compare the wall times with')
+
+    def handle(self, *args, **options):
+        benchmarks = [name.strip() for name in options['benchmarks'].split(',') if name.strip()]
+        sites = [name.strip() for name in options['sites'].split(',') if name.strip()]
+        unknown = [name for name in benchmarks if name not in BENCHMARKS] + [
+            name for name in sites if name not in FIXTURE_SITES]
+        if unknown:
+            raise CommandError(f"Unknown benchmarks or sites: {', '.join(unknown)}")
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        llm_options = {
+            'LATENCY': options['llm_latency'],
+            'TOKENS_PER_SECOND': options['llm_tokens_per_second'],
+            'RATE_LIMIT_RATE': options['llm_429_rate'],
+            'MALFORMED_RATE': options['llm_malformed_rate'],
+            'SEED': options['seed'],
+        }
+        results = {
+            'commit': git_commit(settings.BASE_DIR),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'repeat': options['repeat'],
+            'fake_llm': llm_options,
+            'rules': options['rules'],
+            'benchmarks': [],
+        }
+
+        # Results go to a throwaway database and state directory, and nothing is served from caches
+        setup_test_environment()
+        old_database = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        overrides = override_settings(
+            SCRAPER_STATE_DIR=tempfile.mkdtemp(prefix='unscraper-benchmark-'),
+            LLM={**getattr(settings, 'LLM', {}), **UNLIMITED_QUOTAS},
+            LLM_CACHE={**getattr(settings, 'LLM_CACHE', {}), 'ENABLED': False},
+            SNAPSHOT_CACHE={**getattr(settings, 'SNAPSHOT_CACHE', {}), 'ENABLED': False},
+            EXTRACTION_RULES={**getattr(settings, 'EXTRACTION_RULES', {}), 'ENABLED': options['rules']},
+        )
+        overrides.enable()
+        base_url = os.environ.get('GROQ_BASE_URL')
+        try:
+            with FixtureSites() as fixtures, FakeLLMServer(**llm_options) as llm:
+                # Groq clients are created lazily, so they all talk to the fake server
+                os.environ['GROQ_BASE_URL'] = llm.url
+                for name in benchmarks:
+                    for result in getattr(self, f'benchmark_{name}')(fixtures, llm, sites, options['repeat']):
+                        results['benchmarks'].append(result)
+                        self.report(result)
+        finally:
+            if base_url is None:
+                os.environ.pop('GROQ_BASE_URL', None)
+            else:
+                os.environ['GROQ_BASE_URL'] = base_url
+            overrides.disable()
+            connection.creation.destroy_test_db(old_database, verbosity=0)
+            teardown_test_environment()
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmark_results',
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f'Results written to {output}')
+
+        if baseline is not None:
+            self.stdout.write(f"Compared with {options['compare']} (commit {baseline.get('commit', 'unknown')}):")
+            for line in compare(results, baseline):
+                self.stdout.write(line)
+
+    def report(self, result: dict):
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f"{result['name']}: failed ({result['error']})"))
+            return
+        calls = sum(result['llm_calls'].values())
+        self.stdout.write(
+            f"{result['name']}: {result['wall_seconds']:.3f}s median of {result['runs']}, "
+            f"{result['rows'] if result['rows'] is not None else '-'} rows, {calls} LLM calls, "
+            f"peak RSS {result['peak_rss_mb']} MB"
+        )
+
+    def benchmark_prices(self, fixtures, llm, sites, repeat):
+        """Price normalization of a large result set"""
+        rows = [{'name': f'Benchmark item {index}', 'price': f'${listing_price(index)}'} for index in range(5000)]
+
+        def target():
+            return len(parse_price_fields({'rows': rows})['rows'])
+
+        yield measure('parse_price_fields', target, repeat=repeat, function='parse_price_fields', input_rows=len(rows))
+
+    def benchmark_process_chunk(self, fixtures, llm, sites, repeat):
+        """Synchronous extraction of every chunk of the static fixture page"""
+        chunks = [chunk.text for chunk in chunk_content(clean_html(fixture_page('static')))]
+
+        def target():
+            client = groq_connection('benchmark-key')
+            return sum(len(process_chunk(client, EXTRACTION_SYSTEM_MESSAGE, chunk, BENCHMARK_FIELDS))
+                       for chunk in chunks)
+
+        yield measure('process_chunk', target, llm, repeat, function='process_chunk', chunks=len(chunks))
+
+    def benchmark_fetch(self, fixtures, llm, sites, repeat):
+        """Rendering and cleaning each fixture site in the pooled browser"""
+        for site in sites:
+            url, pages = fixtures.site_url(site), FIXTURE_SITES[site]['pages']
+
+            def target():
+                async_to_sync(fetch_and_clean_html)(url, pages, use_cache=False)
+
+            yield measure(f'fetch_and_clean_html[{site}]', target, repeat=repeat,
+                          function='fetch_and_clean_html', site=site, pages=pages)
+
+    def benchmark_scrape(self, fixtures, llm, sites, repeat):
+        """The whole scrape_website view, from form post to rendered results"""
+        client = Client()
+        for site in sites:
+            form = {
+                'url': fixtures.site_url(site),
+                'groq_api_key': 'benchmark-key',
+                'fields': ','.join(BENCHMARK_FIELDS),
+                'page_count': FIXTURE_SITES[site]['pages'],
+            }
+
+            def target():
+                context = client.post('/', form).context
+                if context['error']:
+                    raise RuntimeError(context['error'])
+                return len(context['rows'])
+
+            yield measure(f'scrape_website[{site}]', target, llm, repeat,
+                          function='scrape_website', site=site, pages=form['page_count'])
@@ -0,0 +1,194 @@
+# scraper_app/management/commands/loadtest.py
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper_app.benchmark import FIXTURE_SITES, FakeLLMServer, FixtureSites, git_commit
+from scraper_app.loadtest import ENDPOINTS, LoadTest, ProcessMonitor, Workload
+
+DEFAULT_MIX = 'scrape=1,csv=2,json=2,upload=1'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(','):
+        endpoint, _, weight = part.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint not in ENDPOINTS:
+            raise CommandError(f"Unknown endpoint in --mix: {endpoint} (choose from {', '.join(ENDPOINTS)})")
+        try:
+            mix[endpoint] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"Invalid weight in --mix: {part}")
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Load-test /, /download/csv/, /download/json/ and /upload/ with concurrent users against local '
+            'fixture sites and a fake LLM server, reporting throughput, latency percentiles, errors, '
+            'Chromium processes and worker memory over time')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Base URL of a running server (default: start gunicorn for the test). '
+                                             'It must use the fake LLM: start it with GROQ_BASE_URL=http://127.0.0.1:<--llm-port>, '
+                                             'and with TRUSTED_PROXIES=127.0.0.1 for the users to be told apart')
+        parser.add_argument('--server-pid', type=int, help='PID of the --target server, to sample its memory')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers of the started server')
+        parser.add_argument('--threads', type=int, default=8, help='Gunicorn threads per worker of the started server')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to keep sending requests')
+        parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which the users start')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between timeline samples')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Endpoint weights (default: {DEFAULT_MIX})')
+        parser.add_argument('--sites', default=','.join(FIXTURE_SITES), help='Fixture sites the scrapes go to')
+        parser.add_argument('--export-rows', type=int, default=500, help='Rows posted to each export')
+        parser.add_argument('--upload-rows', type=int, default=2000, help='Rows of each uploaded CSV file')
+        parser.add_argument('--llm-latency', type=float, default=0.5, help='Fake LLM seconds before the first token')
+        parser.add_argument('--llm-tokens-per-second', type=float, default=400, help='Fake LLM generation speed')
+        parser.add_argument('--llm-429-rate', type=float, default=0.0, help='Share of fake LLM calls answered with 429')
+        parser.add_argument('--llm-malformed-rate', type=float, default=0.0,
+                            help='Share of fake LLM completions that are truncated or malformed')
+        parser.add_argument('--llm-port', type=int, default=0, help='Port of the fake LLM server (default: any free one)')
+        parser.add_argument('--fixtures-port', type=int, default=0, help='Port of the fixture sites (default: any free one)')
+        parser.add_argument('--cache', action='store_true', help='Leave the extraction and snapshot caches on')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of endpoint choice and failure injection')
+        parser.add_argument('--output', help='Result file (default: benchmark_results/loadtest-<time>-<commit>.json)')
+
+    def handle(self, *args, **options):
+        mix = _parse_mix(options['mix'])
+        sites = [site.strip() for site in options['sites'].split(',') if site.strip()]
+        unknown = [site for site in sites if site not in FIXTURE_SITES]
+        if unknown:
+            raise CommandError(f"Unknown fixture sites: {', '.join(unknown)}")
+
+        llm_options = {
+            'LATENCY': options['llm_latency'],
+            'TOKENS_PER_SECOND': options['llm_tokens_per_second'],
+            'RATE_LIMIT_RATE': options['llm_429_rate'],
+            'MALFORMED_RATE': options['llm_malformed_rate'],
+            'SEED': options['seed'],
+        }
+        with FixtureSites(options['fixtures_port']) as fixtures, \
+                FakeLLMServer(options['llm_port'], **llm_options) as llm:
+            self.stdout.write(f'Fixture sites at {fixtures.url}, fake LLM at {llm.url}')
+            server = None
+            try:
+                if options['target']:
+                    base_url, server_pid = options['target'], options['server_pid']
+                else:
+                    server, base_url = self.serve(options, llm.url)
+                    server_pid = server.pid
+
+                workload = Workload(
+                    base_url, [(fixtures.site_url(site), FIXTURE_SITES[site]['pages']) for site in sites],
+                    export_rows=options['export_rows'], upload_rows=options['upload_rows'],
+                )
+                test = LoadTest(workload, mix, options['users'], options['duration'], options['ramp_up'],
+                                options['seed'])
+                self.stdout.write(f"{options['users']} users for {options['duration']:.0f}s against {base_url}")
+                report = test.run(ProcessMonitor(server_pid), options['interval'], self.report_interval)
+                report['llm_calls'] = dict(llm.calls)
+            finally:
+                if server is not None:
+                    server.terminate()
+                    try:
+                        server.wait(30)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+
+        report.update({
+            'commit': git_commit(settings.BASE_DIR),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'target': options['target'] or f"gunicorn, {options['workers']} workers x {options['threads']} threads",
+            'fake_llm': llm_options,
+        })
+        self.report_summary(report)
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmark_results',
+            f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f'Results written to {output}')
+
+    def serve(self, options: dict, llm_url: str):
+        """Start gunicorn on a free port, talking to the fake LLM, and wait until it answers"""
+        port = _free_port()
+        env = {
+            **os.environ,
+            'GROQ_BASE_URL': llm_url,
+            # The fake server injects rate limits; the real API's quotas would only throttle the test
+            'LLM_REQUESTS_PER_MINUTE': str(10 ** 6),
+            'LLM_TOKENS_PER_MINUTE': str(10 ** 9),
+            'EXTRACTION_RULES_ENABLED': 'false',
+            # Virtual users tell themselves apart with X-Forwarded-For, as if behind a local proxy
+            'TRUSTED_PROXIES': '127.0.0.1',
+            'SCRAPER_STATE_DIR': tempfile.mkdtemp(prefix='unscraper-loadtest-'),
+        }
+        if not options['cache']:
+            env.update({'LLM_CACHE_ENABLED': 'false', 'SNAPSHOT_CACHE_ENABLED': 'false'})
+        log = tempfile.NamedTemporaryFile(prefix='unscraper-loadtest-', suffix='.log', delete=False)
+        command = [
+            sys.executable, '-m', 'gunicorn', 'UnScraper_Django.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+            '--threads', str(options['threads']), '--timeout', '600',
+        ]
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        base_url = f'http://127.0.0.1:{port}'
+        self.stdout.write(f'Started gunicorn at {base_url} (log: {log.name})')
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}, see {log.name}')
+            try:
+                requests.get(base_url + '/', timeout=5)
+                return server, base_url
+            except requests.RequestException:
+                time.sleep(0.5)
+        server.kill()
+        raise CommandError(f'gunicorn did not answer within 60s, see {log.name}')
+
+    def report_interval(self, point: dict):
+        def seconds(value):
+            return f'{value:.2f}s' if value is not None else '-'
+
+        line = (
+            f"{point['elapsed']:>6.1f}s  users {point['active_users']:>3}  in flight {point['in_flight']:>3}  "
+            f"done {point['completed']:>4}  errors {point['errors']:>3}  {point['throughput']:>6.2f}/s  "
+            f"p50 {seconds(point['p50'])}  p99 {seconds(point['p99'])}"
+        )
+        if 'chromium_processes' in point:
+            line += f"  chromium {point['chromium_processes']} ({point['chromium_rss_mb']} MB)"
+        if 'server_rss_mb' in point:
+            line += f"  server {point['server_rss_mb']} MB"
+        self.stdout.write(line)
+
+    def report_summary(self, report: dict):
+        self.stdout.write(f"{'endpoint':<10} {'requests':>9} {'error %':>7} {'req/s':>7} "
+                          f"{'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for name, summary in [*report['endpoints'].items(), ('overall', report['overall'])]:
+            values = [f"{summary[key]:.3f}" if summary[key] is not None else '-' for key in ('p50', 'p90', 'p99', 'max')]
+            self.stdout.write(
+                f"{name:<10} {summary['requests']:>9} {summary['error_rate']:>7.1%} {summary['throughput']:>7.2f} "
+                + ' '.join(f'{value:>8}' for value in values)
+            )
+            for error, count in summary['top_errors']:
+                self.stdout.write(f'    {count} x {error}')
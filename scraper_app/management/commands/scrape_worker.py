@@ -0,0 +1,44 @@
+# scraper_app/management/commands/scrape_worker.py
+import concurrent.futures
+import signal
+
+from django.core.management.base import BaseCommand
+
+from scraper_app.jobs import JobWorker
+from scraper_app.runtime import get_background_loop
+
+
+class Command(BaseCommand):
+    help = 'Run a worker process that claims and runs queued scrape jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Jobs to run at once (default: SCRAPE_JOBS CONCURRENCY)')
+        parser.add_argument('--name', help='Worker name recorded on claimed jobs (default: host:pid)')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        background_loop = get_background_loop()
+        worker = JobWorker(concurrency=options['concurrency'], name=options['name'])
+        future = background_loop.submit(worker.run(burst=options['burst']))
+        stopping = []
+
+        def shutdown(signum, frame):
+            # First signal: finish running jobs. Second: requeue them and exit.
+            if stopping:
+                self.stdout.write('Aborting, running jobs go back to the queue')
+                background_loop.loop.call_soon_threadsafe(worker.abort)
+            else:
+                self.stdout.write('Stopping after the running jobs finish (signal again to abort)')
+                background_loop.loop.call_soon_threadsafe(worker.stop)
+            stopping.append(signum)
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        # Wake up regularly so the signal handlers get to run
+        while True:
+            try:
+                future.result(timeout=1)
+                break
+            except concurrent.futures.TimeoutError:
+                continue
@@ -0,0 +1,220 @@
+# scraper_app/metrics.py
+import asyncio
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+
+DEFAULT_METRICS_SETTINGS = {
+    'ENABLED': True,
+    'TOKEN': '',              # Lets scrapers read /metrics with "Authorization: Bearer <TOKEN>"; otherwise staff only
+}
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    'unscraper_stage_seconds': 'Time spent in each scrape pipeline stage',
+    'unscraper_llm_call_seconds': 'Latency of LLM calls by model and outcome',
+    'unscraper_llm_calls_total': 'LLM calls by model and outcome',
+    'unscraper_llm_retries_total': 'LLM calls that retried a chunk after a failed call, by model',
+    'unscraper_llm_parse_failures_total': 'LLM completions without a listings array, by model',
+    'unscraper_llm_tokens_total': 'LLM tokens by model and direction (prompt or completion)',
+    'unscraper_browsers': 'Pooled browsers by state',
+    'unscraper_browser_contexts': 'Browser contexts leased to scrapes',
+    'unscraper_cache_events': 'Extraction and snapshot cache events since the worker started',
+    'unscraper_model_latency_seconds': 'Recent LLM latency quantiles per model, as seen by the router',
+    'unscraper_model_error_rate': 'Recent LLM error rate per model, as seen by the router',
+    'unscraper_model_circuit_open': 'Whether the circuit breaker of a model is open',
+}
+
+
+def metrics_settings() -> dict:
+    """Return the effective metrics settings"""
+    return {**DEFAULT_METRICS_SETTINGS, **getattr(settings, 'METRICS', {})}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """
+    Counters and histograms of one worker process, rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own, so Prometheus should scrape the
+    workers individually (or sum what it gets from them over time).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, list] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a value in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (the last one is +Inf), sum and count
+                histogram = self._histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def totals(self, name: str) -> Dict[tuple, tuple]:
+        """Sum and count of every series of a histogram, by labels"""
+        with self._lock:
+            return {labels: (value[1], value[2]) for (metric, labels), value in self._histograms.items()
+                    if metric == name}
+
+    def render(self, gauges: Dict[str, Dict[tuple, float]] = None) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Args:
+            gauges: current values to include, name -> {labels: value}, e.g. pool and cache sizes
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(value[0]), value[1], value[2]] for key, value in self._histograms.items()}
+
+        lines = []
+
+        def header(name: str, kind: str):
+            lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name in sorted({name for name, _ in counters}):
+            header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+
+        for name in sorted({name for name, _ in histograms}):
+            header(name, 'histogram')
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (math.inf,), buckets):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_label_text(labels + (("le", _number(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_label_text(labels)} {_number(total)}')
+                lines.append(f'{name}_count{_label_text(labels)} {count}')
+
+        for name, values in sorted((gauges or {}).items()):
+            header(name, 'gauge')
+            for labels, value in sorted(values.items()):
+                lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Timings:
+    """Time spent per stage in one scrape, summed over its concurrent pages and chunks"""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: Dict[str, list] = {}
+
+    def add(self, stage: str, seconds: float):
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def as_dict(self) -> dict:
+        """Stage -> seconds and count, plus the wall-clock total"""
+        return {
+            'total': round(time.monotonic() - self.started, 4),
+            'stages': {stage: {'seconds': round(seconds, 4), 'count': count}
+                       for stage, (seconds, count) in self.stages.items()},
+        }
+
+    def server_timing(self) -> str:
+        """The breakdown as a Server-Timing header value, in milliseconds"""
+        parts = [f'{stage};dur={seconds * 1000:.1f}' for stage, (seconds, _) in self.stages.items()]
+        parts.append(f'total;dur={(time.monotonic() - self.started) * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_metrics = Metrics()
+
+# Timings of the scrape the current task works for; child tasks inherit it
+_current_timings: contextvars.ContextVar = contextvars.ContextVar('scrape_timings', default=None)
+
+# Span lists of the profiles being recorded (see profiling.py); every timed stage is added to each
+_span_listeners: list = []
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics"""
+    return _metrics
+
+
+def use_timings(timings: Optional[Timings]):
+    """Collect the stages timed from now on in this task, and the tasks it starts, into timings"""
+    _current_timings.set(timings)
+
+
+def add_span_listener(spans: list):
+    """Append every stage timed from now on to spans, as a dict with its start, duration and asyncio task"""
+    _span_listeners.append(spans)
+
+
+def remove_span_listener(spans: list):
+    _span_listeners.remove(spans)
+
+
+def add_timing(stage: str, seconds: float):
+    """Count time spent in a stage towards the current scrape's breakdown"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+    if _span_listeners:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        span = {
+            'stage': stage,
+            'start': time.monotonic() - seconds,
+            'seconds': round(seconds, 4),
+            'task': task.get_name() if task is not None else None,
+            'thread': threading.current_thread().name,
+        }
+        for spans in list(_span_listeners):
+            spans.append(span)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into its histogram and the current scrape's breakdown"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        _metrics.observe('unscraper_stage_seconds', elapsed, stage=name)
+        add_timing(name, elapsed)
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:22
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=16)),
+                ('url', models.URLField(max_length=2048)),
+                ('fields', models.JSONField(default=list)),
+                ('page_count', models.PositiveSmallIntegerField(default=1)),
+                ('api_key', models.CharField(blank=True, max_length=200)),
+                ('user', models.CharField(blank=True, max_length=200)),
+                ('worker', models.CharField(blank=True, max_length=200)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('pages_done', models.PositiveSmallIntegerField(default=0)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='scraper_app_status_8fd6ab_idx'), models.Index(fields=['status', 'lease_expires_at'], name='scraper_app_status_5ec53f_idx')],
+            },
+        ),
+    ]
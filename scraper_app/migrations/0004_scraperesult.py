@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper_app', '0003_scrapebatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeResult',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('url', models.URLField(max_length=2048)),
+                ('user', models.CharField(blank=True, max_length=200)),
+                ('columns', models.JSONField(default=dict)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='scraper_app.scrapejob')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScrapeResultRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='scraper_app.scraperesult')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('result', 'position'), name='unique_result_row_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper_app', '0004_scraperesult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapejob',
+            name='server_key',
+            field=models.BooleanField(default=False),
+        ),
+    ]
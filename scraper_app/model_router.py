@@ -0,0 +1,241 @@
+# scraper_app/model_router.py
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTER_SETTINGS = {
+    'WINDOW': 50,                 # Recent calls per model that latency and error rate are computed from
+    'MIN_SAMPLES': 3,             # Calls before a model's own latency is trusted over the others'
+    'FAILURE_THRESHOLD': 3,       # Consecutive failures that open a model's circuit breaker
+    'ERROR_RATE_THRESHOLD': 0.5,  # Error rate over the window that opens it as well
+    'COOLDOWN': 30.0,             # Seconds an opened breaker stays open; doubles while probes keep failing
+    'MAX_COOLDOWN': 600.0,
+    'BACKOFF_BASE': 1.0,          # Backoff after a 429 without a retry-after hint, doubling per repeat
+    'BACKOFF_MAX': 60.0,
+    'JITTER': 0.25,               # Retry-after hints are stretched by up to this fraction, so waiters spread out
+    'MAX_WAIT': 60.0,             # Longest a call waits for a model to free up before the scrape gives up
+    'MAX_SYNC_WAIT': 10.0,        # Total seconds the synchronous process_chunk may sleep for models per call
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelHealth:
+    """Rolling latency and outcome telemetry of one model, with its circuit breaker"""
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self.cooldown = 0.0
+        self.probe_started = 0.0   # When the half-open probe call was made (0: none)
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency(self, fraction: float) -> Optional[float]:
+        return _percentile(list(self.latencies), fraction) if self.latencies else None
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM call from live telemetry instead of a fixed order.
+
+    Every call's latency and outcome are recorded per model. The router picks
+    the available model with the lowest expected time to a good answer, its
+    median latency divided by its success rate, among the models whose context
+    window fits the request. A model is unavailable while:
+
+    - a rate limit on it is cooling down for the API key, for the retry-after
+      hint plus jitter, or with exponential backoff when there is no hint;
+    - its circuit breaker is open after FAILURE_THRESHOLD consecutive failures
+      or a high error rate. After the cooldown one probe call is let through
+      (half-open): success closes the breaker, failure reopens it for twice as
+      long. The probe is claimed by begin_call right before the call is made,
+      so a caller that picks the model and then gives up blocks nobody.
+
+    When every model is unavailable, the router names the one that frees up
+    first and how long to wait for it. Thread-safe; it is shared by the async
+    engine and the synchronous process_chunk.
+    """
+    def __init__(self, models: List[str], context_tokens: Dict[str, int] = None, **options):
+        self.models = list(models)
+        self.context_tokens = context_tokens or {}
+        self.options = {**DEFAULT_ROUTER_SETTINGS, **options}
+        self._health = {model: ModelHealth(self.options['WINDOW']) for model in self.models}
+        self._limited_until = {}   # (api_key, model) -> monotonic time the rate limit is over
+        self._backoffs = {}        # (api_key, model) -> 429s in a row without a hint
+        self._lock = threading.Lock()
+
+    def _expected_latency(self, model: str, typical: float) -> float:
+        health = self._health[model]
+        median = health.latency(0.5) if len(health.latencies) >= self.options['MIN_SAMPLES'] else None
+        # Untried models are assumed typical, so they get a chance when the known ones are slow
+        latency = typical if median is None else median
+        return latency / max(0.05, 1.0 - health.error_rate)
+
+    def _available_at(self, api_key: str, model: str, now: float) -> float:
+        health = self._health[model]
+        available = self._limited_until.get((api_key, model), 0.0)
+        if health.state == OPEN:
+            available = max(available, health.opened_until)
+        elif health.state == HALF_OPEN and health.probe_started:
+            # The probe's outcome decides; a probe that never reports back expires after one cooldown
+            available = max(available, health.probe_started + health.cooldown)
+        return available
+
+    def choose(self, api_key: str, tokens: int = 0, exclude: Tuple[str, ...] = ()) -> Tuple[str, float]:
+        """
+        Pick the model for the next call.
+
+        Args:
+            api_key: rate limits are tracked per API key and model
+            tokens: prompt plus completion tokens the call needs; smaller context windows are skipped
+            exclude: models to avoid if any other one is usable (e.g. the one that just failed)
+
+        Returns:
+            tuple: the model, and the seconds to wait before calling it (0 if it is available now)
+        """
+        with self._lock:
+            now = time.monotonic()
+            fitting = [model for model in self.models if self.context_tokens.get(model, tokens) >= tokens]
+            candidates = [model for model in fitting if model not in exclude] or fitting or self.models
+
+            known = [
+                health.latency(0.5) for health in self._health.values()
+                if len(health.latencies) >= self.options['MIN_SAMPLES']
+            ]
+            typical = _percentile(known, 0.5) if known else 1.0
+
+            available = [model for model in candidates if self._available_at(api_key, model, now) <= now]
+            if available:
+                # Ties keep the configured order
+                model = min(available, key=lambda m: (self._expected_latency(m, typical), self.models.index(m)))
+                wait = 0.0
+            else:
+                model = min(candidates, key=lambda m: self._available_at(api_key, m, now))
+                wait = self._available_at(api_key, model, now) - now
+
+            return model, max(0.0, wait)
+
+    def begin_call(self, model: str) -> bool:
+        """
+        Claim a call to a model that is about to be made.
+
+        Once a breaker's cooldown is over, the first call claims the half-open
+        probe; until it reports back (or one cooldown passes) further calls are
+        refused.
+
+        Returns:
+            bool: False if the breaker is still open or another call is probing the model
+        """
+        with self._lock:
+            now = time.monotonic()
+            health = self._health[model]
+            if health.state == OPEN:
+                if health.opened_until > now:
+                    return False
+                health.state = HALF_OPEN
+                health.probe_started = 0.0
+            if health.state == HALF_OPEN:
+                if health.probe_started and health.probe_started + health.cooldown > now:
+                    return False
+                health.probe_started = now
+            return True
+
+    def record_success(self, model: str, latency: float, api_key: str = None):
+        with self._lock:
+            health = self._health[model]
+            health.latencies.append(latency)
+            health.outcomes.append(True)
+            health.consecutive_failures = 0
+            if health.state != CLOSED:
+                logger.info(f"Circuit breaker of {model} closed")
+            health.state = CLOSED
+            health.probe_started = 0.0
+            health.cooldown = 0.0
+            if api_key is not None:
+                self._backoffs.pop((api_key, model), None)
+
+    def record_failure(self, model: str, latency: float = None):
+        """Record a failed call (server error, bad response, timeout), opening the breaker if needed"""
+        with self._lock:
+            health = self._health[model]
+            if latency is not None:
+                health.latencies.append(latency)
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+
+            failing = health.consecutive_failures >= self.options['FAILURE_THRESHOLD'] or (
+                len(health.outcomes) >= self.options['MIN_SAMPLES']
+                and health.error_rate >= self.options['ERROR_RATE_THRESHOLD']
+            )
+            if health.state == HALF_OPEN or (health.state == CLOSED and failing):
+                cooldown = self.options['COOLDOWN'] if health.state == CLOSED else health.cooldown * 2
+                health.cooldown = min(self.options['MAX_COOLDOWN'], cooldown)
+                health.state = OPEN
+                health.opened_until = time.monotonic() + health.cooldown
+                health.probe_started = 0.0
+                logger.warning(f"Circuit breaker of {model} opened for {health.cooldown:g}s")
+
+    def record_rate_limit(self, api_key: str, model: str, retry_after: Optional[float] = None) -> float:
+        """
+        Park a model for an API key after a 429.
+
+        Returns:
+            float: seconds until the model is tried again for this key
+        """
+        with self._lock:
+            key = (api_key, model)
+            if retry_after is None:
+                repeats = self._backoffs.get(key, 0)
+                self._backoffs[key] = repeats + 1
+                base = min(self.options['BACKOFF_MAX'], self.options['BACKOFF_BASE'] * 2 ** repeats)
+                wait = random.uniform(base / 2, base)
+            else:
+                wait = retry_after * (1 + random.uniform(0, self.options['JITTER']))
+            self._limited_until[key] = time.monotonic() + wait
+
+            # A probe that hit a rate limit says nothing about the model's health
+            health = self._health[model]
+            if health.state == HALF_OPEN:
+                health.probe_started = 0.0
+
+            # Forget rate limits that are long over, so the map doesn't grow with every API key seen
+            now = time.monotonic()
+            for stale in [k for k, until in self._limited_until.items() if until < now - 3600]:
+                del self._limited_until[stale]
+            return wait
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current telemetry of every model"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                model: {
+                    'p50': health.latency(0.5),
+                    'p95': health.latency(0.95),
+                    'error_rate': health.error_rate,
+                    'calls': len(health.outcomes),
+                    'state': health.state,
+                    'open_for': max(0.0, health.opened_until - now) if health.state == OPEN else 0.0,
+                    'rate_limited_keys': sum(
+                        1 for (_, limited), until in self._limited_until.items() if limited == model and until > now
+                    ),
+                }
+                for model, health in self._health.items()
+            }
@@ -1,3 +1,111 @@
+import uuid
+
 from django.db import models
 
 # Create your models here.
+
+
+class ExtractionCacheEntry(models.Model):
+    """LLM extraction result for one chunk, keyed by a hash of everything that produced it"""
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=100)
+    listings = models.TextField()
+    size = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.model}:{self.key[:12]}'
+
+
+class ScrapeBatch(models.Model):
+    """A group of scrape jobs submitted together through the batch API"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.CharField(max_length=200, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Batch of {self.size} ({self.created_at:%Y-%m-%d %H:%M})'
+
+
+class ScrapeJob(models.Model):
+    """A scrape queued for the worker processes, claimed under a renewable lease"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    url = models.URLField(max_length=2048)
+    host = models.CharField(max_length=255, blank=True, db_index=True)  # For per-host politeness limits
+    batch = models.ForeignKey(ScrapeBatch, null=True, blank=True, on_delete=models.CASCADE, related_name='jobs')
+    fields = models.JSONField(default=list)
+    page_count = models.PositiveSmallIntegerField(default=1)
+    api_key = models.CharField(max_length=200, blank=True)  # The caller's key, cleared when a worker claims the job
+    server_key = models.BooleanField(default=False)  # Run with the server's key instead of the caller's
+    user = models.CharField(max_length=200, blank=True)
+
+    # Lease held by the worker running the job; an expired lease puts it back in the queue
+    worker = models.CharField(max_length=200, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    pages_done = models.PositiveSmallIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.url} ({self.status})'
+
+
+class ScrapeResult(models.Model):
+    """The rows of one scrape, kept server-side so they can be paged, filtered and downloaded by ID"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    url = models.URLField(max_length=2048)
+    user = models.CharField(max_length=200, blank=True)
+    job = models.ForeignKey(ScrapeJob, null=True, blank=True, on_delete=models.CASCADE, related_name='results')
+    columns = models.JSONField(default=dict)  # Column name -> kind of values, in first-seen order
+    row_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.url} ({self.row_count} rows)'
+
+
+class ScrapeResultRow(models.Model):
+    """One extracted listing of a stored result"""
+    result = models.ForeignKey(ScrapeResult, on_delete=models.CASCADE, related_name='rows')
+    position = models.PositiveIntegerField()
+    data = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['result', 'position'], name='unique_result_row_position'),
+        ]
+
+    def __str__(self):
+        return f'Row {self.position} of {self.result_id}'
@@ -0,0 +1,181 @@
+# scraper_app/pagination.py
+import asyncio
+import logging
+from urllib.parse import urljoin
+
+from .host_memory import get_host_memory
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Comprehensive list of next button selectors, probed in a single page evaluation
+NEXT_BUTTON_SELECTORS = [
+    'a[rel="next"]',
+    'button[aria-label*="next" i]',
+    'a[aria-label*="next" i]',
+    '[aria-label="Next page" i]',
+    '.pagination-next',
+    'li.next a',
+    '.next a',
+    'a.next',
+    'a[class*="next"]',
+    '[class*="pagination"] [class*="next"]',
+    '[class*="pager"] [class*="next"]',
+    '[class*="paginate"] [class*="next"]',
+    'input[value="Next" i]',
+    'span[class*="next"]',
+    'div[class*="next"]',
+]
+
+# Selector remembered when the button was only found by its text
+TEXT_MATCH = 'text=next'
+
+MARKER_ATTRIBUTE = 'data-unscraper-next'
+
+# Find the first visible, enabled candidate; mark it so Playwright can click it
+FIND_NEXT_SCRIPT = """
+({selectors, marker}) => {
+    document.querySelectorAll(`[${marker}]`).forEach(el => el.removeAttribute(marker));
+
+    const usable = el => {
+        if (!el || !(el.offsetParent !== null || el.getClientRects().length)) return false;
+        if (el.disabled || el.getAttribute('aria-disabled') === 'true') return false;
+        const disabledAncestor = el.closest('.disabled, [aria-disabled="true"]');
+        return !disabledAncestor;
+    };
+    const mark = (el, selector) => {
+        el.setAttribute(marker, '1');
+        return {selector, href: el.getAttribute('href')};
+    };
+
+    for (const selector of selectors) {
+        let elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            continue;
+        }
+        for (const el of elements) {
+            if (usable(el)) return mark(el, selector);
+        }
+    }
+
+    // Fallback: a short clickable label that says "next" (or is an arrow)
+    const label = /^(?:.*\\bnext\\b.*|[›»>→]+)$/i;
+    const clickable = document.querySelectorAll(
+        'a, button, [role="button"], input[type="button"], input[type="submit"]'
+    );
+    for (const el of clickable) {
+        const text = (el.innerText || el.value || el.getAttribute('aria-label') || el.title || '').trim();
+        if (text && text.length <= 30 && label.test(text) && usable(el)) return mark(el, 'text=next');
+    }
+    return null;
+}
+"""
+
+# Resolve once the DOM has changed and then stayed quiet for a moment
+ARM_CHANGE_SCRIPT = """
+(quietMs) => {
+    window.__unscraperPageChanged = new Promise(resolve => {
+        let quietTimer = null;
+        const observer = new MutationObserver(() => {
+            clearTimeout(quietTimer);
+            quietTimer = setTimeout(() => { observer.disconnect(); resolve(true); }, quietMs);
+        });
+        observer.observe(document.documentElement, {childList: true, subtree: true});
+    });
+}
+"""
+
+
+async def find_next_button(page, url: str):
+    """
+    Locate the next-page control in one round trip, trying the host's remembered selector first.
+
+    Returns:
+        dict: the matching selector and the element's href, or None if there is no next page
+    """
+    remembered = await get_host_memory().aget(url, 'next_selector')
+    selectors = list(NEXT_BUTTON_SELECTORS)
+    if remembered and remembered != TEXT_MATCH:
+        selectors = [remembered] + [selector for selector in selectors if selector != remembered]
+
+    with stage('next_button'):
+        match = await page.evaluate(FIND_NEXT_SCRIPT, {'selectors': selectors, 'marker': MARKER_ATTRIBUTE})
+    if match:
+        logger.info(f"Found next button with selector: {match['selector']}")
+    return match
+
+
+async def go_to_next_page(page, url: str, timeout: float = 10.0) -> bool:
+    """
+    Click the next-page control and wait for the navigation or DOM update it causes.
+
+    Returns:
+        bool: True if a new page was loaded, False if pagination should stop
+    """
+    match = await find_next_button(page, url)
+    if not match:
+        logger.info("No next button found, stopping pagination")
+        return False
+
+    # Start listening before the click so a fast navigation isn't missed
+    await page.evaluate(ARM_CHANGE_SCRIPT, 200)
+    navigation = asyncio.ensure_future(page.wait_for_event(
+        'framenavigated', predicate=lambda frame: frame == page.main_frame, timeout=timeout * 1000
+    ))
+    button = page.locator(f'[{MARKER_ATTRIBUTE}]').first
+
+    try:
+        try:
+            # First try native click
+            await button.click(timeout=3000)
+            logger.info("Clicked next button using native click")
+        except Exception:
+            # Try JavaScript click
+            await button.evaluate('element => element.click()')
+            logger.info("Clicked next button using JavaScript")
+    except Exception:
+        navigation.cancel()
+        await asyncio.gather(navigation, return_exceptions=True)
+        # Try navigating to the href directly
+        if not match.get('href'):
+            logger.error("Could not click next button and no href attribute found")
+            return False
+        href = urljoin(page.url, match['href'])
+        await page.goto(href, wait_until='domcontentloaded')
+        logger.info(f"Navigated to next page using href: {href}")
+        await get_host_memory().aupdate(url, next_selector=match['selector'])
+        return True
+
+    if not await _wait_for_page_change(page, navigation, timeout):
+        logger.warning("Page didn't change after clicking next button")
+        return False
+
+    await get_host_memory().aupdate(url, next_selector=match['selector'])
+    return True
+
+
+async def _wait_for_page_change(page, navigation: asyncio.Future, timeout: float) -> bool:
+    """Wait for whichever comes first: a main-frame navigation or a settled DOM mutation"""
+    mutation = asyncio.ensure_future(page.evaluate('() => window.__unscraperPageChanged'))
+
+    done, pending = await asyncio.wait({navigation, mutation}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    if navigation in done and navigation.exception() is None:
+        pass
+    elif mutation in done and mutation.exception() is None and mutation.result():
+        # Same document, new content (client-side pagination)
+        return True
+    elif mutation not in done:
+        return False
+    # Otherwise a navigation replaced the document the mutation promise lived in
+
+    try:
+        await page.wait_for_load_state('domcontentloaded', timeout=timeout * 1000)
+    except Exception:
+        pass
+    return True
@@ -0,0 +1,339 @@
+# scraper_app/pipeline.py
+import asyncio
+import contextlib
+import logging
+import random
+from typing import AsyncIterator, List, Optional
+
+from django.conf import settings
+
+from .browser_pool import get_browser_pool
+from .chunking import Chunk, ListingMerger, chunk_content
+from .cleaning import clean_page_async
+from .exceptions import ScraperError
+from .extraction_rules import agreement, apply_rule, aload_rule, asave_rule, learn_rule, rule_settings
+from .llm import get_extraction_engine
+from .metrics import Timings, stage, use_timings
+from .pagination import go_to_next_page
+from .scrolling import scroll_settings, scroll_until_stable
+from .snapshot_cache import get_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_SETTINGS = {
+    'PAGES_IN_FLIGHT': 3,     # Rendered pages awaiting extraction before the browser pauses
+}
+
+# User agents list (truncated for brevity - you can keep the full list from api.py)
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+]
+
+
+async def render_pages(url: str, page_count: int) -> AsyncIterator[dict]:
+    """
+    Render and clean the requested pages inside a fresh pooled browser context.
+
+    Each page is cleaned on the process pool while the browser already moves on
+    to the next one, and is yielded as soon as both are done.
+
+    Yields:
+        dict: page_index, cleaned content, records (see records.py), final_url, cache validators and is_last
+    """
+    async with get_browser_pool().context(
+        user_agent=random.choice(USER_AGENTS),
+        viewport={'width': 1920, 'height': 1080},
+        java_script_enabled=True,
+        bypass_csp=True,
+        ignore_https_errors=True,
+    ) as context:
+        context.set_default_timeout(15000)
+        page = await context.new_page()
+
+        # Block unnecessary resources
+        await page.route("**/*.{png,jpg,jpeg,gif,svg}", lambda route: route.abort())
+        await page.route("**/*analytics*.js", lambda route: route.abort())
+        await page.route("**/*tracking*.js", lambda route: route.abort())
+        await page.route("**/*advertisement*.js", lambda route: route.abort())
+
+        # Cache validators of the document last loaded in the main frame, by goto, click or href,
+        # so the snapshot of every page can be revalidated later
+        validators = {}
+
+        def remember_validators(response):
+            if response.frame == page.main_frame and response.request.is_navigation_request():
+                validators.update(
+                    etag=response.headers.get('etag'), last_modified=response.headers.get('last-modified')
+                )
+        page.on('response', remember_validators)
+
+        current_page = 1
+
+        while current_page <= page_count:
+            logger.info(f"Navigating to page {current_page} of {url}")
+
+            if current_page == 1:
+                with stage('goto'):
+                    await page.goto(url, wait_until='domcontentloaded')
+
+            # Scroll to trigger lazy loading until no new content arrives
+            with stage('scroll'):
+                await scroll_until_stable(page, url)
+
+            html_content = await page.content()
+            final_url = page.url
+            page_validators = dict(validators)
+
+            # Clean HTML, convert it to markdown/text and find its records on the process pool
+            cleaning = asyncio.ensure_future(clean_page_async(html_content))
+            del html_content
+
+            has_next = False
+            try:
+                if current_page < page_count:
+                    try:
+                        with stage('next_page'):
+                            has_next = await go_to_next_page(page, url)
+                    except Exception as e:
+                        logger.error(f"Error navigating to next page: {e}")
+                cleaned = await cleaning
+            finally:
+                cleaning.cancel()
+
+            yield {
+                'page_index': current_page,
+                **cleaned,
+                'final_url': final_url,
+                **page_validators,
+                # Pagination stopped here although more pages were requested
+                'is_last': current_page < page_count and not has_next,
+            }
+
+            if not has_next:
+                break
+            current_page += 1
+
+
+async def iter_pages(url: str, page_count: int, use_cache: bool = True) -> AsyncIterator[dict]:
+    """Yield the cleaned pages of a scrape one by one, from snapshots when still valid"""
+    snapshot_cache = get_snapshot_cache()
+    scroll_options = scroll_settings()
+
+    pages = await snapshot_cache.aload(url, page_count, scroll_options) if use_cache else None
+    if pages is not None:
+        logger.info(f"Using cached snapshots for {len(pages)} page(s) of {url}")
+        for page in pages:
+            yield page
+        return
+
+    try:
+        async with contextlib.aclosing(render_pages(url, page_count)) as rendered:
+            async for page in rendered:
+                if use_cache:
+                    await snapshot_cache.astore_page(url, page, scroll_options)
+                yield page
+    except ScraperError:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching HTML: {e}")
+        raise ScraperError(f"Failed to fetch webpage content: {str(e)}")
+
+    if use_cache:
+        await snapshot_cache.aevict()
+
+
+async def stream_listings(url: str, page_count: int, api_key: str, sys_message: str,
+                         fields: List[str], user: str = 'anonymous', use_cache: bool = True,
+                         timings: Timings = None) -> AsyncIterator[dict]:
+    """
+    Scrape pages and extract their listings as a producer/consumer pipeline.
+
+    Each page is chunked and its chunks are sent to the extraction engine as soon
+    as the page is cleaned, while the browser moves on to the next page, so LLM
+    time overlaps browser time instead of adding to it. At most PAGES_IN_FLIGHT
+    pages wait for extraction at a time, which keeps memory flat however many
+    pages are scraped. Closing the generator early cancels the browser and all
+    pending extractions. Must run on the background loop (see runtime.py).
+
+    Pages with a listing grid send only their records (see records.py); if
+    those yield nothing, the whole page is sent after all. Records the LLM has
+    extracted once teach CSS extraction rules for the host and field set (see
+    extraction_rules.py); later pages and runs are extracted with the rules
+    alone, checked against the LLM on a sample of records now and then, and
+    go back to the LLM when the rules drift.
+
+    Args:
+        timings: collects the time spent per stage (see metrics.py); a new one if not given
+
+    Yields:
+        dict: a 'page' event when a page is chunked (with the mode, 'records',
+        'page' or 'rules'), then a 'rows' event per chunk with its new listings, in page and
+        chunk order, and finally a 'timings' event with the stage breakdown
+    """
+    options = {**DEFAULT_PIPELINE_SETTINGS, **getattr(settings, 'PIPELINE', {})}
+    engine = get_extraction_engine()
+    client = engine.client(api_key)
+    in_flight = asyncio.Semaphore(options['PAGES_IN_FLIGHT'])
+    events = asyncio.Queue()
+    page_tasks = []
+    timings = timings if timings is not None else Timings()
+
+    # Extraction rules learned for this host and field set
+    rule_options = rule_settings()
+    learned = {'rule': await aload_rule(url, fields) if rule_options['ENABLED'] else None}
+
+    async def extract_chunks(page_index: int, chunks: List[Chunk], mode: str,
+                             previous_page: asyncio.Future = None) -> List[dict]:
+        extractions = [
+            asyncio.ensure_future(engine.extract(client, api_key, sys_message, chunk.text, fields, user))
+            for chunk in chunks
+        ]
+        found = []
+        try:
+            # Keep rows in page order, whichever page finishes first
+            if previous_page is not None:
+                await asyncio.shield(previous_page)
+            events.put_nowait({'event': 'page', 'page': page_index, 'chunks': len(chunks), 'mode': mode})
+
+            merger = ListingMerger()
+            for chunk_index, (chunk, extraction) in enumerate(zip(chunks, extractions), start=1):
+                rows = merger.add(chunk, await extraction)
+                found.extend(rows)
+                events.put_nowait({'event': 'rows', 'page': page_index, 'chunk': chunk_index, 'rows': rows})
+        finally:
+            for extraction in extractions:
+                extraction.cancel()
+        logger.info(f"Extracted page {page_index} of {url} from {len(chunks)} chunk(s) in {mode} mode")
+        return found
+
+    async def forget_rule(page_index: int, reason: str):
+        logger.info(f"Extraction rules for {url} drifted on page {page_index} ({reason}); back to the LLM")
+        learned['rule'] = None
+        await asave_rule(url, fields, None)
+
+    async def extract_by_rule(page_index: int, rule: dict, records: str, record_fields: List[dict],
+                              previous_page: asyncio.Future) -> Optional[List[dict]]:
+        with stage('rules'):
+            rows = apply_rule(rule, record_fields)
+        if not rows:
+            await forget_rule(page_index, "no rows")
+            return None
+
+        # Pages extracted with the rule are counted in host memory across scrapes, so a rule
+        # checked on the first page of one scrape saves the LLM calls of the next ones
+        pages = rule.get('pages', 0)
+        learned['rule'] = rule = {**rule, 'pages': pages + 1}
+        if pages % rule_options['VALIDATE_EVERY'] == 0:
+            # Have the LLM extract a sample of records spread over the page and compare
+            lines = records.split('\n\n')
+            step = max(1, len(lines) // rule_options['VALIDATE_RECORDS'])
+            sample = list(range(0, len(lines), step))[:rule_options['VALIDATE_RECORDS']]
+            listings = await engine.extract(
+                client, api_key, sys_message, '\n\n'.join(lines[index] for index in sample), fields, user
+            )
+            score = agreement(apply_rule(rule, [record_fields[index] for index in sample]), listings)
+            if score < rule_options['MIN_AGREEMENT']:
+                await forget_rule(page_index, f"{score:.0%} agreement with the LLM")
+                return None
+        if learned['rule'] is not None:
+            await asave_rule(url, fields, learned['rule'])
+
+        if previous_page is not None:
+            await asyncio.shield(previous_page)
+        events.put_nowait({'event': 'page', 'page': page_index, 'chunks': 0, 'mode': 'rules'})
+        events.put_nowait({'event': 'rows', 'page': page_index, 'chunk': 1, 'rows': rows})
+        logger.info(f"Extracted page {page_index} of {url} with learned rules")
+        return rows
+
+    async def extract_page(page: dict, previous_page: asyncio.Future):
+        try:
+            page_index = page['page_index']
+            content, records = page['content'], page.get('records')
+            record_selector, record_fields = page.get('record_selector'), page.get('record_fields')
+            del page
+            if not records:
+                with stage('chunk'):
+                    chunks = chunk_content(content)
+                await extract_chunks(page_index, chunks, 'page', previous_page)
+                return
+
+            rule = learned['rule']
+            if rule is not None and record_fields and rule['container'] == record_selector:
+                if await extract_by_rule(page_index, rule, records, record_fields, previous_page) is not None:
+                    return
+
+            # Records never straddle chunks, so they need no overlap
+            with stage('chunk'):
+                chunks = chunk_content(records, overlap_tokens=0)
+            found = await extract_chunks(page_index, chunks, 'records', previous_page)
+            if not found:
+                # The repeated structure held no listings after all; send the whole page
+                logger.info(f"No listings in the records of page {page_index} of {url}, sending the whole page")
+                with stage('chunk'):
+                    chunks = chunk_content(content)
+                await extract_chunks(page_index, chunks, 'page')
+            elif rule_options['ENABLED'] and record_fields and (
+                    learned['rule'] is None or learned['rule']['container'] != record_selector):
+                with stage('rules'):
+                    rule = learn_rule(record_selector, record_fields, found, **rule_options)
+                if rule is not None:
+                    logger.info(f"Learned extraction rules for {url}: {rule}")
+                    learned['rule'] = rule
+                    await asave_rule(url, fields, rule)
+        except Exception as e:
+            # Surface the failure right away instead of after the browser finishes
+            events.put_nowait(e)
+            raise
+        finally:
+            in_flight.release()
+
+    async def produce():
+        # The tasks started from here on (pages, cleaning, extractions) time into this scrape
+        use_timings(timings)
+        previous_page = None
+        async with contextlib.aclosing(iter_pages(url, page_count, use_cache)) as pages:
+            async for page in pages:
+                # Backpressure: the browser waits while too many pages await extraction
+                await in_flight.acquire()
+                previous_page = asyncio.ensure_future(extract_page(page, previous_page))
+                page_tasks.append(previous_page)
+                del page
+        await asyncio.gather(*page_tasks)
+
+    producer = asyncio.ensure_future(produce())
+    producer.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            if isinstance(event, Exception):
+                raise event
+            yield event
+        producer.result()
+        yield {'event': 'timings', 'timings': timings.as_dict()}
+    finally:
+        producer.cancel()
+        for task in page_tasks:
+            task.cancel()
+        await asyncio.gather(producer, *page_tasks, return_exceptions=True)
+
+
+async def scrape_listings(url: str, page_count: int, api_key: str, sys_message: str,
+                          fields: List[str], user: str = 'anonymous', use_cache: bool = True,
+                          timings: Timings = None) -> List[dict]:
+    """
+    Run the scrape pipeline to completion.
+
+    Returns:
+        list: listings of all pages in page order, without chunk-overlap duplicates
+    """
+    listings = []
+    async with contextlib.aclosing(
+        stream_listings(url, page_count, api_key, sys_message, fields, user, use_cache, timings)
+    ) as events:
+        async for event in events:
+            if event['event'] == 'rows':
+                listings.extend(event['rows'])
+    return listings
@@ -1,24 +1,271 @@
 # scraper_app/powerbi.py
+import codecs
+import hashlib
+import html
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import pygwalker as pyg
-import concurrent.futures
-from django.core.files.storage import FileSystemStorage
+from django.conf import settings
 import os
 import json
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # The pyarrow readers are optional; CSV falls back to pandas' C engine
+    pa = None
+
+ARROW_ERRORS = (pa.ArrowInvalid,) if pa is not None else ()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISUALIZATION_SETTINGS = {
+    'CHUNK_ROWS': 100_000,    # Rows read and downcast at a time
+    'MEMORY_LIMIT_MB': 256,   # Above this the data is sampled instead of loaded whole
+    'CATEGORY_RATIO': 0.5,    # Text columns with fewer distinct values per row become categoricals
+    'MAX_ROWS': 50_000,       # Larger frames are downsampled before they are embedded in a dashboard
+    'STRATIFY_MAX_GROUPS': 50,  # Most distinct values of a column that downsampling keeps proportions of
+    'CACHE_ENTRIES': 32,      # Dashboards kept in memory per process
+    'CACHE_MB': 256,          # Total size of the dashboards kept in memory per process
+}
+
+
+def visualization_settings() -> dict:
+    """Return the effective visualization settings"""
+    return {**DEFAULT_VISUALIZATION_SETTINGS, **getattr(settings, 'VISUALIZATION', {})}
+
+
+# Rows looked at to estimate a column's cardinality or size without scanning all of it
+SAMPLE_ROWS = 1000
+
+
+def frame_size(df: pd.DataFrame) -> int:
+    """Bytes held by a frame, with the size of text columns estimated from a sample"""
+    size = 0
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object and len(values) > SAMPLE_ROWS:
+            sample = values.iloc[:SAMPLE_ROWS].memory_usage(deep=True, index=False)
+            size += int(sample * len(values) / SAMPLE_ROWS)
+        else:
+            size += int(values.memory_usage(deep=True, index=False))
+    return size
+
+
+def downcast_frame(df: pd.DataFrame, category_ratio: float) -> pd.DataFrame:
+    """Shrink a frame: smallest numeric types that hold its values, categoricals for repetitive text"""
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            df[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_float_dtype(values):
+            df[column] = pd.to_numeric(values, downcast='float')
+        elif values.dtype == object and len(values):
+            # Mixed columns (e.g. lists from JSON) can't be hashed and stay as they are
+            try:
+                # Text that is mostly distinct shows it within a sample; skip counting all of it
+                sample = values.iloc[:SAMPLE_ROWS]
+                if len(values) > SAMPLE_ROWS and sample.nunique(dropna=True) > len(sample) * category_ratio:
+                    continue
+                distinct = values.nunique(dropna=True)
+            except TypeError:
+                continue
+            if distinct <= len(values) * category_ratio:
+                df[column] = values.astype('category')
+    return df
+
+
+def _concat_chunks(chunks: list) -> pd.DataFrame:
+    """Concatenate downcast chunks without turning categoricals back into text"""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = list(dict.fromkeys(column for chunk in chunks for column in chunk.columns))
+    data = {}
+    for column in columns:
+        parts = [chunk[column] for chunk in chunks if column in chunk.columns]
+        categorical = [isinstance(part.dtype, pd.CategoricalDtype) for part in parts]
+        if (len(parts) == len(chunks) and any(categorical)
+                and all(is_categorical or part.dtype == object for part, is_categorical in zip(parts, categorical))):
+            # A chunk too small or too varied to be downcast (often the last one) joins the categories
+            parts = [part if is_categorical else part.astype('category')
+                     for part, is_categorical in zip(parts, categorical)]
+            # Each chunk has its own categories; pd.concat would fall back to object
+            try:
+                data[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+            except TypeError:
+                # Categories of different types (numbers in one chunk, text in another) can't be unioned
+                data[column] = pd.concat(parts, ignore_index=True)
+        else:
+            data[column] = pd.concat(
+                [chunk[column] if column in chunk.columns else pd.Series([None] * len(chunk)) for chunk in chunks],
+                ignore_index=True
+            )
+    return pd.DataFrame(data)
+
+
+class _ChunkCollector:
+    """
+    Keeps downcast chunks of a file under a memory ceiling.
+
+    Once the kept rows outgrow the ceiling, they are thinned out by half and
+    every later chunk is sampled at the same rate, so the result stays a
+    uniform sample of the whole file.
+    """
+    def __init__(self, options: dict):
+        self.options = options
+        self.limit = options['MEMORY_LIMIT_MB'] * 1024 * 1024
+        self.rate = 1.0
+        self.chunks = []
+        self.size = 0
+        self.total_rows = 0
+        self.random = np.random.default_rng(0)
+
+    def add(self, chunk: pd.DataFrame):
+        self.total_rows += len(chunk)
+        if self.rate < 1.0:
+            chunk = chunk[self.random.random(len(chunk)) < self.rate]
+        chunk = downcast_frame(chunk.reset_index(drop=True), self.options['CATEGORY_RATIO'])
+        self.chunks.append(chunk)
+        self.size += frame_size(chunk)
+        while self.size > self.limit and self.rate > 1e-6:
+            self.rate /= 2
+            self.chunks = [chunk[self.random.random(len(chunk)) < 0.5].reset_index(drop=True) for chunk in self.chunks]
+            self.size = sum(frame_size(chunk) for chunk in self.chunks)
+
+    def frame(self) -> pd.DataFrame:
+        df = _concat_chunks(self.chunks)
+        if self.rate < 1.0:
+            logger.warning(
+                f"Visualization data exceeded {self.options['MEMORY_LIMIT_MB']} MB, "
+                f"kept a {self.rate:.2%} sample ({len(df)} of {self.total_rows} rows)"
+            )
+        return df
+
+
+def frame_digest(df: pd.DataFrame, *extra) -> str:
+    """Hash the content of a frame (plus anything else its dashboard depends on)"""
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([[str(column) for column in df.columns], [str(dtype) for dtype in df.dtypes], extra],
+                             default=str).encode())
+    try:
+        hasher.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells (lists or dicts from JSON) are hashed through their text
+        hasher.update(df.to_json(orient='values', default_handler=str).encode())
+    return hasher.hexdigest()
+
+
+def stratified_sample(df: pd.DataFrame, max_rows: int, max_groups: int):
+    """
+    Downsample a frame to about max_rows rows, keeping its mix of categories.
+
+    Rows are sampled within the groups of the column with the fewest distinct
+    values (at most max_groups), and every group keeps at least one row so rare
+    categories still show up in charts. Without such a column rows are sampled
+    uniformly. Row order is kept.
+
+    Returns:
+        tuple: the sample, and the column it was stratified by (or None)
+    """
+    column = None
+    fewest = max_groups + 1
+    for name in df.columns:
+        values = df[name]
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            try:
+                distinct = values.nunique(dropna=False)
+            except TypeError:
+                continue
+            if 1 < distinct < fewest:
+                column, fewest = name, distinct
+
+    rng = np.random.default_rng(0)
+    if column is None:
+        positions = rng.choice(len(df), size=max_rows, replace=False)
+    else:
+        fraction = max_rows / len(df)
+        groups = df.groupby(column, observed=True, dropna=False, sort=False).indices
+        positions = np.concatenate([
+            rng.choice(members, size=min(len(members), max(1, round(len(members) * fraction))), replace=False)
+            for members in groups.values()
+        ])
+    return df.iloc[np.sort(positions)].reset_index(drop=True), column
+
+
+class DashboardCache:
+    """Generated dashboard HTML, least recently used first out, bounded by count and total size"""
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key: str, html: str):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = html
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_dashboard_cache = None
+
+
+def get_dashboard_cache() -> DashboardCache:
+    """Return the process-wide dashboard cache configured from settings.VISUALIZATION"""
+    global _dashboard_cache
+    if _dashboard_cache is None:
+        options = visualization_settings()
+        _dashboard_cache = DashboardCache(options['CACHE_ENTRIES'], options['CACHE_MB'] * 1024 * 1024)
+    return _dashboard_cache
+
+
 class Pwbi:
     """
     A class for processing and visualizing data files using PowerBI-like interface.
-    Supports CSV, Excel, and JSON file formats.
+    Supports CSV, Excel, JSON, NDJSON and Parquet file formats.
     """
     def __init__(self):
         # Initialize items attribute to store processed data
         self.items = None
+        # Rows in the uploaded file and the fraction of them kept under the memory ceiling
+        self.total_rows = 0
+        self.sample_rate = 1.0
 
     def process_file(self, file):
         """
         Process uploaded files and convert them to pandas DataFrame.
 
+        Files are read in chunks of CHUNK_ROWS rows, and each chunk is downcast
+        (smaller numeric types, categoricals for repetitive text) before the next
+        one is read. If the data outgrows MEMORY_LIMIT_MB, a uniform sample of
+        the rows is kept instead (see total_rows and sample_rate).
+
         Args:
             file: File object containing the data to be processed
 
@@ -30,32 +277,93 @@ class Pwbi:
         """
         filename = file.name
         ext = os.path.splitext(filename)[1].lower()  # Get file extension in lowercase
+        options = visualization_settings()
+        collector = _ChunkCollector(options)
 
         # Handle CSV files
         if ext == '.csv':
-            return pd.read_csv(file)
+            try:
+                for chunk in self._read_csv(file, options['CHUNK_ROWS'], use_pyarrow=pa is not None):
+                    collector.add(chunk)
+            except ARROW_ERRORS as e:
+                # pyarrow fixes column types from the first block; pandas copes with types that change later
+                logger.info(f"Re-reading {filename} with pandas: {e}")
+                collector = _ChunkCollector(options)
+                for chunk in self._read_csv(file, options['CHUNK_ROWS'], use_pyarrow=False):
+                    collector.add(chunk)
 
         # Handle Excel files
         elif ext in ['.xlsx', '.xls']:
-            return pd.read_excel(file)
+            # Excel readers load the whole sheet; it is downcast in one go
+            collector.add(pd.read_excel(file))
 
-        # Handle JSON files
-        elif ext == '.json':
-            with file.open('r') as f:
+        # Handle JSON files: one array of records, or one record per line
+        elif ext in ['.json', '.ndjson', '.jsonl']:
+            if ext == '.json' and not self._is_json_lines(file):
+                with file.open('r') as f:
+                    try:
+                        data = json.load(f)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Invalid JSON: {str(e)}")
+                collector.add(pd.DataFrame(data))
+            else:
+                file.seek(0)
                 try:
-                    data = json.load(f)
-                except json.JSONDecodeError as e:
+                    # Uploads are binary; the chunked line reader needs text
+                    lines = codecs.getreader('utf-8')(file)
+                    for chunk in pd.read_json(lines, lines=True, chunksize=options['CHUNK_ROWS']):
+                        collector.add(chunk)
+                except ValueError as e:
                     raise ValueError(f"Invalid JSON: {str(e)}")
-            return pd.DataFrame(data)
+
+        # Handle Parquet files
+        elif ext == '.parquet':
+            if pa is None:
+                raise ValueError("Parquet files need pyarrow installed on the server.")
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=options['CHUNK_ROWS']):
+                collector.add(batch.to_pandas())
 
         # Raise error for unsupported file types
         else:
-            raise ValueError("Unsupported file format. Please upload CSV or JSON files only.")
+            raise ValueError("Unsupported file format. Please upload CSV, Excel, JSON, NDJSON or Parquet files only.")
+
+        self.total_rows = collector.total_rows
+        self.sample_rate = collector.rate
+        return collector.frame()
+
+    @staticmethod
+    def _read_csv(file, chunk_rows: int, use_pyarrow: bool):
+        """Yield a CSV file in chunks, with pyarrow's multithreaded reader or pandas' C engine"""
+        file.seek(0)
+        if use_pyarrow:
+            reader = pa_csv.open_csv(file, read_options=pa_csv.ReadOptions(block_size=16 * 1024 * 1024))
+            for batch in reader:
+                yield batch.to_pandas()
+            return
+        yield from pd.read_csv(file, chunksize=chunk_rows)
+
+    @staticmethod
+    def _is_json_lines(file) -> bool:
+        """A .json file holds JSON lines if its first line is a whole object and more lines follow"""
+        file.seek(0)
+        first_line = file.readline()
+        has_more = bool(file.read(1024).strip())
+        file.seek(0)
+        if not has_more:
+            return False
+        try:
+            return isinstance(json.loads(first_line), dict)
+        except ValueError:
+            return False
 
     def dashboard(self):
         """
         Generate an interactive dashboard visualization using pygwalker.
-        Processes data asynchronously using ThreadPoolExecutor for better performance.
+
+        pygwalker embeds the whole frame in the page, so frames above MAX_ROWS
+        are downsampled first (see stratified_sample) and the page says how many
+        rows it shows. Dashboards are cached by a hash of the data, so opening
+        the same dataset again skips generating it.
 
         Returns:
             str: HTML string containing the interactive dashboard
@@ -63,18 +371,33 @@ class Pwbi:
         Raises:
             ValueError: If pygwalker fails to generate HTML output
         """
-        # Use ThreadPoolExecutor for concurrent processing
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Convert items to DataFrame asynchronously
-            future_items_df = executor.submit(pd.DataFrame, self.items)
-            items_df = future_items_df.result()
-
-            # Generate pygwalker visualization asynchronously
-            future_pyg_html = executor.submit(pyg.walk(items_df).to_html)
-            pyg_html = future_pyg_html.result()
-
-        # Verify and return the HTML output
-        if isinstance(pyg_html, str):
+        options = visualization_settings()
+        # items may be a DataFrame already (uploads) or a list of records (stored results)
+        items_df = self.items if isinstance(self.items, pd.DataFrame) else pd.DataFrame(self.items)
+        total_rows = max(self.total_rows, len(items_df))
+
+        cache = get_dashboard_cache()
+        key = frame_digest(items_df, total_rows, options['MAX_ROWS'], options['STRATIFY_MAX_GROUPS'])
+        pyg_html = cache.get(key)
+        if pyg_html is not None:
             return pyg_html
-        else:
-            raise ValueError("Error: pyg.walk did not return a string.")
\ No newline at end of file
+
+        stratified_by = None
+        if len(items_df) > options['MAX_ROWS']:
+            items_df, stratified_by = stratified_sample(items_df, options['MAX_ROWS'], options['STRATIFY_MAX_GROUPS'])
+
+        pyg_html = pyg.walk(items_df).to_html()
+
+        # Verify the HTML output
+        if not isinstance(pyg_html, str):
+            raise ValueError("Error: pyg.walk did not return a string.")
+
+        if len(items_df) < total_rows:
+            sampling = f", sampled in proportion to {html.escape(str(stratified_by))}" if stratified_by is not None else ''
+            pyg_html = (
+                f'<div class="visualization-note">Showing {len(items_df):,} of {total_rows:,} rows{sampling}.</div>'
+                + pyg_html
+            )
+
+        cache.set(key, pyg_html)
+        return pyg_html
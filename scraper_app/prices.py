@@ -0,0 +1,195 @@
+# scraper_app/prices.py
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Currency symbols, matched anywhere in a value
+CURRENCY_SYMBOLS = [
+    '$', '€', '£', '¥', '₹', '₽', '₺', '₩', '₪', '₫', '฿', '₦', '₴', '؋', '៛', '₡', '₲', '₵', '﷼', '₭',
+    '₮', '₱', '₨', '₸', '₾',
+]
+
+# Currency abbreviations that are words, matched only when not part of a longer word
+CURRENCY_WORDS = [
+    'Ar', 'R', 'Br', 'лв', 'Kč', 'kr', 'Q', 'Ft', 'Rp', 'J$', 'ден', 'MT', 'C$', 'P', 'S/', 'zł', 'lei',
+    'Lei', 'руб', 'DB', 'Bs', 'TSh',
+]
+
+# ISO 4217 codes, matched as whole words in any letter case
+CURRENCY_CODES = [
+    'USD', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CNY', 'INR', 'RUB', 'TRY', 'KRW', 'ILS', 'VND', 'THB', 'NGN',
+    'BRL', 'ZAR', 'HKD', 'SGD', 'MYR', 'MXN', 'PHP', 'PLN', 'IDR', 'SAR', 'EGP', 'CHF', 'NOK', 'SEK', 'NZD',
+    'DKK', 'AED', 'KWD', 'ARS', 'COP', 'PEN', 'CLP', 'UAH', 'GHS', 'AOA', 'BHD', 'BWP', 'GIP', 'LKR', 'MVR',
+    'MUR', 'NAD', 'PGK', 'TOP', 'UYU', 'WST', 'YER', 'AFN', 'ALL', 'DZD', 'XCD', 'AMD', 'AWG', 'AZN', 'BSD',
+    'BDT', 'BBD', 'BYN', 'BZD', 'BMD', 'BOB', 'BAM', 'BND', 'BGN', 'BIF', 'CVE', 'KHR', 'XAF', 'XPF', 'KYD',
+    'KMF', 'CLF', 'KPW', 'CRC', 'CUP', 'DOP', 'DJF', 'ERN', 'SZL', 'ETB', 'FJD', 'GMD', 'XAU', 'XAG', 'XPT',
+    'XPD', 'GYD', 'HTG', 'HUF', 'IRR', 'IQD', 'ISK', 'JOD', 'KZT', 'KGS', 'LAK', 'LBP', 'LSL', 'LRD', 'LYD',
+    'MGA', 'MKD', 'MMK', 'MNT', 'MAD', 'MZN', 'NIO', 'OMR', 'PKR', 'PYG', 'QAR', 'RON', 'RWF', 'STD', 'SCR',
+    'SLL', 'SBD', 'SOS', 'SSP', 'SDG', 'SRD', 'SYP', 'TJS', 'TMT', 'TND', 'UGX', 'UZS', 'VEF', 'VUV', 'XOF',
+    'ZMW', 'ZWL',
+]
+
+UNKNOWN_CURRENCY = 'Unknown'
+
+# Name of a price field that has already been normalized, e.g. "Price (USD)"
+NORMALIZED_FIELD = re.compile(r'^price \((?P<currency>[^()]+)\)$', re.IGNORECASE)
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Build a regex alternation shaped like a trie, so matching never backtracks across alternatives"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        ends = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Optional continuation is greedy, so the longest token wins
+        return f'(?:{pattern})?' if ends else pattern
+
+    return build(trie)
+
+
+_LETTER = r'[^\W\d_]'
+
+CURRENCY_PATTERN = re.compile(
+    '(?P<currency>'
+    + _trie_pattern(CURRENCY_SYMBOLS)
+    + f'|(?<!{_LETTER})(?:(?i:{_trie_pattern(CURRENCY_CODES)})|{_trie_pattern(CURRENCY_WORDS)})(?!{_LETTER})'
+    + ')'
+)
+
+# The first number in a value, with any grouping characters inside it
+NUMBER_PATTERN = re.compile(r"-?\d(?:[\d.,'\s]*\d)?")
+
+# Digits collapse to '9', so a column's numbers reduce to a handful of shapes like "9,999.99"
+NUMBER_SHAPE = str.maketrans('0123456789', '9999999999')
+
+# Turn a number into Python float syntax once its decimal separator is known
+GROUPING_CHARACTERS = {' ': None, "'": None, '\u00a0': None, '\u202f': None}
+COMMA_DECIMAL = str.maketrans({**GROUPING_CHARACTERS, '.': None, ',': '.'})
+DOT_DECIMAL = str.maketrans({**GROUPING_CHARACTERS, ',': None})
+
+_CANONICAL_CODES = {code.lower(): code for code in CURRENCY_CODES}
+
+
+def _canonical_currency(currency: str) -> str:
+    return _CANONICAL_CODES.get(currency.lower(), currency)
+
+
+def _decimal_separator(shape: str) -> Optional[str]:
+    """
+    Return the decimal separator a number shape proves, or None if it fits both locales.
+
+    With both separators the last one is decimal; a repeated separator is a
+    grouping one; a lone separator is decimal unless exactly three digits follow
+    it ("1,234" or "1.234" could be either).
+    """
+    comma, dot = shape.rfind(','), shape.rfind('.')
+    if comma >= 0 and dot >= 0:
+        return ',' if comma > dot else '.'
+    separator = ',' if comma >= 0 else '.' if dot >= 0 else None
+    if separator is None:
+        return '.'
+    if shape.count(separator) > 1:
+        return '.' if separator == ',' else ','
+    if len(shape) - shape.rfind(separator) - 1 != 3:
+        return separator
+    return None
+
+
+def _to_float(number: str, decimal_separator: str) -> float:
+    try:
+        return float(number.translate(COMMA_DECIMAL if decimal_separator == ',' else DOT_DECIMAL))
+    except ValueError:
+        return np.nan
+
+
+def normalize_price_column(field: str, values: list) -> Tuple[List[str], list]:
+    """
+    Normalize one price column.
+
+    The column is factorized so every distinct value is parsed once, and number
+    formats are classified per distinct shape. Values whose format fits both
+    locales ("1,234") follow the majority of the column. Currencies are detected
+    for the whole column: values without one take the column's currency when it
+    has exactly one. Numbers that cannot be parsed keep their original value,
+    numbers stay numbers, and running it again on its own output changes nothing.
+
+    Returns:
+        tuple: the new field name of every value, and the converted values
+    """
+    column = pd.Series(values, dtype=object)
+    is_number = column.map(type).isin((int, float)).to_numpy()
+    codes, uniques = pd.factorize(column.where(~is_number & column.notna(), ''))
+    uniques = [str(value) for value in uniques]
+
+    # Number formats, decided per shape and voted on across the column
+    numbers = [match.group() if match else '' for match in map(NUMBER_PATTERN.search, uniques)]
+    shape_codes, shapes = pd.factorize(pd.Series([number.translate(NUMBER_SHAPE) for number in numbers], dtype=object))
+    shape_separators = [_decimal_separator(shape) for shape in shapes]
+    shape_counts = np.bincount(shape_codes[codes[~is_number]], minlength=len(shapes))
+    comma_votes = sum(count for count, separator in zip(shape_counts, shape_separators) if separator == ',')
+    dot_votes = sum(count for count, separator in zip(shape_counts, shape_separators) if separator == '.')
+    column_separator = ',' if comma_votes > dot_votes else '.'
+
+    parsed = np.array([
+        _to_float(number, shape_separators[shape_code] or column_separator) if number else np.nan
+        for number, shape_code in zip(numbers, shape_codes)
+    ])[codes]
+
+    result = column.to_numpy(dtype=object).copy()
+    converted = ~is_number & ~np.isnan(parsed)
+    result[converted] = parsed[converted].tolist()
+    result[is_number] = column[is_number].astype(float).tolist()
+
+    normalized = NORMALIZED_FIELD.match(field)
+    if normalized:
+        # Already converted; only values edited or round-tripped as text needed parsing
+        return [f'Price ({_canonical_currency(normalized.group("currency"))})'] * len(values), result.tolist()
+
+    currencies = [match.group() if match else None for match in map(CURRENCY_PATTERN.search, uniques)]
+    found = {_canonical_currency(currency) for currency in currencies if currency}
+    if len(found) <= 1:
+        name = f'Price ({found.pop() if found else UNKNOWN_CURRENCY})'
+        return [name] * len(values), result.tolist()
+
+    unique_names = np.array([
+        f'Price ({_canonical_currency(currency) if currency else UNKNOWN_CURRENCY})' for currency in currencies
+    ], dtype=object)
+    return unique_names[codes].tolist(), result.tolist()
+
+
+def parse_price_fields(data):
+    """
+    Parse and convert price fields in the data.
+
+    Returns a copy of data with new row dicts; the rows passed in are left as they are.
+    """
+    rows = data.get('rows', [])
+    if not rows:
+        return data
+    rows = [dict(row) for row in rows]
+
+    # Find price fields in the data; rows from different sources may name them differently
+    fields = dict.fromkeys(field for row in rows for field in row)
+    price_fields = [field for field in fields if 'price' in field.lower()]
+
+    for field in price_fields:
+        present = [row for row in rows if field in row]
+        names, values = normalize_price_column(field, [row[field] for row in present])
+
+        # Replace the original field with its normalized one
+        for row, name, value in zip(present, names, values):
+            row.pop(field)
+            row[name] = value
+
+    return {**data, 'rows': rows}
@@ -0,0 +1,291 @@
+# scraper_app/profiling.py
+import asyncio
+import functools
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+from .metrics import add_span_listener, remove_span_listener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING_SETTINGS = {
+    'ENABLED': True,
+    'TOKEN': '',              # Lets requests with "X-Profile-Token: <TOKEN>" profile without a staff login
+    'INTERVAL': 0.005,        # Seconds between stack samples
+    'MAX_PROFILES': 50,       # Stored profiles; the oldest are deleted
+    'TOP_FUNCTIONS': 40,      # Functions listed in a profile's summary
+}
+
+# Python frames where a thread waits instead of working; such samples count as idle
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto'),
+    ('socketserver.py', 'serve_forever'),
+    ('thread.py', '_worker'),
+}
+
+_active_profiles = 0
+_active_lock = threading.Lock()
+
+
+def profiling_settings() -> dict:
+    """Return the effective profiling settings"""
+    return {**DEFAULT_PROFILING_SETTINGS, **getattr(settings, 'PROFILING', {})}
+
+
+def profile_dir() -> str:
+    return os.path.join(settings.SCRAPER_STATE_DIR, 'profiles')
+
+
+def is_profiling() -> bool:
+    """Whether a profile is being recorded in this process"""
+    return _active_profiles > 0
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Profile:
+    """
+    Samples the stacks of every thread of the process while a request runs.
+
+    Scrapes do their work on the background loop and pool threads rather than
+    the request thread, so all threads are sampled. Pipeline stages and LLM
+    calls (see metrics.py) are recorded as spans with the asyncio task that ran
+    them. The profile is stored as a JSON summary plus collapsed stacks, which
+    flamegraph.pl and speedscope read.
+    """
+    def __init__(self, request, view_name: str, **options):
+        self.options = {**DEFAULT_PROFILING_SETTINGS, **options}
+        self.id = str(uuid.uuid4())
+        self.view_name = view_name
+        self.method = request.method
+        self.path = request.path
+        self.stacks = Counter()
+        self.spans = []
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._started_at = None
+
+    def start(self):
+        global _active_profiles
+        with _active_lock:
+            _active_profiles += 1
+        self._started_at = time.time()
+        self._started = time.monotonic()
+        add_span_listener(self.spans)
+        self._thread = threading.Thread(target=self._sample, name=f'profile-{self.id[:8]}', daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.options['INTERVAL']):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(labels))] += 1
+            self.sample_count += 1
+
+    def stop(self, status: Optional[int] = None):
+        """Stop sampling and store the profile"""
+        global _active_profiles
+        if self._thread is None:
+            return
+        duration = time.monotonic() - self._started
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        remove_span_listener(self.spans)
+        with _active_lock:
+            _active_profiles -= 1
+        try:
+            self._save(duration, status)
+        except OSError as e:
+            logger.warning(f"Could not store profile {self.id}: {e}")
+
+    def summary(self) -> dict:
+        """Busy samples per function: where threads were (self) and what was on their stacks (cumulative)"""
+        own, cumulative = Counter(), Counter()
+        busy = idle = 0
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            top = frames[-1]
+            name, _, location = top[:-1].rpartition(' (')
+            if (location.split(':')[0], name) in IDLE_FRAMES:
+                idle += count
+                continue
+            busy += count
+            own[top] += count
+            for frame in set(frames):
+                cumulative[frame] += count
+        limit = self.options['TOP_FUNCTIONS']
+        return {
+            'busy_samples': busy,
+            'idle_samples': idle,
+            'self': own.most_common(limit),
+            'cumulative': cumulative.most_common(limit),
+        }
+
+    def _save(self, duration: float, status: Optional[int]):
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        spans = sorted(
+            ({**span, 'start': round(span['start'] - self._started, 4)} for span in self.spans),
+            key=lambda span: span['start'],
+        )
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span['stage'], {'seconds': 0.0, 'count': 0})
+            stage['seconds'] = round(stage['seconds'] + span['seconds'], 4)
+            stage['count'] += 1
+        meta = {
+            'id': self.id,
+            'view': self.view_name,
+            'method': self.method,
+            'path': self.path,
+            'status': status,
+            'started_at': self._started_at,
+            'duration': round(duration, 4),
+            'interval': self.options['INTERVAL'],
+            'samples': self.sample_count,
+            'stages': stages,
+            'spans': spans,
+            **self.summary(),
+        }
+        with open(os.path.join(directory, f'{self.id}.collapsed'), 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(os.path.join(directory, f'{self.id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        logger.info(f"Stored profile {self.id} of {self.method} {self.path} ({duration:.2f}s)")
+        _prune(directory, self.options['MAX_PROFILES'])
+
+
+def _prune(directory: str, keep: int):
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in profiles[keep:]:
+        for path in (entry.path, entry.path[:-len('.json')] + '.collapsed'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load_profile(profile_id: str, collapsed: bool = False) -> Optional[str]:
+    """Return a stored profile's JSON summary or collapsed stacks, or None if it does not exist"""
+    path = os.path.join(profile_dir(), f"{uuid.UUID(str(profile_id))}.{'collapsed' if collapsed else 'json'}")
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _requested(request) -> bool:
+    return request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def may_profile(request, user) -> bool:
+    """Staff users, and requests carrying the profiling token, may profile and read profiles"""
+    options = profiling_settings()
+    if not options['ENABLED']:
+        return False
+    token = request.headers.get('X-Profile-Token', '')
+    if options['TOKEN'] and hmac.compare_digest(token.encode(), options['TOKEN'].encode()):
+        return True
+    return bool(getattr(user, 'is_staff', False))
+
+
+def _finish(response, profile: Profile):
+    """Stop the profile when the response is sent, which for streaming responses is after the view returns"""
+    response['X-Profile-Id'] = profile.id
+    if not response.streaming:
+        profile.stop(response.status_code)
+        return response
+
+    content = response.streaming_content
+    if response.is_async:
+        async def profiled_content():
+            try:
+                async for part in content:
+                    yield part
+            finally:
+                profile.stop(response.status_code)
+    else:
+        def profiled_content():
+            try:
+                yield from content
+            finally:
+                profile.stop(response.status_code)
+    response.streaming_content = profiled_content()
+    return response
+
+
+def profiled(view):
+    """
+    Profile a view when a staff user (or a holder of the profiling token) asks
+    for it with ?profile=1 or an "X-Profile: 1" header.
+
+    The response carries the profile's ID in X-Profile-Id; the profile can be
+    fetched from /api/profiles/<id>/ once the response has been sent.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not _requested(request) or not may_profile(request, await request.auser()):
+                return await view(request, *args, **kwargs)
+            profile = Profile(request, view.__name__, **profiling_settings())
+            profile.start()
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await asyncio.to_thread(profile.stop)
+                raise
+            if not response.streaming:
+                await asyncio.to_thread(profile.stop, response.status_code)
+            return _finish(response, profile)
+        return wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _requested(request) or not may_profile(request, request.user):
+            return view(request, *args, **kwargs)
+        profile = Profile(request, view.__name__, **profiling_settings())
+        profile.start()
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            profile.stop()
+            raise
+        return _finish(response, profile)
+    return wrapper
@@ -0,0 +1,154 @@
+# scraper_app/records.py
+import re
+import statistics
+from collections import Counter
+from typing import Dict, List, Optional
+
+DEFAULT_RECORD_SETTINGS = {
+    'ENABLED': True,
+    'MIN_RECORDS': 3,          # Repeated siblings needed before a structure counts as a listing grid
+    'MIN_FIELDS': 2,           # Text pieces a typical record has (a lone title or price is a field, not a record)
+    'MIN_RECORD_CHARS': 20,
+    'MAX_RECORD_CHARS': 3000,  # Larger repeated blocks are page sections, not records
+    'MIN_COVERAGE': 0.15,      # Share of the page text the records must hold, or the whole page is sent
+    'FINER_RATIO': 0.8,        # A group with more records wins if it keeps this much of the best group's text
+}
+
+WHITESPACE = re.compile(r'\s+')
+
+FIELD_SEPARATOR = ' | '
+
+
+def _signature(element) -> str:
+    """Tag plus the first class, which is the base class by convention ("card" in "card card--sale")"""
+    classes = (element.get('class') or '').split()
+    return f'{element.tag}.{classes[0]}' if classes else element.tag
+
+
+def _text_pieces(text: Optional[str]) -> int:
+    return 1 if text and not text.isspace() else 0
+
+
+def _text_length(text: Optional[str]) -> int:
+    return len(text.strip()) if text else 0
+
+
+def record_text(element) -> str:
+    """Flatten a record to one line, its text pieces separated by ' | '"""
+    pieces = []
+    for text in element.itertext():
+        piece = WHITESPACE.sub(' ', text).strip()
+        if piece and (not pieces or pieces[-1] != piece):
+            pieces.append(piece)
+    return FIELD_SEPARATOR.join(pieces)
+
+
+def find_record_elements(document, **options) -> Optional[list]:
+    """
+    Find the repeated sibling subtrees that make up a listing grid.
+
+    Elements are grouped by signature (tag and base class) under the same
+    parent, and also across parents under the same grandparent, so cards split
+    over grid rows still form one group. Groups whose typical member is
+    record-sized (several text pieces, MIN_RECORD_CHARS to MAX_RECORD_CHARS) are
+    candidates; the group holding the most text wins, except that a group with
+    more, smaller records wins if it keeps FINER_RATIO of that text (cards over
+    the rows that contain them).
+
+    Args:
+        document: lxml element tree of the page with non-content elements removed
+
+    Returns:
+        list: the record elements in page order, or None if the page has no listing grid
+    """
+    options = {**DEFAULT_RECORD_SETTINGS, **options}
+
+    # Text length and piece count of every subtree, children before parents
+    elements = [element for element in document.iter() if isinstance(element.tag, str)]
+    length: Dict[object, int] = {}
+    pieces: Dict[object, int] = {}
+    for element in reversed(elements):
+        element_length = _text_length(element.text)
+        element_pieces = _text_pieces(element.text)
+        for child in element:
+            element_length += length.get(child, 0) + _text_length(child.tail)
+            element_pieces += pieces.get(child, 0) + _text_pieces(child.tail)
+        length[element] = element_length
+        pieces[element] = element_pieces
+
+    page_length = length.get(document, 0)
+    if not page_length:
+        return None
+
+    groups: Dict[tuple, list] = {}
+    for element in elements:
+        parent = element.getparent()
+        if parent is None or not length[element]:
+            continue
+        signature = _signature(element)
+        groups.setdefault((parent, signature), []).append(element)
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            groups.setdefault((grandparent, _signature(parent), signature), []).append(element)
+
+    candidates = []
+    for members in groups.values():
+        if len(members) < options['MIN_RECORDS']:
+            continue
+        typical_length = statistics.median(length[member] for member in members)
+        typical_pieces = statistics.median(pieces[member] for member in members)
+        if (typical_pieces < options['MIN_FIELDS']
+                or not options['MIN_RECORD_CHARS'] <= typical_length <= options['MAX_RECORD_CHARS']):
+            continue
+        candidates.append((sum(length[member] for member in members), members))
+    if not candidates:
+        return None
+
+    best_total = max(total for total, _ in candidates)
+    if best_total < options['MIN_COVERAGE'] * page_length:
+        return None
+    _, members = max(
+        (candidate for candidate in candidates if candidate[0] >= options['FINER_RATIO'] * best_total),
+        key=lambda candidate: (len(candidate[1]), candidate[0]),
+    )
+    return members
+
+
+def find_records(document, **options) -> Optional[List[str]]:
+    """Flatten the records of a page's listing grid to one line each, or return None without a grid"""
+    members = find_record_elements(document, **options)
+    return [record_text(member) for member in members] if members else None
+
+
+def container_selector(records: list) -> str:
+    """CSS selector of the record containers, e.g. div.row > div.card"""
+    parent = records[0].getparent()
+    return f'{_signature(parent)} > {_signature(records[0])}'
+
+
+def record_fields(record) -> Dict[str, str]:
+    """
+    Map the CSS path of every element in a record, relative to the record, to its text.
+
+    Siblings sharing a signature are told apart with :nth-child(). Links also
+    map their "path@href" to the href, so URL fields can be found too.
+    """
+    fields = {'@href': record.get('href')} if record.get('href') else {}
+
+    def walk(element, path: str):
+        children = [child for child in element if isinstance(child.tag, str)]
+        counts = Counter(_signature(child) for child in children)
+        for position, child in enumerate(children, start=1):
+            step = _signature(child)
+            if counts[step] > 1:
+                step += f':nth-child({position})'
+            child_path = f'{path} > {step}' if path else step
+            text = WHITESPACE.sub(' ', ''.join(child.itertext())).strip()
+            if text:
+                fields[child_path] = text
+            if child.get('href'):
+                fields[f'{child_path}@href'] = child.get('href')
+            walk(child, child_path)
+
+    walk(record, '')
+    return fields
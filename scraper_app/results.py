@@ -0,0 +1,154 @@
+# scraper_app/results.py
+import logging
+from datetime import timedelta
+from typing import Iterator, List, Mapping, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FloatField, Q, QuerySet
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .exceptions import ScraperError
+from .exports import export_settings, row_columns
+from .models import ScrapeJob, ScrapeResult, ScrapeResultRow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_SETTINGS = {
+    'PAGE_SIZE': 100,         # Rows per page of the query API unless the client asks otherwise
+    'MAX_PAGE_SIZE': 1000,    # Largest page a client may ask for
+    'MAX_AGE_DAYS': 30,       # Stored results older than this are deleted; 0 keeps them forever
+}
+
+# Query parameters that are not column filters ('profile' turns on the request profiler, see profiling.py)
+RESERVED_PARAMETERS = {'page', 'page_size', 'q', 'sort', 'profile'}
+
+
+def result_settings() -> dict:
+    """Return the effective result store settings"""
+    return {**DEFAULT_RESULT_SETTINGS, **getattr(settings, 'RESULTS', {})}
+
+
+class ResultWriter:
+    """Stores the rows of one scrape as they arrive, so a stream can be saved chunk by chunk"""
+    def __init__(self, url: str, user: str = '', job: ScrapeJob = None):
+        purge_expired_results()
+        self.result = ScrapeResult.objects.create(url=url, user=user, job=job)
+
+    def add(self, rows: List[dict]):
+        """Append rows whose prices are already normalized"""
+        if not rows:
+            return
+        result = self.result
+        ScrapeResultRow.objects.bulk_create([
+            ScrapeResultRow(result=result, position=result.row_count + offset, data=row)
+            for offset, row in enumerate(rows)
+        ], batch_size=export_settings()['BATCH_ROWS'])
+        result.row_count += len(rows)
+        row_columns(rows, result.columns)
+        result.save(update_fields=['row_count', 'columns'])
+
+    def discard(self):
+        self.result.delete()
+
+
+def save_result(url: str, rows: List[dict], user: str = '', job: ScrapeJob = None) -> ScrapeResult:
+    """Store the rows of a finished scrape, with prices already normalized"""
+    with transaction.atomic():
+        writer = ResultWriter(url, user, job)
+        writer.add(rows)
+    return writer.result
+
+
+def purge_expired_results() -> int:
+    """Delete results older than MAX_AGE_DAYS"""
+    max_age = result_settings()['MAX_AGE_DAYS']
+    if not max_age:
+        return 0
+    deleted, _ = ScrapeResult.objects.filter(created_at__lt=timezone.now() - timedelta(days=max_age)).delete()
+    if deleted:
+        logger.info(f"Deleted {deleted} expired result objects")
+    return deleted
+
+
+def job_result(job: ScrapeJob) -> Optional[ScrapeResult]:
+    """The stored result of a succeeded job"""
+    return job.results.order_by('-created_at').first()
+
+
+def filter_rows(result: ScrapeResult, params: Mapping) -> QuerySet:
+    """
+    Select the rows of a result that match query parameters.
+
+    Any parameter named after a column keeps rows whose value contains it
+    (case-insensitive); `<column>__gte` and `<column>__lte` compare numbers; `q`
+    searches every column; `sort` orders by a column, descending with a leading
+    '-'. Rows are scanned only within their result, through its position index,
+    and values are read with SQLite's JSON functions.
+
+    Raises:
+        ScraperError: if a parameter names an unknown column or is not a number where one is needed
+    """
+    rows = result.rows.all()
+    columns = result.columns
+
+    def column(name: str) -> str:
+        if name not in columns:
+            raise ScraperError(f"Unknown column: {name}")
+        return name
+
+    search = params.get('q')
+    if search:
+        condition = Q()
+        for index, name in enumerate(columns):
+            rows = rows.alias(**{f'column_{index}': KeyTextTransform(name, 'data')})
+            condition |= Q(**{f'column_{index}__icontains': search})
+        rows = rows.filter(condition)
+
+    for index, (key, value) in enumerate(params.items()):
+        if key in RESERVED_PARAMETERS or value == '':
+            continue
+        name, _, operator = key.rpartition('__') if key.endswith(('__gte', '__lte')) else (key, '', 'icontains')
+        alias = f'filter_{index}'
+        if operator == 'icontains':
+            rows = rows.alias(**{alias: KeyTextTransform(column(name), 'data')})
+            rows = rows.filter(**{f'{alias}__icontains': value})
+        else:
+            try:
+                number = float(value)
+            except ValueError:
+                raise ScraperError(f"{key} must be a number")
+            rows = rows.alias(**{alias: Cast(KeyTransform(column(name), 'data'), FloatField())})
+            rows = rows.filter(**{f'{alias}__{operator}': number})
+
+    sort = params.get('sort')
+    if sort:
+        value = KeyTransform(column(sort.lstrip('-')), 'data')
+        rows = rows.order_by(value.desc(nulls_last=True) if sort.startswith('-') else value.asc(nulls_last=True),
+                             'position')
+    else:
+        rows = rows.order_by('position')
+    return rows
+
+
+def page_bounds(params: Mapping) -> tuple:
+    """
+    Read the requested page and page size.
+
+    Returns:
+        tuple: page number (from 1) and page size
+    """
+    options = result_settings()
+    try:
+        page = max(1, int(params.get('page', 1)))
+        page_size = int(params.get('page_size', options['PAGE_SIZE']))
+    except ValueError:
+        raise ScraperError("page and page_size must be whole numbers")
+    return page, min(max(1, page_size), options['MAX_PAGE_SIZE'])
+
+
+def iter_row_data(rows: QuerySet) -> Iterator[dict]:
+    """Stream the data of selected rows from the database in batches"""
+    return rows.values_list('data', flat=True).iterator(chunk_size=export_settings()['BATCH_ROWS'])
@@ -0,0 +1,143 @@
+# scraper_app/runtime.py
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import AsyncIterator, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """
+    A single asyncio event loop running in a daemon thread.
+
+    Playwright browsers and other process-wide async resources are bound to the
+    loop they were created on, while Django runs every async view under WSGI in
+    its own short-lived loop. Running shared resources on this loop lets all
+    requests of a worker process use them.
+    """
+    def __init__(self, name: str = 'scraper-runtime'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the background loop, starting it (again after a fork) if needed"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                started = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._loop, started), name=self.name, daemon=True
+                )
+                self._thread.start()
+                started.wait()
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, started: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the background loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro):
+        """Await a coroutine on the background loop from another event loop"""
+        loop = self.loop
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is loop:
+            return await coro
+
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Propagate cancellation (e.g. a dropped client) to the background task
+            future.cancel()
+            raise
+
+    def run_sync(self, coro, timeout: float = None):
+        """Run a coroutine on the background loop and block until it finishes"""
+        return self.submit(coro).result(timeout)
+
+    async def iterate(self, agen: AsyncIterator) -> AsyncIterator:
+        """Iterate an async generator on the background loop from another event loop"""
+        try:
+            while True:
+                item = await self.run(_next_item(agen))
+                if item is _EXHAUSTED:
+                    return
+                yield item
+        finally:
+            # Runs when the consumer stops early too, e.g. a disconnected client
+            await self.run(_close(agen))
+
+    def iterate_sync(self, agen: AsyncIterator) -> Iterator:
+        """Iterate an async generator on the background loop from synchronous code"""
+        try:
+            while True:
+                item = self.run_sync(_next_item(agen))
+                if item is _EXHAUSTED:
+                    return
+                yield item
+        finally:
+            self.run_sync(_close(agen), timeout=30)
+
+    def is_running(self) -> bool:
+        return self._loop is not None and self._pid == os.getpid() and self._loop.is_running()
+
+
+_EXHAUSTED = object()
+
+
+async def _next_item(agen: AsyncIterator):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+
+async def _close(agen: AsyncIterator):
+    try:
+        await agen.aclose()
+    except RuntimeError:
+        # Still unwinding from a cancelled __anext__; it cleans up by itself
+        pass
+
+
+_background_loop = BackgroundLoop()
+_shutdown_hooks = []
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Return the process-wide background loop"""
+    return _background_loop
+
+
+def register_shutdown_hook(coro_factory):
+    """Register a coroutine factory to run on the background loop at interpreter exit"""
+    _shutdown_hooks.append(coro_factory)
+
+
+@atexit.register
+def _shutdown():
+    if not _background_loop.is_running():
+        return
+    for coro_factory in reversed(_shutdown_hooks):
+        try:
+            _background_loop.run_sync(coro_factory(), timeout=10)
+        except Exception as e:
+            logger.warning(f"Error during background shutdown: {e}")
@@ -0,0 +1,159 @@
+# scraper_app/scrolling.py
+import logging
+import time
+
+from django.conf import settings
+
+from .host_memory import get_host_memory
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCROLL_SETTINGS = {
+    'TIME_BUDGET': 8.0,       # Seconds of scrolling allowed per page
+    'MAX_ROUNDS': 60,         # Hard cap on scroll rounds per page
+    'QUIET_MS': 150,          # DOM must stay unchanged this long after a scroll
+    'MAX_ROUND_WAIT_MS': 1500,  # Longest wait for the DOM to settle after one scroll
+    'STABLE_ROUNDS': 2,       # Unchanged rounds in a row before the page counts as loaded
+}
+
+# Scroll, then resolve once the DOM has been quiet for quietMs (or maxWaitMs has passed)
+SETTLE_SCRIPT = """
+async ({quietMs, maxWaitMs}) => {
+    const root = document.scrollingElement || document.documentElement;
+    await new Promise(resolve => {
+        let quietTimer = null;
+        const observer = new MutationObserver(() => {
+            clearTimeout(quietTimer);
+            quietTimer = setTimeout(done, quietMs);
+        });
+        const capTimer = setTimeout(done, maxWaitMs);
+        function done() {
+            observer.disconnect();
+            clearTimeout(quietTimer);
+            clearTimeout(capTimer);
+            resolve();
+        }
+        observer.observe(document.body || root, {childList: true, subtree: true});
+        quietTimer = setTimeout(done, quietMs);
+    });
+    return {
+        height: root.scrollHeight,
+        nodes: document.getElementsByTagName('*').length,
+        viewport: window.innerHeight,
+        scrollY: window.scrollY,
+        atBottom: window.innerHeight + window.scrollY >= root.scrollHeight - 2,
+    };
+}
+"""
+
+
+class _RequestTracker:
+    """Counts in-flight requests of a page while scrolling"""
+    def __init__(self, page):
+        self.page = page
+        self.pending = 0
+
+    def __enter__(self):
+        self.page.on('request', self._started)
+        self.page.on('requestfinished', self._finished)
+        self.page.on('requestfailed', self._finished)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.page.remove_listener('request', self._started)
+        self.page.remove_listener('requestfinished', self._finished)
+        self.page.remove_listener('requestfailed', self._finished)
+
+    def _started(self, request):
+        self.pending += 1
+
+    def _finished(self, request):
+        self.pending = max(0, self.pending - 1)
+
+
+def scroll_settings() -> dict:
+    """Return the effective scroll settings"""
+    return {**DEFAULT_SCROLL_SETTINGS, **getattr(settings, 'SCRAPER_SCROLL', {})}
+
+
+async def scroll_until_stable(page, url: str, time_budget: float = None) -> dict:
+    """
+    Scroll a page until lazy-loaded content stops arriving.
+
+    Each round scrolls one viewport, so every part of the page comes into view
+    and content loaded on intersection (lazy images, "load more" sentinels in
+    the middle of the page) is triggered on the way down. Scrolling stops once
+    the bottom is reached and document height and DOM node count have not
+    changed for STABLE_ROUNDS rounds with no requests pending, or when the
+    per-page time budget runs out. The number of rounds that still produced
+    content is remembered per host: hosts known to be static settle after a
+    single quiet round, while hosts known to feed content slowly get more patience.
+
+    Returns:
+        dict: rounds scrolled, rounds that grew the page and elapsed seconds
+    """
+    options = scroll_settings()
+    budget = options['TIME_BUDGET'] if time_budget is None else time_budget
+    deadline = time.monotonic() + budget
+    started = time.monotonic()
+
+    host_memory = get_host_memory()
+    remembered_rounds = await host_memory.aget(url, 'scroll_rounds')
+    stable_needed = 1 if remembered_rounds == 0 else options['STABLE_ROUNDS']
+
+    rounds = 0
+    growth_rounds = 0
+    stable_rounds = 0
+
+    with _RequestTracker(page) as tracker:
+        previous = await page.evaluate(
+            SETTLE_SCRIPT, {'quietMs': 0, 'maxWaitMs': 0}
+        )
+        while rounds < options['MAX_ROUNDS'] and time.monotonic() < deadline:
+            rounds += 1
+            await page.mouse.wheel(0, previous['viewport'] or 1000)
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            current = await page.evaluate(SETTLE_SCRIPT, {
+                'quietMs': options['QUIET_MS'],
+                'maxWaitMs': max(0, min(options['MAX_ROUND_WAIT_MS'], remaining_ms)),
+            })
+
+            grew = current['height'] != previous['height'] or current['nodes'] != previous['nodes']
+            moved = current['scrollY'] != previous['scrollY']
+            previous = current
+            if grew:
+                growth_rounds += 1
+                stable_rounds = 0
+                continue
+            if moved and not current['atBottom']:
+                # Still on the way down; the rest of the page hasn't been in view yet
+                continue
+
+            stable_rounds += 1
+            # A known infinite feed may pause between batches; keep going until its usual depth
+            patient = remembered_rounds is not None and growth_rounds < remembered_rounds
+            if stable_rounds >= stable_needed and tracker.pending == 0 and not patient:
+                break
+            if stable_rounds >= stable_needed + 2:
+                break
+
+        # Give outstanding requests a bounded chance to finish inside the remaining budget
+        remaining = deadline - time.monotonic()
+        if tracker.pending and remaining > 0:
+            try:
+                with stage('networkidle'):
+                    await page.wait_for_load_state('networkidle', timeout=int(remaining * 1000))
+            except Exception:
+                pass
+
+    # Remember a smoothed depth so one unusual visit doesn't reset what we learned
+    if remembered_rounds is None:
+        learned_rounds = growth_rounds
+    else:
+        learned_rounds = round((remembered_rounds + growth_rounds) / 2)
+    await host_memory.aupdate(url, scroll_rounds=learned_rounds)
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Scrolled {rounds} rounds ({growth_rounds} loaded content) in {elapsed:.2f}s")
+    return {'rounds': rounds, 'growth_rounds': growth_rounds, 'elapsed': elapsed}
@@ -0,0 +1,230 @@
+# scraper_app/snapshot_cache.py
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_SETTINGS = {
+    'ENABLED': True,
+    'TTL': 15 * 60,                     # Seconds a snapshot is served without revalidation
+    'MAX_AGE': 24 * 3600,               # Seconds after which a snapshot is never revalidated
+    'MAX_BYTES': 256 * 1024 * 1024,     # Size cap of the snapshot directory
+    'REVALIDATE_TIMEOUT': 5,
+}
+
+# Query parameters that never change page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so trivially different spellings share a snapshot"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f'{host}:{port}'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+class SnapshotCache:
+    """
+    Gzip-compressed snapshots of the cleaned text of rendered pages.
+
+    Snapshots are keyed by normalized URL, page index and scroll settings. Within
+    TTL they are served as is; afterwards (up to MAX_AGE) they are revalidated
+    with a conditional GET when the origin sent an ETag or Last-Modified header.
+    The directory is trimmed to MAX_BYTES by least recent use.
+    """
+    def __init__(self, directory: str, **options):
+        self.directory = directory
+        self.options = {**DEFAULT_SNAPSHOT_SETTINGS, **options}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.options['ENABLED']
+
+    def key(self, url: str, page_index: int, scroll_settings: dict) -> str:
+        payload = json.dumps([normalize_url(url), page_index, scroll_settings], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def aload(self, url: str, page_count: int, scroll_settings: dict) -> Optional[List[dict]]:
+        """
+        Return cached snapshots for pages 1..page_count (fewer if pagination ended earlier).
+
+        Files are read and written in a thread; snapshots past their TTL are
+        revalidated with the origin concurrently on an async HTTP client.
+
+        Returns:
+            list: snapshot dicts with 'content', or None unless every page is usable
+        """
+        if not self.enabled:
+            return None
+        entries = await asyncio.to_thread(self._read_pages, url, page_count, scroll_settings)
+        if entries is None or not all(self._revalidatable(snapshot) for _, snapshot in entries):
+            self._count('misses')
+            return None
+
+        stale = [(path, snapshot) for path, snapshot in entries if not self._fresh(snapshot)]
+        if stale:
+            async with self._http_client() as client:
+                unchanged = await asyncio.gather(*(self._revalidate(client, snapshot) for _, snapshot in stale))
+            if not all(unchanged):
+                self._count('misses')
+                return None
+
+        await asyncio.to_thread(self._mark_used, entries, {path for path, _ in stale})
+        self._count('hits')
+        return [snapshot for _, snapshot in entries]
+
+    def store_page(self, url: str, page: dict, scroll_settings: dict):
+        """Store the snapshot of one rendered page as soon as it is available"""
+        if not self.enabled:
+            return
+        snapshot = {**page, 'url': normalize_url(url), 'stored_at': time.time()}
+        path = self._path(self.key(url, page['page_index'], scroll_settings))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write(path, snapshot)
+        self._count('stores')
+
+    async def astore_page(self, *args):
+        await asyncio.to_thread(self.store_page, *args)
+
+    async def aevict(self):
+        await asyncio.to_thread(self.evict)
+
+    def evict(self):
+        """Delete least recently used snapshots until the directory fits MAX_BYTES"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.options['MAX_BYTES']:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            self._count('evictions', evicted)
+            logger.info(f"Evicted {evicted} page snapshots")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+    def _read_pages(self, url: str, page_count: int, scroll_settings: dict) -> Optional[List[tuple]]:
+        """Read (path, snapshot) of every requested page up to the last one, or None if one is missing"""
+        entries = []
+        for page_index in range(1, page_count + 1):
+            path = self._path(self.key(url, page_index, scroll_settings))
+            snapshot = self._read(path)
+            if snapshot is None:
+                return None
+            entries.append((path, snapshot))
+            if snapshot.get('is_last'):
+                break
+        return entries
+
+    def _fresh(self, snapshot: dict) -> bool:
+        return time.time() - snapshot.get('stored_at', 0) <= self.options['TTL']
+
+    def _revalidatable(self, snapshot: dict) -> bool:
+        if self._fresh(snapshot):
+            return True
+        age = time.time() - snapshot.get('stored_at', 0)
+        return age <= self.options['MAX_AGE'] and bool(snapshot.get('etag') or snapshot.get('last_modified'))
+
+    def _mark_used(self, entries: List[tuple], revalidated: set):
+        """Touch served snapshots for LRU eviction and restart the TTL of revalidated ones"""
+        for path, snapshot in entries:
+            if path not in revalidated:
+                os.utime(path)
+                continue
+            snapshot['stored_at'] = time.time()
+            self._write(path, snapshot)
+            self._count('revalidated')
+
+    def _http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=self.options['REVALIDATE_TIMEOUT'], follow_redirects=True)
+
+    async def _revalidate(self, client: httpx.AsyncClient, snapshot: dict) -> bool:
+        """Ask the origin whether the page changed since the snapshot was taken"""
+        headers = {}
+        if snapshot.get('etag'):
+            headers['If-None-Match'] = snapshot['etag']
+        if snapshot.get('last_modified'):
+            headers['If-Modified-Since'] = snapshot['last_modified']
+        try:
+            # Only the status matters; the body of a changed page is never read
+            async with client.stream('GET', snapshot.get('final_url') or snapshot['url'], headers=headers) as response:
+                return response.status_code == 304
+        except httpx.HTTPError as e:
+            logger.info(f"Snapshot revalidation failed: {e}")
+            return False
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring corrupt page snapshot {path}: {e}")
+            return None
+
+    def _write(self, path: str, snapshot: dict):
+        # Readers in other threads and processes see the old snapshot or the new one, never a partial file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json.gz')
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+
+_snapshot_cache = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """Return the process-wide snapshot cache configured from settings.SNAPSHOT_CACHE"""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        _snapshot_cache = SnapshotCache(
+            os.path.join(settings.SCRAPER_STATE_DIR, 'snapshots'), **getattr(settings, 'SNAPSHOT_CACHE', {})
+        )
+    return _snapshot_cache
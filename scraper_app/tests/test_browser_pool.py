@@ -0,0 +1,33 @@
+# scraper_app/tests/test_browser_pool.py
+from django.test import SimpleTestCase
+
+from ..browser_pool import BrowserPool, PooledBrowser
+
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event, *args):
+        for handler in self.handlers.get(event, []):
+            handler(*args)
+
+
+class BrowserPoolTests(SimpleTestCase):
+    def test_browser_retires_after_serving_its_pages(self):
+        pool = BrowserPool(MAX_PAGES_PER_BROWSER=3)
+        entry = PooledBrowser(browser=None)
+        page = FakePage()
+        pool._watch_page(entry, page)
+
+        # One tab paginating through several documents; subframes don't count
+        page.emit('framenavigated', page.main_frame)
+        page.emit('framenavigated', object())
+        page.emit('framenavigated', page.main_frame)
+        self.assertEqual((entry.pages_served, entry.retiring), (2, False))
+        page.emit('framenavigated', page.main_frame)
+        self.assertEqual((entry.pages_served, entry.retiring), (3, True))
@@ -0,0 +1,73 @@
+# scraper_app/tests/test_chunking.py
+from django.test import SimpleTestCase, override_settings
+
+from ..chunking import Chunk, ListingMerger, chunk_content, chunk_token_budget
+from ..llm import estimate_tokens
+
+
+@override_settings(CHUNKING={'MAX_CHUNK_TOKENS': 300, 'OVERLAP_TOKENS': 60})
+class ChunkingTests(SimpleTestCase):
+    def listing_page(self, count: int) -> str:
+        return '\n\n'.join(
+            f'## Item {index}\n\nA sturdy item number {index} with plenty of description text. Price: ${index}.99'
+            for index in range(count)
+        )
+
+    def test_short_page_is_one_chunk(self):
+        self.assertEqual(chunk_content('## Item\n\nPrice: $5'), [Chunk('## Item\n\nPrice: $5', '')])
+
+    def test_chunks_fit_the_budget_without_cutting_sections(self):
+        budget = chunk_token_budget()
+        content = self.listing_page(60)
+        chunks = chunk_content(content)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk.text), budget)
+        sections = content.split('\n\n## ')
+        for index, section in enumerate(sections):
+            section = section if index == 0 else '## ' + section
+            self.assertTrue(any(section in chunk.text for chunk in chunks), section)
+
+    def test_chunks_repeat_the_previous_tail(self):
+        chunks = chunk_content(self.listing_page(60))
+        self.assertEqual(chunks[0].overlap, '')
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertTrue(chunk.overlap)
+            self.assertTrue(chunk.text.startswith(chunk.overlap))
+            self.assertTrue(previous.text.endswith(chunk.overlap))
+
+    def test_oversized_line_is_split_at_spaces(self):
+        words = [f'word{index}' for index in range(2000)]
+        chunks = chunk_content(' '.join(words))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk.text), chunk_token_budget())
+        self.assertEqual(' '.join(chunk.text[len(chunk.overlap):].strip() for chunk in chunks).split(), words)
+
+
+class ListingMergerTests(SimpleTestCase):
+    def test_listing_repeated_from_the_overlap_is_dropped(self):
+        merger = ListingMerger()
+        widget = {'name': 'Widget', 'price': '$10'}
+        self.assertEqual(merger.add(Chunk('Widget $10'), [widget]), [widget])
+        rows = merger.add(Chunk('Widget $10\n\nGadget $20', overlap='Widget $10'),
+                          [dict(widget), {'name': 'Gadget', 'price': '$20'}])
+        self.assertEqual(rows, [{'name': 'Gadget', 'price': '$20'}])
+
+    def test_identical_listing_outside_the_overlap_is_kept(self):
+        merger = ListingMerger()
+        widget = {'name': 'Widget', 'price': '$10'}
+        merger.add(Chunk('Widget $10'), [widget])
+        self.assertEqual(merger.add(Chunk('Other\n\nWidget $10', overlap='Other'), [dict(widget)]), [widget])
+
+    def test_only_the_previous_chunk_counts(self):
+        merger = ListingMerger()
+        widget = {'name': 'Widget', 'price': '$10'}
+        merger.add(Chunk('Widget $10'), [widget])
+        merger.add(Chunk('Gadget $20', overlap='Gadget'), [{'name': 'Gadget', 'price': '$20'}])
+        self.assertEqual(merger.add(Chunk('Widget $10', overlap='Widget $10'), [dict(widget)]), [widget])
+
+    def test_malformed_results_are_ignored(self):
+        merger = ListingMerger()
+        self.assertEqual(merger.add(Chunk('text'), {'listings': []}), [])
+        self.assertEqual(merger.add(Chunk('text'), ['a', {'name': 'b'}]), [{'name': 'b'}])
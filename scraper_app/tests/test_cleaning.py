@@ -0,0 +1,21 @@
+# scraper_app/tests/test_cleaning.py
+from django.test import SimpleTestCase
+
+from ..cleaning import normalize_text
+
+
+class NormalizeTextTests(SimpleTestCase):
+    def test_whitespace_is_collapsed_but_blocks_are_kept(self):
+        self.assertEqual(normalize_text('a   b\t c'), 'a b c')
+        self.assertEqual(normalize_text('a \n b'), 'a\nb')
+        self.assertEqual(normalize_text('a\n\n\n\nb'), 'a\n\nb')
+        self.assertEqual(normalize_text('x\n \n\n y'), 'x\n\ny')
+        self.assertEqual(normalize_text('  lead\n'), 'lead')
+
+    def test_urls_are_removed(self):
+        self.assertEqual(normalize_text('see https://example.com/a?b=1 here'), 'see here')
+
+    def test_normalized_text_is_unchanged(self):
+        text = 'Title\n\n- one  item https://example.com\n\t- two\n\n\n\nEnd '
+        self.assertEqual(normalize_text(normalize_text(text)), normalize_text(text))
+        self.assertEqual(normalize_text('a b\nc\n\nd'), 'a b\nc\n\nd')
@@ -0,0 +1,90 @@
+# scraper_app/tests/test_exports.py
+import csv
+import gzip
+import io
+import json
+import unittest
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..exports import iter_export, pa, row_columns
+from ..results import save_result
+
+ROWS = [{'name': 'Oak chair', 'price': 120.0}, {'name': 'Pine table', 'price': None, 'currency': 'EUR'},
+        {'name': 'Birch shelf', 'price': 'call us', 'in_stock': True}]
+
+
+def export(export_format: str, rows=ROWS, **kwargs):
+    return list(iter_export(export_format, rows, **kwargs))
+
+
+@override_settings(EXPORTS={'BATCH_ROWS': 2})
+class ExportFormatTests(SimpleTestCase):
+    def test_columns_of_every_row_are_kept(self):
+        self.assertEqual(row_columns(ROWS), {'name': 'string', 'price': 'string', 'currency': 'string',
+                                             'in_stock': 'bool'})
+        self.assertEqual(row_columns([{'price': None}, {'price': 3}]), {'price': 'number'})
+
+    def test_csv_is_written_batch_by_batch(self):
+        parts = export('csv')
+        self.assertEqual(len(parts), 2)
+        rows = list(csv.DictReader(io.StringIO(''.join(parts))))
+        self.assertEqual(rows[1], {'name': 'Pine table', 'price': '', 'currency': 'EUR', 'in_stock': ''})
+        self.assertEqual(export('csv', []), [])
+
+    def test_json_and_ndjson(self):
+        parts = export('json')
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(json.loads(''.join(parts)), ROWS)
+        self.assertEqual(''.join(export('json', [])), '[]')
+        lines = ''.join(export('ndjson')).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], ROWS)
+
+    def test_unknown_format_raises(self):
+        with self.assertRaises(ValueError):
+            export('xlsx')
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_columnar_formats_round_trip(self):
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(b''.join(export('parquet'))))
+        self.assertEqual(table.column_names, ['name', 'price', 'currency', 'in_stock'])
+        self.assertEqual(table.column('price').to_pylist(), ['120.0', None, 'call us'])
+        reader = pa.ipc.open_stream(b''.join(export('arrow')))
+        self.assertEqual(reader.read_all().num_rows, 3)
+
+    @unittest.skipIf(pa is not None, 'pyarrow is installed')
+    def test_columnar_formats_need_pyarrow(self):
+        with self.assertRaisesMessage(ValueError, 'requires pyarrow'):
+            export('parquet')
+
+
+class ExportResponseTests(TestCase):
+    def setUp(self):
+        self.result = save_result('https://example.com', ROWS)
+
+    def download(self, export_format: str, **headers):
+        response = self.client.get(reverse('download_result', args=[self.result.pk, export_format]), **headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_text_exports_are_gzipped_when_accepted(self):
+        response, body = self.download('ndjson', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 3)
+
+        response, body = self.download('csv')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="scraping_results.csv"')
+        self.assertTrue(body.startswith(b'name,price'))
+
+    @override_settings(EXPORTS={'GZIP': False})
+    def test_gzip_can_be_turned_off(self):
+        response, body = self.download('json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(body)), 3)
+
+    def test_unknown_format_is_not_found(self):
+        response, _ = self.download('xlsx')
+        self.assertEqual(response.status_code, 404)
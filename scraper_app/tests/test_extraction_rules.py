@@ -0,0 +1,71 @@
+# scraper_app/tests/test_extraction_rules.py
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..extraction_rules import _matches, agreement, apply_rule, learn_rule, load_rule, save_rule
+from ..host_memory import HostMemory
+
+SELECTOR = 'div.grid > div.card'
+
+
+def card(name: str, price: str, reviews: str) -> dict:
+    return {'h2': name, 'span.price': price, 'span.reviews': reviews, 'a@href': f'/items/{name.lower()}'}
+
+
+RECORDS = [card('Oak chair', '$120.00', '12 reviews'), card('Pine table', '$80.00', '3 reviews'),
+           card('Birch shelf', '$45.50', '1 review')]
+
+
+class ExtractionRuleTests(SimpleTestCase):
+    def test_learned_rule_reproduces_the_listings(self):
+        listings = [{'name': 'Oak chair', 'price': '120.00'}, {'name': 'Pine table', 'price': '$80.00'},
+                    {'name': 'Birch shelf', 'price': '45.50'}]
+        rule = learn_rule(SELECTOR, RECORDS, listings)
+        self.assertEqual(rule, {'container': SELECTOR, 'fields': {'name': 'h2', 'price': 'span.price'}})
+        self.assertEqual(apply_rule(rule, RECORDS)[0], {'name': 'Oak chair', 'price': '$120.00'})
+        self.assertEqual(agreement(apply_rule(rule, RECORDS), listings), 1.0)
+
+    def test_too_few_listings_teach_nothing(self):
+        self.assertIsNone(learn_rule(SELECTOR, RECORDS, [{'name': 'Oak chair'}, {'name': 'Pine table'}]))
+
+    def test_short_values_must_match_a_whole_element(self):
+        self.assertTrue(_matches('120.00', '$120.00'))
+        self.assertTrue(_matches('oak chair', 'oak chair - solid wood'))
+        self.assertTrue(_matches('1', '1'))
+        self.assertFalse(_matches('1', '12 reviews'))
+        self.assertFalse(_matches('$', '$120.00'))
+        self.assertFalse(_matches('new', 'new arrivals'))
+        self.assertFalse(_matches('chair', 'armchairs'))
+
+    def test_values_found_nowhere_teach_nothing(self):
+        # Stars the LLM made up: "1" and "3" only occur inside longer texts
+        listings = [{'name': 'Oak chair', 'stars': '1'}, {'name': 'Pine table', 'stars': '3'},
+                    {'name': 'Birch shelf', 'stars': '1'}]
+        self.assertIsNone(learn_rule(SELECTOR, RECORDS, listings))
+
+    def test_agreement_needs_every_value(self):
+        rows = [{'name': 'Oak chair', 'stars': '12 reviews'}]
+        self.assertEqual(agreement(rows, [{'name': 'Oak chair', 'stars': '1'}]), 0.0)
+        self.assertEqual(agreement(rows, [{'name': 'oak  CHAIR', 'stars': '12 reviews'}]), 1.0)
+
+    def test_agreement_is_penalized_for_extra_rows(self):
+        rows = apply_rule({'container': SELECTOR, 'fields': {'name': 'h2'}}, RECORDS)
+        self.assertAlmostEqual(agreement(rows, [{'name': 'Oak chair'}]), 1 / 3)
+        self.assertEqual(agreement([], []), 1.0)
+
+    def test_rules_are_remembered_per_host_and_field_set(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        memory = HostMemory(os.path.join(directory, 'host_memory.json'))
+        rule = {'container': SELECTOR, 'fields': {'name': 'h2'}, 'pages': 3}
+        with mock.patch('scraper_app.extraction_rules.get_host_memory', return_value=memory):
+            save_rule('https://www.shop.example/chairs', ['Name', 'price'], rule)
+            self.assertEqual(load_rule('https://shop.example/tables', ['price', 'name']), rule)
+            self.assertIsNone(load_rule('https://shop.example/tables', ['name']))
+            save_rule('https://shop.example/', ['name', 'price'], None)
+            self.assertIsNone(load_rule('https://shop.example/', ['name', 'price']))
+        self.assertEqual(HostMemory(memory.path).get('shop.example', 'extraction_rules'), {})
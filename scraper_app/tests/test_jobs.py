@@ -0,0 +1,196 @@
+# scraper_app/tests/test_jobs.py
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..jobs import (
+    busy_hosts, cancel_job, claim_job, complete_job, fail_abandoned_jobs, finish_job, release_job, renew_lease,
+    submit_batch, submit_job, try_claim,
+)
+from ..models import ScrapeBatch, ScrapeJob
+
+
+@override_settings(SCRAPE_JOBS={'HOST_DELAY': 0, 'MAX_ATTEMPTS': 2})
+class JobQueueTests(TestCase):
+    def submit(self, url: str = 'https://example.com/a', api_key: str = 'caller-key') -> ScrapeJob:
+        return submit_job(url, ['name'], 1, api_key)
+
+    def expire_lease(self, job: ScrapeJob):
+        ScrapeJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_takes_the_caller_key_out_of_the_database(self):
+        job = self.submit()
+        self.assertEqual(ScrapeJob.objects.get(pk=job.pk).api_key, 'caller-key')
+        claimed = claim_job('worker-a')
+        self.assertEqual((claimed.pk, claimed.api_key, claimed.attempts), (job.pk, 'caller-key', 1))
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual((stored.status, stored.worker, stored.api_key), (ScrapeJob.RUNNING, 'worker-a', ''))
+
+    def test_server_key_is_never_stored(self):
+        job = self.submit(api_key='')
+        self.assertTrue(job.server_key)
+        self.assertEqual(ScrapeJob.objects.get(pk=job.pk).api_key, '')
+
+    def test_only_one_of_two_racing_workers_wins(self):
+        job = self.submit()
+        # Both workers read the job as queued before either claims it
+        seen = ScrapeJob.objects.values_list('pk', 'status', 'lease_expires_at', 'api_key').get(pk=job.pk)
+        first = try_claim('worker-a', *seen)
+        second = try_claim('worker-b', *seen)
+        self.assertEqual(first.worker, 'worker-a')
+        self.assertIsNone(second)
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual((stored.worker, stored.attempts), ('worker-a', 1))
+        self.assertIsNone(claim_job('worker-b'))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self.submit(api_key='')
+        claim_job('worker-a')
+        self.assertIsNone(claim_job('worker-b'))
+
+        self.expire_lease(job)
+        reclaimed = claim_job('worker-b')
+        self.assertEqual((reclaimed.pk, reclaimed.worker, reclaimed.attempts), (job.pk, 'worker-b', 2))
+        # The first worker finds out at its next heartbeat and can't record an outcome
+        self.assertFalse(renew_lease(job.pk, 'worker-a'))
+        self.assertFalse(finish_job(job.pk, 'worker-a', ScrapeJob.SUCCEEDED))
+        self.assertTrue(renew_lease(job.pk, 'worker-b', pages_done=1))
+
+    def test_job_abandoned_too_often_is_failed(self):
+        job = self.submit(api_key='')
+        for worker in ('worker-a', 'worker-b'):
+            self.assertEqual(claim_job(worker).pk, job.pk)
+            self.expire_lease(job)
+        self.assertIsNone(claim_job('worker-c'))
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual(stored.status, ScrapeJob.FAILED)
+        self.assertIn('abandoned', stored.error)
+        self.assertIsNone(stored.lease_expires_at)
+
+    def test_abandoned_job_with_a_caller_key_is_failed(self):
+        job = self.submit()
+        claim_job('worker-a')
+        self.expire_lease(job)
+        self.assertEqual(fail_abandoned_jobs(), 1)
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual(stored.status, ScrapeJob.FAILED)
+        self.assertIn('submit it again', stored.error)
+
+    def test_released_job_gets_its_key_back(self):
+        job = self.submit()
+        claimed = claim_job('worker-a')
+        self.assertTrue(release_job(job.pk, 'worker-a', 'boom', claimed.api_key))
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual((stored.status, stored.worker, stored.api_key), (ScrapeJob.QUEUED, '', 'caller-key'))
+        self.assertEqual(claim_job('worker-b').api_key, 'caller-key')
+
+    def test_release_after_the_last_attempt_fails_the_job(self):
+        job = self.submit(api_key='')
+        claim_job('worker-a')
+        release_job(job.pk, 'worker-a', 'boom')
+        claim_job('worker-a')
+        self.assertTrue(release_job(job.pk, 'worker-a', 'boom again'))
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual((stored.status, stored.error), (ScrapeJob.FAILED, 'boom again'))
+
+    def test_completed_job_stores_its_rows(self):
+        job = self.submit()
+        claimed = claim_job('worker-a')
+        self.assertTrue(complete_job(claimed, 'worker-a', [{'name': 'a', 'price': '$5'}], pages_done=1, row_count=1))
+        stored = ScrapeJob.objects.get(pk=job.pk)
+        self.assertEqual(stored.status, ScrapeJob.SUCCEEDED)
+        self.assertEqual(list(stored.results.get().rows.values_list('data', flat=True)),
+                         [{'name': 'a', 'Price ($)': 5.0}])
+
+    def test_cancelled_job_stops_its_worker(self):
+        job = self.submit()
+        claim_job('worker-a')
+        self.assertTrue(cancel_job(job.pk))
+        self.assertFalse(renew_lease(job.pk, 'worker-a'))
+        self.assertFalse(cancel_job(job.pk))
+        self.assertEqual(ScrapeJob.objects.get(pk=job.pk).status, ScrapeJob.CANCELLED)
+
+
+class HostPolitenessTests(TestCase):
+    def items(self, *urls) -> list:
+        return [{'url': url, 'fields': ['name'], 'page_count': 1} for url in urls]
+
+    @override_settings(SCRAPE_JOBS={'HOST_CONCURRENCY': 1, 'HOST_DELAY': 0})
+    def test_two_jobs_on_one_host_are_not_claimed_at_once(self):
+        batch = submit_batch(self.items('https://a.example/1', 'https://a.example/2', 'https://b.example/1'), '')
+        first, second = claim_job('worker-a'), claim_job('worker-b')
+        self.assertEqual({first.host, second.host}, {'a.example', 'b.example'})
+        self.assertIsNone(claim_job('worker-c'))
+        self.assertEqual(set(busy_hosts(timezone.now())), {'a.example', 'b.example'})
+
+        on_a = first if first.host == 'a.example' else second
+        finish_job(on_a.pk, on_a.worker, ScrapeJob.SUCCEEDED)
+        third = claim_job('worker-c')
+        self.assertEqual((third.url, third.batch_id), ('https://a.example/2', batch.pk))
+
+    @override_settings(SCRAPE_JOBS={'HOST_CONCURRENCY': 2, 'HOST_DELAY': 60})
+    def test_jobs_on_one_host_start_at_least_host_delay_apart(self):
+        submit_batch(self.items('https://a.example/1', 'https://a.example/2'), '')
+        first = claim_job('worker-a')
+        self.assertIsNone(claim_job('worker-b'))
+
+        ScrapeJob.objects.filter(pk=first.pk).update(started_at=timezone.now() - timedelta(seconds=61))
+        self.assertNotEqual(claim_job('worker-b').pk, first.pk)
+
+    @override_settings(SCRAPE_JOBS={'HOST_CONCURRENCY': 1, 'HOST_DELAY': 0})
+    def test_expired_lease_frees_the_host(self):
+        submit_batch(self.items('https://a.example/1', 'https://a.example/2'), '')
+        first = claim_job('worker-a')
+        ScrapeJob.objects.filter(pk=first.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('a.example', busy_hosts(timezone.now()))
+
+
+@mock.patch('scraper_app.views.GROQ_API_KEY', 'server-key')
+class JobApiKeyTests(TestCase):
+    def post(self, name: str, data: dict):
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json')
+
+    def submit(self, **data):
+        return self.post('submit_scrape_job', {'url': 'https://example.com/a', 'fields': ['name'], **data})
+
+    def submit_batch(self, **data):
+        return self.post('submit_scrape_batch', {'items': ['https://example.com/a', 'https://example.org/b'],
+                                                 'fields': 'name,price', **data})
+
+    def test_anonymous_callers_need_their_own_key(self):
+        self.assertEqual(self.submit().status_code, 403)
+        self.assertEqual(self.submit_batch().status_code, 403)
+        self.assertFalse(ScrapeJob.objects.exists())
+
+    def test_caller_key_is_stored_until_claimed(self):
+        response = self.submit(groq_api_key='caller-key')
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn('caller-key', response.content.decode())
+        job = ScrapeJob.objects.get(pk=response.json()['id'])
+        self.assertEqual((job.api_key, job.server_key), ('caller-key', False))
+
+        response = self.submit_batch(groq_api_key='caller-key')
+        self.assertEqual(response.status_code, 202)
+        batch = ScrapeBatch.objects.get(pk=response.json()['id'])
+        self.assertEqual(list(batch.jobs.values_list('api_key', 'server_key')), [('caller-key', False)] * 2)
+
+    def test_logged_in_users_run_on_the_server_key(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(self.submit().status_code, 202)
+        self.assertEqual(self.submit_batch().status_code, 202)
+        self.assertEqual(set(ScrapeJob.objects.values_list('api_key', 'server_key')), {('', True)})
+
+    @override_settings(SCRAPE_JOBS={'SERVER_KEY_FALLBACK': True})
+    def test_server_key_fallback_for_anonymous_callers(self):
+        self.assertEqual(self.submit().status_code, 202)
+        self.assertEqual(list(ScrapeJob.objects.values_list('api_key', 'server_key')), [('', True)])
+
+    @override_settings(SCRAPE_JOBS={'SERVER_KEY_FALLBACK': True})
+    def test_no_fallback_without_a_server_key(self):
+        with mock.patch('scraper_app.views.GROQ_API_KEY', None):
+            self.assertEqual(self.submit().status_code, 403)
@@ -0,0 +1,57 @@
+# scraper_app/tests/test_listing_parser.py
+from django.test import SimpleTestCase
+
+from ..listing_parser import ListingParser
+
+
+class ListingParserTests(SimpleTestCase):
+    def feed(self, *parts) -> ListingParser:
+        parser = ListingParser()
+        for part in parts:
+            parser.feed(part)
+        return parser
+
+    def test_parses_listings_fed_one_character_at_a_time(self):
+        completion = '{"listings": [{"name": "a", "price": "$1"}, {"name": "b", "price": "$2"}]}'
+        parser = self.feed(*completion)
+        self.assertEqual(parser.finish(), [{'name': 'a', 'price': '$1'}, {'name': 'b', 'price': '$2'}])
+        self.assertTrue(parser.complete)
+
+    def test_listings_are_returned_as_soon_as_they_close(self):
+        parser = ListingParser()
+        self.assertEqual(parser.feed('{"listings": [{"name": "a"}, {"na'), [{'name': 'a'}])
+        self.assertEqual(parser.feed('me": "b"}]}'), [{'name': 'b'}])
+
+    def test_truncated_completion_keeps_complete_listings(self):
+        parser = self.feed('{"listings": [{"name": "a"}, {"name": "b"}, {"name": "c", "pri')
+        self.assertEqual(parser.finish(), [{'name': 'a'}, {'name': 'b'}])
+        self.assertFalse(parser.complete)
+
+    def test_trailing_commas_are_forgiven(self):
+        parser = self.feed('{"listings": [{"name": "a",}, {"name": "b"},]}')
+        self.assertEqual(parser.finish(), [{'name': 'a'}, {'name': 'b'}])
+
+    def test_malformed_listing_is_skipped(self):
+        parser = self.feed('{"listings": [{"name": a}, {"name": "b"}]}')
+        self.assertEqual(parser.finish(), [{'name': 'b'}])
+
+    def test_think_block_is_ignored(self):
+        parser = self.feed('<thi', 'nk>Maybe {"listings": [{"name": "draft"}]} [no]</think>\n',
+                           '{"listings": [{"name": "a"}]}')
+        self.assertEqual(parser.finish(), [{'name': 'a'}])
+
+    def test_prose_and_code_fences_around_the_json_are_ignored(self):
+        parser = self.feed('Here is the [data](x) you "asked" for:\n```json\n{"listings": [{"name": "}"}]}\n```')
+        self.assertEqual(parser.finish(), [{'name': '}'}])
+
+    def test_escape_split_across_parts(self):
+        parser = self.feed('{"listings": [{"name": "x\\', '"y"}]}')
+        self.assertEqual(parser.finish(), [{'name': 'x"y'}])
+
+    def test_bare_array_and_text_after_it(self):
+        parser = self.feed('[{"name": "a"}] and later [{"name": "b"}]')
+        self.assertEqual(parser.finish(), [{'name': 'a'}])
+
+    def test_missing_array_raises(self):
+        with self.assertRaises(ValueError):
+            self.feed('I could not find any listings.').finish()
@@ -0,0 +1,59 @@
+# scraper_app/tests/test_llm.py
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..listing_parser import ListingParser
+from ..llm import ExtractionEngine
+from ..llm_cache import ExtractionCache
+
+
+class ExtractionEngineTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('scraper_app.llm.get_extraction_cache', return_value=ExtractionCache(ENABLED=False))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = ExtractionEngine(MAX_CONCURRENCY=1, REQUESTS_PER_MINUTE=1)
+        self.release_call = None
+
+        async def complete(client, llm, messages):
+            if self.release_call is not None:
+                await self.release_call.wait()
+            parser = ListingParser()
+            parser.feed('{"listings": [{"name": "a"}]}')
+            return parser, None, 'stop'
+        self.engine._complete = complete
+
+    def extract(self, api_key: str):
+        return asyncio.ensure_future(self.engine.extract(None, api_key, 'system', 'chunk', ['name'], user=api_key))
+
+    def test_key_out_of_quota_does_not_hold_a_slot(self):
+        async def scenario():
+            self.assertEqual(await self.extract('key-a'), [{'name': 'a'}])
+            # key-a has used its one request this minute and waits for the next
+            waiting = self.extract('key-a')
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.engine.scheduler.active, 0)
+            self.assertEqual(await asyncio.wait_for(self.extract('key-b'), 1.0), [{'name': 'a'}])
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+        asyncio.run(scenario())
+
+    def test_reservation_is_returned_when_cancelled_waiting_for_a_slot(self):
+        async def scenario():
+            self.release_call = asyncio.Event()
+            running = self.extract('key-a')
+            await asyncio.sleep(0.05)
+            waiting = self.extract('key-b')
+            await asyncio.sleep(0.05)
+            limiter = self.engine.limiter('key-b')
+            self.assertLess(limiter.requests.tokens, 1)
+
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            self.assertGreaterEqual(limiter.requests.tokens, 1)
+            self.assertAlmostEqual(limiter.tokens.tokens, limiter.tokens.capacity, delta=1)
+            self.release_call.set()
+            await running
+        asyncio.run(scenario())
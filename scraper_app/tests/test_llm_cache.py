@@ -0,0 +1,69 @@
+# scraper_app/tests/test_llm_cache.py
+from django.test import TestCase
+
+from ..llm_cache import ExtractionCache
+from ..prices import parse_price_fields
+
+
+class ExtractionCacheTests(TestCase):
+    fields = ['name', 'price']
+
+    def store(self, cache: ExtractionCache, listings: list, model: str = 'model-a'):
+        cache.set('system', self.fields, 'chunk', model, listings)
+
+    def lookup(self, cache: ExtractionCache, models=('model-a',)):
+        return cache.get('system', self.fields, 'chunk', list(models))
+
+    def test_memory_tier(self):
+        cache = ExtractionCache()
+        self.store(cache, [{'name': 'a', 'price': '$5'}])
+        self.assertEqual(self.lookup(cache), [{'name': 'a', 'price': '$5'}])
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+
+    def test_database_tier_serves_other_processes(self):
+        self.store(ExtractionCache(), [{'name': 'a', 'price': '$5'}])
+        cache = ExtractionCache()
+        self.assertEqual(self.lookup(cache), [{'name': 'a', 'price': '$5'}])
+        self.assertEqual(self.lookup(cache), [{'name': 'a', 'price': '$5'}])
+        self.assertEqual((cache.stats()['db_hits'], cache.stats()['memory_hits']), (1, 1))
+
+    def test_hits_are_independent_copies(self):
+        cache = ExtractionCache()
+        self.store(cache, [{'name': 'a', 'price': '$5'}])
+        for _ in range(2):
+            listings = self.lookup(cache)
+            parse_price_fields({'rows': listings})
+            listings[0]['name'] = 'changed'
+        self.assertEqual(self.lookup(cache), [{'name': 'a', 'price': '$5'}])
+        self.assertEqual(self.lookup(ExtractionCache()), [{'name': 'a', 'price': '$5'}])
+
+    def test_stored_listings_are_copied(self):
+        cache = ExtractionCache()
+        listings = [{'name': 'a', 'price': '$5'}]
+        self.store(cache, listings)
+        listings[0]['price'] = '$6'
+        self.assertEqual(self.lookup(cache), [{'name': 'a', 'price': '$5'}])
+
+    def test_any_listed_model_matches(self):
+        cache = ExtractionCache()
+        self.store(cache, [{'name': 'a'}], model='model-b')
+        self.assertIsNone(self.lookup(cache))
+        self.assertEqual(self.lookup(cache, ('model-a', 'model-b')), [{'name': 'a'}])
+
+    def test_expired_entries_miss(self):
+        cache = ExtractionCache(TTL=-1)
+        self.store(cache, [{'name': 'a'}])
+        self.assertIsNone(self.lookup(cache))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_memory_tier_is_bounded(self):
+        cache = ExtractionCache(MEMORY_ENTRIES=2)
+        for index in range(3):
+            cache.set('system', self.fields, f'chunk {index}', 'model-a', [{'name': str(index)}])
+        self.assertEqual(cache.stats()['memory_entries'], 2)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = ExtractionCache(ENABLED=False)
+        self.store(cache, [{'name': 'a'}])
+        self.assertIsNone(self.lookup(cache))
+        self.assertIsNone(self.lookup(ExtractionCache()))
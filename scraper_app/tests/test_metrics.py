@@ -0,0 +1,58 @@
+# scraper_app/tests/test_metrics.py
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import Metrics, Timings, stage, use_timings
+
+
+class MetricsTests(SimpleTestCase):
+    def test_render_counters_histograms_and_gauges(self):
+        metrics = Metrics()
+        metrics.inc('unscraper_llm_calls_total', model='m', outcome='ok')
+        metrics.inc('unscraper_llm_calls_total', 2, model='m', outcome='ok')
+        metrics.observe('unscraper_stage_seconds', 0.2, stage='render')
+        text = metrics.render({'unscraper_browser_contexts': {(): 3}})
+        self.assertIn('# TYPE unscraper_llm_calls_total counter', text)
+        self.assertIn('unscraper_llm_calls_total{model="m",outcome="ok"} 3', text)
+        self.assertIn('unscraper_stage_seconds_bucket{stage="render",le="0.1"} 0', text)
+        self.assertIn('unscraper_stage_seconds_bucket{stage="render",le="0.25"} 1', text)
+        self.assertIn('unscraper_stage_seconds_bucket{stage="render",le="+Inf"} 1', text)
+        self.assertIn('unscraper_stage_seconds_count{stage="render"} 1', text)
+        self.assertIn('unscraper_browser_contexts 3', text)
+
+    def test_stages_add_up_in_the_scrape_timings(self):
+        timings = Timings()
+        use_timings(timings)
+        self.addCleanup(use_timings, None)
+        for _ in range(2):
+            with stage('clean'):
+                pass
+        self.assertEqual(timings.as_dict()['stages']['clean']['count'], 2)
+        self.assertRegex(timings.server_timing(), r'^clean;dur=[\d.]+, total;dur=[\d.]+$')
+
+
+class MetricsEndpointTests(TestCase):
+    def get(self, **headers):
+        return self.client.get(reverse('metrics'), **headers)
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_token_holders_may_read_metrics(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.get(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE unscraper_browsers gauge', response.content.decode())
+
+    @override_settings(METRICS={'TOKEN': ''})
+    def test_empty_token_only_lets_staff_in(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer ').status_code, 401)
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(self.get().status_code, 401)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(METRICS={'ENABLED': False, 'TOKEN': 'secret'})
+    def test_disabled_metrics_are_not_found(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer secret').status_code, 404)
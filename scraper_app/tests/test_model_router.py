@@ -0,0 +1,101 @@
+# scraper_app/tests/test_model_router.py
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..model_router import CLOSED, HALF_OPEN, OPEN, ModelRouter
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('scraper_app.model_router.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def router(self, models=('a', 'b'), **options) -> ModelRouter:
+        return ModelRouter(list(models), **{'COOLDOWN': 30.0, 'FAILURE_THRESHOLD': 3, **options})
+
+    def test_configured_order_without_telemetry(self):
+        self.assertEqual(self.router().choose('key'), ('a', 0.0))
+
+    def test_faster_model_wins(self):
+        router = self.router()
+        for _ in range(3):
+            router.record_success('a', 2.0)
+            router.record_success('b', 0.5)
+        self.assertEqual(router.choose('key')[0], 'b')
+
+    def test_context_window_is_respected(self):
+        router = ModelRouter(['a', 'b'], {'a': 8192, 'b': 128000})
+        self.assertEqual(router.choose('key', tokens=20000)[0], 'b')
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        router = self.router()
+        for _ in range(3):
+            router.record_failure('a', 1.0)
+        self.assertEqual(router.snapshot()['a']['state'], OPEN)
+        self.assertEqual(router.choose('key'), ('b', 0.0))
+
+    def test_breaker_probes_after_cooldown_and_closes_on_success(self):
+        router = self.router(models=('a',))
+        for _ in range(3):
+            router.record_failure('a', 1.0)
+        self.assertEqual(router.choose('key'), ('a', 30.0))
+        self.assertFalse(router.begin_call('a'))
+
+        # The first call after the cooldown is the probe; others wait for its outcome
+        self.now += 30.0
+        self.assertEqual(router.choose('key'), ('a', 0.0))
+        self.assertTrue(router.begin_call('a'))
+        self.assertEqual(router.snapshot()['a']['state'], HALF_OPEN)
+        self.assertFalse(router.begin_call('a'))
+        self.assertEqual(router.choose('key'), ('a', 30.0))
+
+        router.record_success('a', 1.0)
+        self.assertEqual(router.snapshot()['a']['state'], CLOSED)
+        self.assertEqual(router.choose('key'), ('a', 0.0))
+        self.assertTrue(router.begin_call('a'))
+
+    def test_caller_that_gives_up_does_not_block_the_probe(self):
+        router = self.router(models=('a',))
+        for _ in range(3):
+            router.record_failure('a', 1.0)
+        # Too long to wait for this caller, which never calls the model
+        self.assertEqual(router.choose('key'), ('a', 30.0))
+        self.now += 30.0
+        self.assertEqual(router.choose('key'), ('a', 0.0))
+        self.assertTrue(router.begin_call('a'))
+
+    def test_probe_that_never_reports_back_expires(self):
+        router = self.router(models=('a',))
+        for _ in range(3):
+            router.record_failure('a', 1.0)
+        self.now += 30.0
+        self.assertTrue(router.begin_call('a'))
+        self.now += 30.0
+        self.assertTrue(router.begin_call('a'))
+
+    def test_failed_probe_reopens_for_twice_as_long(self):
+        router = self.router(models=('a',))
+        for _ in range(3):
+            router.record_failure('a', 1.0)
+        self.now += 30.0
+        router.begin_call('a')
+        router.record_failure('a', 1.0)
+        snapshot = router.snapshot()['a']
+        self.assertEqual(snapshot['state'], OPEN)
+        self.assertEqual(snapshot['open_for'], 60.0)
+
+    def test_rate_limit_parks_a_model_for_one_key(self):
+        router = self.router(JITTER=0.0)
+        self.assertEqual(router.record_rate_limit('key', 'a', retry_after=10.0), 10.0)
+        self.assertEqual(router.choose('key'), ('b', 0.0))
+        self.assertEqual(router.choose('other key'), ('a', 0.0))
+        self.assertEqual(router.snapshot()['a']['state'], CLOSED)
+
+    def test_waits_for_the_model_that_frees_up_first(self):
+        router = self.router(JITTER=0.0)
+        router.record_rate_limit('key', 'a', retry_after=20.0)
+        router.record_rate_limit('key', 'b', retry_after=5.0)
+        self.assertEqual(router.choose('key'), ('b', 5.0))
@@ -0,0 +1,126 @@
+# scraper_app/tests/test_powerbi.py
+import json
+from unittest import mock
+
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from ..powerbi import DashboardCache, Pwbi, _concat_chunks, downcast_frame, stratified_sample
+
+
+def upload(name: str, content: str) -> SimpleUploadedFile:
+    return SimpleUploadedFile(name, content.encode('utf-8'))
+
+
+def csv_rows(count: int) -> str:
+    colours = ['red', 'green', 'blue']
+    return 'id,colour,price\n' + ''.join(f'{index},{colours[index % 3]},{index * 1.5}\n' for index in range(count))
+
+
+@override_settings(VISUALIZATION={'CHUNK_ROWS': 10})
+class ChunkedReadTests(SimpleTestCase):
+    def test_csv_is_read_and_downcast_in_chunks(self):
+        pwbi = Pwbi()
+        df = pwbi.process_file(upload('data.csv', csv_rows(35)))
+        self.assertEqual((len(df), pwbi.total_rows, pwbi.sample_rate), (35, 35, 1.0))
+        self.assertEqual(df['id'].tolist(), list(range(35)))
+        self.assertIsInstance(df['colour'].dtype, pd.CategoricalDtype)
+        self.assertEqual(set(df['colour'].cat.categories), {'red', 'green', 'blue'})
+        self.assertEqual(str(df['id'].dtype), 'int8')
+        self.assertEqual(str(df['price'].dtype), 'float32')
+
+    def test_json_array_and_json_lines(self):
+        rows = [{'name': f'item {index}', 'kind': 'chair'} for index in range(25)]
+        df = Pwbi().process_file(upload('data.json', json.dumps(rows)))
+        self.assertEqual(len(df), 25)
+        df = Pwbi().process_file(upload('data.json', ''.join(json.dumps(row) + '\n' for row in rows)))
+        self.assertEqual(df['name'].tolist(), [row['name'] for row in rows])
+        with self.assertRaisesMessage(ValueError, 'Invalid JSON'):
+            Pwbi().process_file(upload('data.json', '[{"name": '))
+
+    @override_settings(VISUALIZATION={'CHUNK_ROWS': 100, 'MEMORY_LIMIT_MB': 8 / 1024})
+    def test_data_over_the_memory_limit_is_sampled(self):
+        pwbi = Pwbi()
+        df = pwbi.process_file(upload('data.csv', csv_rows(2000)))
+        self.assertEqual(pwbi.total_rows, 2000)
+        self.assertLess(pwbi.sample_rate, 1.0)
+        self.assertLess(len(df), 2000)
+        # A uniform sample: rows from the whole file, in file order
+        self.assertGreater(df['id'].max(), 1500)
+        self.assertTrue(df['id'].is_monotonic_increasing)
+
+    def test_unsupported_format_raises(self):
+        with self.assertRaisesMessage(ValueError, 'Unsupported file format'):
+            Pwbi().process_file(upload('data.txt', 'hello'))
+
+    def test_chunks_with_different_category_types_are_concatenated(self):
+        numbers = downcast_frame(pd.DataFrame({'code': [1, 1, 2, 2]}).astype('category'), 0.5)
+        text = downcast_frame(pd.DataFrame({'code': ['a', 'a', 'b', 'b']}), 0.5)
+        df = _concat_chunks([numbers, text, pd.DataFrame({'other': [1]})])
+        self.assertEqual(df['code'].tolist(), [1, 1, 2, 2, 'a', 'a', 'b', 'b', None])
+        self.assertEqual(df['other'].tolist()[-1], 1)
+
+
+class DashboardCacheTests(SimpleTestCase):
+    def test_least_recently_used_is_evicted_first(self):
+        cache = DashboardCache(max_entries=2, max_bytes=100)
+        cache.set('a', 'one')
+        cache.set('b', 'two')
+        self.assertEqual(cache.get('a'), 'one')
+        cache.set('c', 'three')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('one', 'three'))
+
+    def test_total_size_is_bounded(self):
+        cache = DashboardCache(max_entries=10, max_bytes=10)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'y' * 6)
+        self.assertIsNone(cache.get('a'))
+        cache.set('b', 'z' * 3)
+        cache.set('c', 'x' * 7)
+        self.assertEqual((cache.get('b'), cache.get('c')), ('zzz', 'x' * 7))
+        cache.set('d', 'x' * 11)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.get('c'), 'x' * 7)
+
+
+@override_settings(VISUALIZATION={'MAX_ROWS': 100})
+class DashboardTests(SimpleTestCase):
+    def setUp(self):
+        cache = DashboardCache(max_entries=4, max_bytes=1024 * 1024)
+        patcher = mock.patch('scraper_app.powerbi.get_dashboard_cache', return_value=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        walk = mock.patch('scraper_app.powerbi.pyg.walk')
+        self.walk = walk.start()
+        self.addCleanup(walk.stop)
+        self.walk.return_value.to_html.return_value = '<div>dashboard</div>'
+
+    def dashboard(self, items) -> str:
+        pwbi = Pwbi()
+        pwbi.items = items
+        return pwbi.dashboard()
+
+    def test_same_data_reuses_the_dashboard(self):
+        rows = [{'name': 'Oak chair', 'price': 120.0}, {'name': 'Pine table', 'price': 80.0}]
+        self.assertEqual(self.dashboard(rows), '<div>dashboard</div>')
+        self.assertEqual(self.dashboard(pd.DataFrame(rows)), '<div>dashboard</div>')
+        self.assertEqual(self.walk.call_count, 1)
+        self.dashboard(rows[:1])
+        self.assertEqual(self.walk.call_count, 2)
+
+    def test_large_frames_are_downsampled_and_labelled(self):
+        rows = [{'kind': 'chair' if index % 10 else 'table', 'price': float(index)} for index in range(1000)]
+        html = self.dashboard(rows)
+        embedded = self.walk.call_args.args[0]
+        self.assertLessEqual(abs(len(embedded) - 100), 2)
+        self.assertIn('Showing', html)
+        self.assertIn('of 1,000 rows, sampled in proportion to kind', html)
+
+    def test_stratified_sample_keeps_rare_groups(self):
+        df = pd.DataFrame({'kind': ['rare'] + ['common'] * 999, 'id': range(1000)})
+        sample, column = stratified_sample(df, 50, 10)
+        self.assertEqual(column, 'kind')
+        self.assertIn('rare', sample['kind'].tolist())
+        self.assertTrue(sample['id'].is_monotonic_increasing)
@@ -0,0 +1,47 @@
+# scraper_app/tests/test_prices.py
+from django.test import SimpleTestCase
+
+from ..prices import normalize_price_column, parse_price_fields
+
+
+class PriceTests(SimpleTestCase):
+    def test_symbols_and_grouping(self):
+        names, values = normalize_price_column('price', ['$1,234.50', '$5', '$10.00'])
+        self.assertEqual(names, ['Price ($)'] * 3)
+        self.assertEqual(values, [1234.5, 5.0, 10.0])
+
+    def test_ambiguous_numbers_follow_the_column_locale(self):
+        _, values = normalize_price_column('price', ['1.234,50 €', '2.000', '99,95 €'])
+        self.assertEqual(values, [1234.5, 2000.0, 99.95])
+        _, values = normalize_price_column('price', ['1,234.50', '2,000', '3.5'])
+        self.assertEqual(values, [1234.5, 2000.0, 3.5])
+
+    def test_currency_codes_in_any_case(self):
+        names, values = normalize_price_column('price', ['5 USD', 'usd 7'])
+        self.assertEqual(names, ['Price (USD)'] * 2)
+        self.assertEqual(values, [5.0, 7.0])
+
+    def test_mixed_currencies_are_named_per_value(self):
+        names, _ = normalize_price_column('price', ['$5', '€6', '7'])
+        self.assertEqual(names, ['Price ($)', 'Price (€)', 'Price (Unknown)'])
+
+    def test_unparseable_values_are_kept(self):
+        _, values = normalize_price_column('price', ['call us', '$5', None])
+        self.assertEqual(values[:2], ['call us', 5.0])
+        self.assertIsNone(values[2])
+
+    def test_normalizing_twice_changes_nothing(self):
+        for column in (['$1,234.50', '$5'], ['1.234,50 €', '99,95 €', 3.5], ['call us', '£2']):
+            names, values = normalize_price_column('price', column)
+            self.assertEqual(normalize_price_column(names[0], values), (names, values))
+
+    def test_parse_price_fields_leaves_its_input_alone(self):
+        rows = [{'name': 'a', 'price': '$5'}]
+        data = parse_price_fields({'rows': rows})
+        self.assertEqual(data['rows'], [{'name': 'a', 'Price ($)': 5.0}])
+        self.assertEqual(rows, [{'name': 'a', 'price': '$5'}])
+
+    def test_parse_price_fields_reads_fields_of_every_row(self):
+        rows = [{'name': 'a', 'Price ($)': 5.0}, {'name': 'b', 'price': '$6'}]
+        self.assertEqual(parse_price_fields({'rows': rows})['rows'],
+                         [{'name': 'a', 'Price ($)': 5.0}, {'name': 'b', 'Price ($)': 6.0}])
@@ -0,0 +1,66 @@
+# scraper_app/tests/test_records.py
+from django.test import SimpleTestCase
+from lxml import html as lxml_html
+
+from ..records import container_selector, find_record_elements, find_records, record_fields
+
+CARD = '''
+<div class="card card--sale">
+    <a href="/items/{slug}"><h2>{name}</h2></a>
+    <span class="price">{price}</span>
+    <span class="reviews">{reviews} reviews</span>
+</div>'''
+
+PRODUCTS = [('oak-chair', 'Oak chair', '$120.00', 12), ('pine-table', 'Pine table', '$80.00', 3),
+            ('birch-shelf', 'Birch shelf', '$45.50', 1), ('ash-stool', 'Ash stool', '$30.00', 7)]
+
+
+def page(cards_per_row: int = 4, products=PRODUCTS, extra: str = '') -> object:
+    cards = [CARD.format(slug=slug, name=name, price=price, reviews=reviews)
+             for slug, name, price, reviews in products]
+    rows = ''.join(f'<div class="row">{"".join(cards[start:start + cards_per_row])}</div>'
+                   for start in range(0, len(cards), cards_per_row))
+    return lxml_html.document_fromstring(f'''
+        <html><body>
+            <nav><a href="/">Home</a><a href="/chairs">Chairs</a><a href="/tables">Tables</a></nav>
+            <div class="grid">{rows}</div>
+            {extra}
+        </body></html>''')
+
+
+class RecordTests(SimpleTestCase):
+    def test_grid_cards_become_one_line_records(self):
+        self.assertEqual(find_records(page())[:2], ['Oak chair | $120.00 | 12 reviews',
+                                                    'Pine table | $80.00 | 3 reviews'])
+
+    def test_cards_split_over_rows_stay_one_group(self):
+        records = find_record_elements(page(cards_per_row=2))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(container_selector(records), 'div.row > div.card')
+
+    def test_page_without_a_grid_has_no_records(self):
+        document = lxml_html.document_fromstring(
+            '<html><body><h1>About us</h1><p>We make furniture by hand in a small workshop.</p></body></html>')
+        self.assertIsNone(find_records(document))
+        self.assertIsNone(find_records(page(products=PRODUCTS[:2])))
+
+    def test_grid_holding_little_of_the_page_is_ignored(self):
+        essay = '<article><p>' + 'Solid wood lasts for generations. ' * 5 + '</p></article>'
+        self.assertIsNotNone(find_records(page(extra=essay)))
+        self.assertIsNone(find_records(page(extra=essay * 10)))
+        self.assertIsNotNone(find_records(page(extra=essay * 10), MIN_COVERAGE=0.01))
+
+    def test_record_fields_map_paths_to_text(self):
+        fields = record_fields(find_record_elements(page())[0])
+        self.assertEqual(fields, {
+            'a': 'Oak chair',
+            'a@href': '/items/oak-chair',
+            'a > h2': 'Oak chair',
+            'span.price': '$120.00',
+            'span.reviews': '12 reviews',
+        })
+
+    def test_siblings_sharing_a_signature_are_numbered(self):
+        record = lxml_html.fragment_fromstring('<li><b>Oak chair</b><span>$120.00</span><span>In stock</span></li>')
+        self.assertEqual(record_fields(record), {'b': 'Oak chair', 'span:nth-child(2)': '$120.00',
+                                                 'span:nth-child(3)': 'In stock'})
@@ -0,0 +1,60 @@
+# scraper_app/tests/test_results.py
+from django.test import TestCase
+from django.urls import reverse
+
+from ..exceptions import ScraperError
+from ..results import filter_rows, save_result
+
+
+class FilterRowsTests(TestCase):
+    def setUp(self):
+        self.result = save_result('https://example.com', [
+            {'name': 'Red chair', 'Price ($)': 10.0},
+            {'name': 'Blue chair', 'Price ($)': 25.0},
+            {'name': 'Red table', 'Price ($)': 100.0},
+        ])
+
+    def names(self, params: dict) -> list:
+        return [row.data['name'] for row in filter_rows(self.result, params)]
+
+    def test_column_filter_is_a_case_insensitive_contains(self):
+        self.assertEqual(self.names({'name': 'red'}), ['Red chair', 'Red table'])
+
+    def test_numeric_range_and_sort(self):
+        self.assertEqual(self.names({'Price ($)__gte': '20', 'sort': '-Price ($)'}), ['Red table', 'Blue chair'])
+        self.assertEqual(self.names({'Price ($)__lte': '25'}), ['Red chair', 'Blue chair'])
+
+    def test_search_covers_every_column(self):
+        self.assertEqual(self.names({'q': 'TABLE'}), ['Red table'])
+
+    def test_reserved_and_empty_parameters_are_not_filters(self):
+        self.assertEqual(self.names({'page': '2', 'page_size': '1', 'profile': '1', 'name': ''}),
+                         ['Red chair', 'Blue chair', 'Red table'])
+
+    def test_invalid_parameters_raise(self):
+        with self.assertRaises(ScraperError):
+            self.names({'colour': 'red'})
+        with self.assertRaises(ScraperError):
+            self.names({'Price ($)__gte': 'cheap'})
+        with self.assertRaises(ScraperError):
+            self.names({'sort': 'colour'})
+
+
+class ResultQueryViewTests(TestCase):
+    def setUp(self):
+        self.result = save_result('https://example.com', [
+            {'name': 'Red chair'}, {'name': 'Blue chair'}, {'name': 'Red table'},
+        ])
+
+    def query(self, params: dict) -> dict:
+        response = self.client.get(reverse('scrape_result', args=[self.result.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_total_counts_filtered_rows(self):
+        self.assertEqual(self.query({'name': 'red'})['total'], 2)
+        self.assertEqual(self.query({'q': 'table'})['total'], 1)
+
+    def test_reserved_parameters_keep_the_stored_total(self):
+        data = self.query({'page': '2', 'page_size': '2', 'sort': 'name', 'q': ''})
+        self.assertEqual((data['total'], data['pages'], data['rows']), (3, 2, [{'name': 'Red table'}]))
@@ -0,0 +1,115 @@
+# scraper_app/tests/test_snapshot_cache.py
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from ..snapshot_cache import SnapshotCache, normalize_url
+
+SCROLL = {'TIME_BUDGET': 8.0}
+
+
+class SnapshotCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.requests = []
+        self.status = 304
+
+    def cache(self, **options) -> SnapshotCache:
+        cache = SnapshotCache(self.directory, **options)
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(self.status)
+        cache._http_client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return cache
+
+    def store(self, cache: SnapshotCache, page_index: int, age: float = 0, **page):
+        page = {'page_index': page_index, 'content': f'page {page_index}', 'is_last': False, **page}
+        with mock.patch('scraper_app.snapshot_cache.time.time', return_value=time.time() - age):
+            cache.store_page('https://example.com/list', page, SCROLL)
+
+    def load(self, cache: SnapshotCache, page_count: int = 2, url: str = 'https://example.com/list'):
+        pages = asyncio.run(cache.aload(url, page_count, SCROLL))
+        return pages and [page['content'] for page in pages]
+
+    def test_fresh_snapshots_are_served(self):
+        cache = self.cache()
+        self.store(cache, 1)
+        self.store(cache, 2)
+        self.assertEqual(self.load(cache), ['page 1', 'page 2'])
+        self.assertEqual(self.load(cache, url='HTTPS://Example.com/list?utm_source=x'), ['page 1', 'page 2'])
+        self.assertEqual(self.requests, [])
+
+    def test_every_page_must_be_cached(self):
+        cache = self.cache()
+        self.store(cache, 1)
+        self.assertIsNone(self.load(cache))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_last_page_ends_the_scrape_early(self):
+        cache = self.cache()
+        self.store(cache, 1, is_last=True)
+        self.assertEqual(self.load(cache, page_count=3), ['page 1'])
+
+    def test_stale_pages_are_revalidated_together(self):
+        cache = self.cache(TTL=60)
+        self.store(cache, 1, age=120, etag='"one"', final_url='https://example.com/list')
+        self.store(cache, 2, age=120, last_modified='Mon, 01 Jan 2024 00:00:00 GMT',
+                   final_url='https://example.com/list?page=2')
+        self.assertEqual(self.load(cache), ['page 1', 'page 2'])
+        self.assertEqual(sorted((str(request.url), request.headers.get('if-none-match')) for request in self.requests),
+                         [('https://example.com/list', '"one"'), ('https://example.com/list?page=2', None)])
+        self.assertEqual(cache.stats()['revalidated'], 2)
+
+        # Revalidation restarted their TTL
+        self.assertEqual(self.load(cache), ['page 1', 'page 2'])
+        self.assertEqual(len(self.requests), 2)
+
+    def test_changed_page_misses(self):
+        self.status = 200
+        cache = self.cache(TTL=60)
+        self.store(cache, 1, age=120, etag='"one"')
+        self.store(cache, 2)
+        self.assertIsNone(self.load(cache))
+
+    def test_stale_page_without_validators_misses(self):
+        cache = self.cache(TTL=60)
+        self.store(cache, 1)
+        self.store(cache, 2, age=120)
+        self.assertIsNone(self.load(cache))
+        self.assertEqual(self.requests, [])
+
+    def test_too_old_pages_are_not_revalidated(self):
+        cache = self.cache(TTL=60, MAX_AGE=600)
+        self.store(cache, 1, age=1200, etag='"one"', is_last=True)
+        self.assertIsNone(self.load(cache))
+        self.assertEqual(self.requests, [])
+
+    def test_eviction_drops_least_recently_used(self):
+        cache = self.cache()
+        self.store(cache, 1)
+        self.store(cache, 2)
+        first = cache._path(cache.key('https://example.com/list', 1, SCROLL))
+        os.utime(first, (0, 0))
+        cache.options['MAX_BYTES'] = os.path.getsize(first) + 1
+        cache.evict()
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = self.cache(ENABLED=False)
+        self.store(cache, 1, is_last=True)
+        self.assertIsNone(self.load(cache))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('HTTPS://Example.com:443?b=2&a=1&utm_medium=x#top'),
+                         'https://example.com/?a=1&b=2')
+        self.assertEqual(normalize_url('http://example.com:8080/x'), 'http://example.com:8080/x')
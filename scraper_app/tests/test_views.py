@@ -0,0 +1,83 @@
+# scraper_app/tests/test_views.py
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from django.urls import reverse
+
+from ..exceptions import ScraperError
+from ..models import ScrapeResult
+
+FORM = {'url': 'https://example.com/list', 'fields': 'name,price', 'page_count': '2', 'groq_api_key': 'caller-key',
+        'stream': 'ndjson'}
+
+
+def fake_stream(*events, error: Exception = None):
+    async def stream_listings(*args, **kwargs):
+        for event in events:
+            yield event
+        if error is not None:
+            raise error
+    return stream_listings
+
+
+class StreamScrapeTests(TestCase):
+    def post(self, stream_listings, data: dict = FORM) -> list:
+        with mock.patch('scraper_app.views.stream_listings', stream_listings):
+            response = self.client.post(reverse('index'), data)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            body = b''.join(response.streaming_content)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    async def apost(self, stream_listings) -> list:
+        with mock.patch('scraper_app.views.stream_listings', stream_listings):
+            response = await self.async_client.post(reverse('index'), FORM)
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def stored_rows(self, events: list) -> list:
+        result = ScrapeResult.objects.get(pk=events[0]['result_id'])
+        return [row.data for row in result.rows.order_by('position')]
+
+    def test_rows_are_streamed_and_stored(self):
+        events = self.post(fake_stream(
+            {'event': 'page', 'page': 1, 'chunks': 1, 'mode': 'records'},
+            {'event': 'rows', 'page': 1, 'rows': [{'name': 'Oak chair', 'price': '$120.00'}]},
+            {'event': 'timings', 'total': 0.1, 'stages': {}},
+        ))
+        self.assertEqual([event['event'] for event in events], ['start', 'page', 'rows', 'timings', 'done'])
+        self.assertEqual(events[0]['pages'], 2)
+        self.assertEqual(events[-1], {'event': 'done', 'count': 1, 'result_id': events[0]['result_id']})
+        # Prices are parsed before rows leave the server
+        self.assertEqual(events[2]['rows'], self.stored_rows(events))
+        self.assertIn('Price ($)', events[2]['rows'][0])
+
+    def test_failure_before_any_rows_discards_the_result(self):
+        events = self.post(fake_stream({'event': 'page', 'page': 1, 'chunks': 1, 'mode': 'page'},
+                                       error=ScraperError('Service Unavailable')))
+        self.assertEqual(events[-1], {'event': 'error', 'message': 'Groq API servers are currently overwhelmed. '
+                                                                  'Please try again later.'})
+        self.assertFalse(ScrapeResult.objects.filter(pk=events[0]['result_id']).exists())
+
+    def test_no_rows_is_an_error(self):
+        events = self.post(fake_stream({'event': 'rows', 'page': 1, 'rows': []}))
+        self.assertEqual(events[-1]['event'], 'error')
+        self.assertFalse(ScrapeResult.objects.exists())
+
+    def test_invalid_input_is_a_json_error(self):
+        with mock.patch('scraper_app.views.stream_listings') as stream_listings:
+            response = self.client.post(reverse('index'), {**FORM, 'fields': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['event'], 'error')
+        stream_listings.assert_not_called()
+
+    async def test_asgi_requests_stream_asynchronously(self):
+        events = await self.apost(fake_stream(
+            {'event': 'rows', 'page': 1, 'rows': [{'name': 'Oak chair'}, {'name': 'Pine table'}]},
+            {'event': 'rows', 'page': 2, 'rows': [{'name': 'Birch shelf'}]},
+        ))
+        self.assertEqual([event['event'] for event in events], ['start', 'rows', 'rows', 'done'])
+        self.assertEqual(events[-1]['count'], 3)
+        rows = await sync_to_async(self.stored_rows)(events)
+        self.assertEqual([row['name'] for row in rows], ['Oak chair', 'Pine table', 'Birch shelf'])
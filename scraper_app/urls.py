@@ -7,5 +7,19 @@ urlpatterns = [
     path('', views.scrape_website, name='index'),
     path('download/csv/', views.download_csv, name='download_csv'),
     path('download/json/', views.download_json, name='download_json'),
+    path('download/<str:export_format>/', views.download_export, name='download_export'),
     path('upload/', views.handle_file_upload, name='handle_file_upload'),
+    path('api/jobs/', views.submit_scrape_job, name='submit_scrape_job'),
+    path('api/jobs/<uuid:job_id>/', views.scrape_job_status, name='scrape_job_status'),
+    path('api/jobs/<uuid:job_id>/result/', views.scrape_job_result, name='scrape_job_result'),
+    path('api/jobs/<uuid:job_id>/cancel/', views.cancel_scrape_job, name='cancel_scrape_job'),
+    path('api/batches/', views.submit_scrape_batch, name='submit_scrape_batch'),
+    path('api/batches/<uuid:batch_id>/', views.scrape_batch_status, name='scrape_batch_status'),
+    path('api/batches/<uuid:batch_id>/result/', views.scrape_batch_result, name='scrape_batch_result'),
+    path('api/batches/<uuid:batch_id>/cancel/', views.cancel_scrape_batch, name='cancel_scrape_batch'),
+    path('api/results/<uuid:result_id>/', views.scrape_result, name='scrape_result'),
+    path('api/results/<uuid:result_id>/download/<str:export_format>/', views.download_result, name='download_result'),
+    path('api/results/<uuid:result_id>/visualize/', views.visualize_result, name='visualize_result'),
+    path('api/profiles/<uuid:profile_id>/', views.profile_result, name='profile_result'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
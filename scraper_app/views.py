@@ -1,26 +1,41 @@
 # scraper_app/views.py
 from django.shortcuts import render
 from django.views.decorators.cache import never_cache
+from django.views.decorators.gzip import gzip_page
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django.core.validators import URLValidator
-from django.core.exceptions import ValidationError
-from bs4 import BeautifulSoup
-import html2text
-from groq import Groq
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.conf import settings
+import hmac
+import ipaddress
 import json
-import re
-import asyncio
-import concurrent.futures
-from playwright.async_api import async_playwright
-import random
-from typing import List
 import logging
-from django.http import HttpResponse
-import csv
+from typing import List
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from dotenv import load_dotenv, dotenv_values
 import os
 from .powerbi import Pwbi
+from .runtime import get_background_loop
+from .browser_pool import get_browser_pool
+from .exceptions import ScraperError
+from .llm import get_extraction_engine, EXTRACTION_SYSTEM_MESSAGE
+from .llm_cache import get_extraction_cache
+from .snapshot_cache import get_snapshot_cache
+from .models import ScrapeBatch, ScrapeJob, ScrapeResult
+from .jobs import cancel_batch, cancel_job, job_settings, submit_batch, submit_job
+from .pipeline import iter_pages, scrape_listings, stream_listings
+from .metrics import Timings, get_metrics, metrics_settings
+from .profiling import load_profile, may_profile, profiled
+from .cleaning import normalize_text
+from .prices import parse_price_fields
+from .exports import EXPORT_FORMATS, export_settings, iter_export
+from .results import RESERVED_PARAMETERS, ResultWriter, filter_rows, iter_row_data, job_result, page_bounds, save_result
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 # print(f'Dotenv path is: {dotenv_path}')
@@ -35,332 +50,48 @@ GROQ_API_KEY = env_variables.get('GROQ_API_KEY')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# User agents list (truncated for brevity - you can keep the full list from api.py)
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-]
-
-class ScraperError(Exception):
-    """Custom exception for scraper-related errors"""
-    pass
-
-def groq_connection(api_key: str) -> Groq:
-    """Initialize Groq client with error handling"""
+def _trusted_proxy(address: str) -> bool:
     try:
-        return Groq(api_key=api_key)
-    except Exception as e:
-        logger.error(f"Error creating Groq client: {e}")
-        raise ScraperError(f"Failed to initialize Groq API: {str(e)}")
-
-async def fetch_and_clean_html(url: str, page_count: int = 1) -> str:
-    """Fetch and clean HTML content using Playwright"""
-    try:
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent=random.choice(USER_AGENTS),
-                viewport={'width': 1920, 'height': 1080},
-                java_script_enabled=True,
-                bypass_csp=True,
-                ignore_https_errors=True,
-            )
-
-            context.set_default_timeout(15000)
-            page = await context.new_page()
-
-            # Block unnecessary resources
-            await page.route("**/*.{png,jpg,jpeg,gif,svg}", lambda route: route.abort())
-            await page.route("**/*analytics*.js", lambda route: route.abort())
-            await page.route("**/*tracking*.js", lambda route: route.abort())
-            await page.route("**/*advertisement*.js", lambda route: route.abort())
-
-            all_content = []
-            current_page = 1
-
-            while current_page <= page_count:
-                logger.info(f"Navigating to page {current_page} of {url}")
-
-                if current_page == 1:
-                    await page.goto(url, wait_until='domcontentloaded')
-
-                # Scroll to trigger lazy loading
-                for _ in range(30):
-                    await page.mouse.wheel(0, 2000)
-                    await page.wait_for_timeout(150)
-
-                try:
-                    await page.wait_for_load_state('networkidle', timeout=10000)
-                except Exception:
-                    pass
-
-                html_content = await page.content()
-
-                # Clean HTML
-                soup = BeautifulSoup(html_content, 'html.parser')
-                for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe']):
-                    element.decompose()
-
-                # Convert to markdown/text
-                markdown_converter = html2text.HTML2Text()
-                markdown_converter.ignore_links = False
-                markdown_converter.ignore_images = True
-                markdown_converter.ignore_emphasis = False
-                markdown_converter.ignore_tables = False
-                markdown_converter.body_width = 0
-
-                text_content = markdown_converter.handle(str(soup))
-                all_content.append(text_content)
-
-                if current_page < page_count:
-                    # Comprehensive list of next button selectors
-                    next_button_selectors = [
-                        'button[aria-label*="next" i]',
-                        'button:has-text("Next")',
-                        'button:has-text("next")',
-                        'a[rel="next"]',
-                        'a[aria-label*="next" i]',
-                        'a:has-text("Next")',
-                        'a:has-text("next")',
-                        'a[class*="next"]',
-                        'a.next',
-                        '.next a',
-                        '[class*="pagination"] [class*="next"]',
-                        '[class*="pager"] [class*="next"]',
-                        '[class*="paginate"] [class*="next"]',
-                        'li.next a',
-                        '.pagination-next',
-                        '[aria-label="Next page"]',
-                        '[aria-label="next page"]',
-                        'input[value="Next"]',
-                        'input[value="next"]',
-                        'span[class*="next"]',
-                        'div[class*="next"]'
-                    ]
-
-                    # Try each selector
-                    next_button = None
-                    for selector in next_button_selectors:
-                        try:
-                            next_button = await page.wait_for_selector(selector, timeout=1000)
-                            if next_button:
-                                logger.info(f"Found next button with selector: {selector}")
-                                break
-                        except Exception:
-                            continue
-
-                    if not next_button:
-                        # Try finding by text content if no button found
-                        try:
-                            next_button = await page.get_by_text(re.compile(r'next', re.IGNORECASE), exact=False).first
-                            if next_button:
-                                logger.info("Found next button by text content")
-                        except Exception:
-                            pass
-
-                    if not next_button:
-                        logger.info("No next button found, stopping pagination")
-                        break
-
-                    try:
-                        # Try multiple click methods
-                        try:
-                            # First try native click
-                            await next_button.click()
-                            logger.info("Clicked next button using native click")
-                        except Exception:
-                            try:
-                                # Try JavaScript click
-                                await page.evaluate('(element) => element.click()', next_button)
-                                logger.info("Clicked next button using JavaScript")
-                            except Exception:
-                                # Try getting href and navigating
-                                href = await next_button.get_attribute('href')
-                                if href:
-                                    if not href.startswith('http'):
-                                        # Handle relative URLs
-                                        base_url = '/'.join(url.split('/')[:3])
-                                        href = f"{base_url.rstrip('/')}/{href.lstrip('/')}"
-                                    await page.goto(href)
-                                    logger.info(f"Navigated to next page using href: {href}")
-                                else:
-                                    raise Exception("No href attribute found")
-
-                        # Wait for navigation to complete
-                        await page.wait_for_timeout(2000)
-
-                        # Verify navigation succeeded by checking URL or content change
-                        new_url = page.url
-                        if new_url == url and current_page > 1:
-                            logger.warning("URL didn't change after clicking next button")
-                            break
-                        url = new_url
-
-                    except Exception as e:
-                        logger.error(f"Error navigating to next page: {e}")
-                        break
-
-                current_page += 1
-
-            # Clean combined content
-            combined_content = "\n".join(all_content)
-            space_pattern = re.compile(r'\s+')
-            url_pattern = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
-
-            cleaned_content = space_pattern.sub(' ', combined_content)
-            cleaned_content = url_pattern.sub('', cleaned_content)
-
-            return cleaned_content.strip()
-
-    except Exception as e:
-        logger.error(f"Error fetching HTML: {e}")
-        raise ScraperError(f"Failed to fetch webpage content: {str(e)}")
-
-def clean_json_string(json_str: str) -> str:
-    """Clean and validate JSON string"""
-    try:
-        # Find the start and end of the JSON object
-        start = json_str.find('{')
-        end = json_str.rfind('}') + 1
-
-        # Check if valid JSON structure is found
-        if start >= 0 and end > 0:
-            # Extract the JSON object
-            json_str = json_str[start:end]
-
-            # Ensure the JSON string ends with ']}' for proper listing format
-            if not json_str.endswith(']}'):
-                # Remove trailing comma if present and add closing brackets
-                json_str = json_str.rstrip(',') + ']}'
-
-            return json_str
-    except Exception as e:
-        # Log any errors encountered during the cleaning process
-        logger.error(f"Failed to clean JSON: {e}")
-
-    # Return an empty listings object if cleaning fails
-    return '{"listings": []}'
-
-def process_chunk(client: Groq, sys_message: str, chunk: str, fields: List[str]) -> List[dict]:
-    """ Process a chunk of text using Groq API" """
-    # List of available LLM models
-    llms = [
-        'llama-3.2-90b-vision-preview',
-        'deepseek-r1-distill-llama-70b',
-        'llama-3.3-70b-versatile'
-        'llama-3.1-70b-versatile',
-        'llama-3.3-70b-specdec',
-        'llama3-70b-8192',
-        'llama3-groq-70b-8192-tool-use-preview'
-        'llama-3.2-90b-text-preview',
-    ]
-
-    # Initialize model index and retry counter
-    current_model_index = 0
-    retry_count = 0
-    error_details = None
-
-    # Retry loop with a maximum of 3 attempts
-    while retry_count < 3:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    for proxy in getattr(settings, 'TRUSTED_PROXIES', []):
         try:
-            # Select current LLM model
-            llm = llms[current_model_index]
-            logger.info(f"Processing chunk with model {llm}")
-
-            # Make API call to Groq
-            response = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": sys_message},
-                    {"role": "user", "content": (
-                        f'Extract these fields from the text: {", ".join(fields)}.\n'
-                        f'Return as JSON with format {{"listings": [{{fields}}]}}.\n'
-                        f'Content:\n{chunk}'
-                    )}
-                ],
-                model=llm,
-                temperature=0.1
-            )
-
-            # Extract completion from response
-            completion = response.choices[0].message.content
-            logger.info(f"Raw LLM Response (truncated): {completion[:200]}...")
-
-            try:
-                # Clean and parse JSON response
-                cleaned_completion = clean_json_string(completion)
-                parsed_chunk = json.loads(cleaned_completion)
-                if 'listings' not in parsed_chunk:
-                    raise ValueError("Missing 'listings' key")
-                return parsed_chunk['listings']
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.error(f"Error parsing response: {e}")
-                retry_count += 1
-                error_details = {
-                    'error_type': 'parsing_error',
-                    'message': str(e)
-                }
-                continue
+            if ip in ipaddress.ip_network(proxy, strict=False):
+                return True
+        except ValueError:
+            logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {proxy}")
+    return False
 
-        except Exception as e:
-            error_message = str(e).lower()
-            logger.error(f"Error in process_chunk: {e}")
-
-            # Handle different types of Groq API errors
-            if "rate_limit" in error_message or "429" in error_message:
-                error_details = {
-                    'error_type': 'rate_limit',
-                    'message': 'Rate limit exceeded. Please try again later or switch to a custom API key.'
-                }
-                current_model_index = (current_model_index + 1) % len(llms)
-                logger.info(f"Rate limit hit, switching to model {llms[current_model_index]}")
-            elif "400" in error_message or "bad request" in error_message:
-                logger.warning(f"Bad request error. Trying with next model. Details: {e}")
-                current_model_index = (current_model_index + 1) % len(llms)
-                retry_count += 1
-                error_details = {
-                    'error_type': 'bad_request',
-                    'message': 'Invalid request format. Trying with different model.'
-                }
-                continue
-            elif "invalid_api_key" in error_message or "authentication" in error_message:
-                error_details = {
-                    'error_type': 'invalid_api_key',
-                    'message': 'Invalid API key. Please check your API key and try again.'
-                }
-                break  # Don't retry for invalid API key
-            elif "insufficient_quota" in error_message:
-                error_details = {
-                    'error_type': 'quota_exceeded',
-                    'message': 'API quota exceeded. Please check your subscription or switch to a different API key.'
-                }
-                break  # Don't retry for quota issues
-            else:
-                error_details = {
-                    'error_type': 'general_error',
-                    'message': f'An error occurred: {str(e)}'
-                }
-                retry_count += 1
-
-    # If we exit the retry loop without success, raise an exception with error details
-    if error_details:
-        error_message = json.loads(str(e))
-        error_type = error_message.get('error', {}).get('type', '')
-        message = error_message.get('error', {}).get('message', '')
-
-        if '429' in str(e) or 'rate_limit' in str(e).lower():
-            # Extract wait time if available
-            wait_time = re.search(r'try again in (.+?)\.', message)
-            wait_msg = f" Please wait {wait_time.group(1)}" if wait_time else ""
-            raise ScraperError(f"Rate limit reached.{wait_msg} The API is processing too many requests.")
-        elif '503' in str(e):
-            raise ScraperError("Groq API is temporarily unavailable. Please try again in a few minutes.")
-        elif '400' in str(e):
-            raise ScraperError(f"Bad request error. Please check your input format. Details: {message}")
-        else:
-            raise ScraperError(f"API Error: {message}")
-
-    return []
+def client_key(request) -> str:
+    """
+    Identify the client behind a request so LLM capacity can be shared fairly.
 
+    X-Forwarded-For is written by the client too, so it is read from the right
+    and only through hops appended by TRUSTED_PROXIES; the first address that is
+    not a trusted proxy is the client.
+    """
+    address = request.META.get('REMOTE_ADDR') or 'anonymous'
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    while hops and _trusted_proxy(address):
+        address = hops.pop()
+    return address
+
+async def fetch_and_clean_html(url: str, page_count: int = 1, use_cache: bool = True) -> str:
+    """Fetch and clean HTML content using a pooled Playwright browser"""
+    # Browsers live on the shared background loop so every request can reuse them
+    return await get_background_loop().run(_fetch_and_clean_html(url, page_count, use_cache))
+
+async def _fetch_and_clean_html(url: str, page_count: int, use_cache: bool) -> str:
+    """Return the cleaned text of the requested pages, from snapshots when still valid"""
+    return _combine_pages([page['content'] async for page in iter_pages(url, page_count, use_cache)])
+
+def _combine_pages(page_contents: List[str]) -> str:
+    """Join the text of all pages, tidy whitespace and strip URLs, keeping block boundaries"""
+    return normalize_text("\n\n".join(page_contents))
+
+@profiled
+@gzip_page
 def handle_file_upload(request):
     """Handle file upload for visualization"""
     try:
@@ -369,8 +100,8 @@ def handle_file_upload(request):
 
         uploaded_file = request.FILES['file']
         pwbi = Pwbi()
-        df = pwbi.process_file(uploaded_file)
-        pwbi.items = df.to_dict('records')
+        # The dashboard takes the DataFrame as it is, without a round trip through records
+        pwbi.items = pwbi.process_file(uploaded_file)
         visualization_html = pwbi.dashboard()
 
         return JsonResponse({
@@ -383,52 +114,44 @@ def handle_file_upload(request):
             'message': str(e)
         }, status=400)
 
-def parse_price_fields(data):
-    """Parse and convert price fields in the data"""
-    rows = data.get('rows', [])
-    if not rows:
-        return data
-
-    # Find price fields in the data
-    price_fields = [field for field in rows[0].keys() if 'price' in field.lower()]
-
-    # Compile a regex to match all known currencies
-    currency_regex = re.compile(r'(\$|€|£|¥|₹|₽|₺|₩|₪|₫|฿|₦|₴|؋|Ar|R|Br|лв|៛|₡|₲|₵|Kč|kr|£|Q|Ft|Rp|﷼|J\$|₭|ден|₮|MT|₦|C\$|P|S/|₨|₱|zł|lei|Lei|руб|RSD|₸|₭|DB|Bs|TSh|₸|₾|USD|EUR|GBP|JPY|AUD|CAD|CNY|INR|RUB|TRY|KRW|ILS|VND|THB|NGN|BRL|ZAR|HKD|SGD|MYR|MXN|PHP|PLN|IDR|SAR|EGP|CHF|NOK|SEK|NZD|DKK|AED|KWD|ARS|COP|PEN|CLP|UAH|GHS|AOA|BHD|BWP|GIP|LKR|MVR|MUR|NAD|PGK|TOP|UYU|WST|YER|AFN|ALL|DZD|AOA|XCD|AMD|AWG|AZN|BSD|BHD|BDT|BBD|BYN|BZD|BMD|BOB|BAM|BWP|BND|BGN|BIF|CVE|KHR|XAF|XPF|KYD|KMF|XAF|CLF|KPW|CRC|CUP|DOP|DJF|XCD|ERN|SZL|ETB|FJD|GMD|XAU|XAG|XPT|XPD|GYD|HTG|HUF|IRR|IQD|ISK|JOD|KZT|KGS|LAK|LBP|LSL|LRD|LYD|MGA|MKD|MMK|MNT|MAD|MZN|NIO|OMR|PKR|PYG|QAR|RON|RWF|STD|SCR|SLL|SBD|SOS|SSP|SDG|SRD|SYP|TJS|TMT|TND|UGX|UZS|VEF|VUV|XOF|ZMW|ZWL)', re.IGNORECASE)
-
-    # Parse and convert price fields
-    for row in rows:
-        for field in price_fields:
-            price_value = row[field]
-
-            # Check if a currency is present
-            match = currency_regex.search(price_value)
-            if match:
-                currency_symbol = match.group()
-            else:
-                currency_symbol = 'Unknown'
-
-            # Remove non-numeric characters except for commas and periods
-            cleaned_price = re.sub(r'[^0-9,\.]', '', price_value)
-
-            # Replace comma (European decimal) with period
-            cleaned_price = cleaned_price.replace(',', '.')
+def _scrape_inputs(data):
+    """Extract and validate scrape inputs from form data or a JSON object"""
+    url = data.get('url')
+    groq_api_key = data.get('groq_api_key')
+    fields = data.get('fields') or ''
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [str(field).strip() for field in fields if str(field).strip()]
+    try:
+        page_count = int(data.get('page_count', 1))
+    except (TypeError, ValueError):
+        raise ScraperError("Page count must be between 1 and 10")
 
-            # Remove thousands separator (period)
-            cleaned_price = cleaned_price.replace('.', '', cleaned_price.count('.') - 1)
+    # Validate URL
+    url_validator = URLValidator()
+    try:
+        url_validator(url)
+    except ValidationError:
+        raise ScraperError("Please provide a valid URL starting with http:// or https://")
 
-            # Convert cleaned price to float
-            try:
-                new_price = float(cleaned_price)
-            except ValueError:
-                new_price = price_value  # Fallback to the original value if it fails
+    # Validate fields
+    if not fields:
+        raise ScraperError("Please specify at least one field to extract")
 
-            # Remove the original price field and replace it with a new one
-            row.pop(field)
-            row[f'Price ({currency_symbol})'] = new_price
+    # Validate page count
+    if page_count < 1 or page_count > 10:
+        raise ScraperError("Page count must be between 1 and 10")
 
-    return data
+    return url, groq_api_key, fields, page_count
 
+def _user_error_message(e: ScraperError) -> str:
+    """Make a scraper error message more user-friendly"""
+    error_msg = str(e)
+    if "Service Unavailable" in error_msg:
+        return "Groq API servers are currently overwhelmed. Please try again later."
+    return error_msg
 
+@profiled
 @csrf_protect
 @never_cache
 async def scrape_website(request):
@@ -441,141 +164,556 @@ async def scrape_website(request):
         'show_results': False, # Boolean flag to control results display in template
         'default_api_key': GROQ_API_KEY # Default Groq API key from environment variables
     }
+    timings = Timings()
 
     if request.method == 'POST':
+        streaming = request.POST.get('stream') == 'ndjson'
         try:
-            # Extract and validate inputs
-            url = request.POST.get('url')
-            groq_api_key = request.POST.get('groq_api_key')
-            fields = [field.strip() for field in request.POST.get('fields', '').split(',') if field.strip()]
-            page_count = int(request.POST.get('page_count', 1))
-
-            # Validate URL
-            url_validator = URLValidator()
-            try:
-                url_validator(url)
-            except ValidationError:
-                raise ScraperError("Please provide a valid URL starting with http:// or https://")
-
-            # Validate fields
-            if not fields:
-                raise ScraperError("Please specify at least one field to extract")
-
-            # Validate page count
-            if page_count < 1 or page_count > 10:
-                raise ScraperError("Page count must be between 1 and 10")
-
-            # Initialize Groq client
-            client = groq_connection(groq_api_key)
-
-            # Fetch and process content with pagination
-            content = await fetch_and_clean_html(url, page_count)
-            chunk_size = 10000
-            chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-
-            sys_message = """
-                You are a data extraction expert. Extract structured information from the given text.
-                Return ONLY a valid JSON object containing the requested fields.
-                The response MUST be in this exact format, with no additional text:
-                {"listings": [{"field1": "value1", "field2": "value2"}, ...]}
-                Each listing must include all requested fields. Use an empty string if a field is not found.
-                Ensure all quotes are double quotes and there are no trailing commas.
-                """
-
-            # Process chunks concurrently
-            loop = asyncio.get_event_loop()
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                tasks = [
-                    loop.run_in_executor(pool, process_chunk, client, sys_message, chunk, fields)
-                    for chunk in chunks
-                ]
-                try:
-                    results = await asyncio.gather(*tasks)
-                except ScraperError as e:
-                    error_details = json.loads(str(e))
-                    raise ScraperError(error_details['message'])
-
-            # Combine results
-            all_listings = []
-            for result in results:
-                if isinstance(result, list):
-                    all_listings.extend(result)
+            url, groq_api_key, fields, page_count = _scrape_inputs(request.POST)
+
+            if streaming:
+                return _stream_scrape(request, url, groq_api_key, fields, page_count)
+
+            # Extract each page while the browser fetches the next one
+            all_listings = await get_background_loop().run(scrape_listings(
+                url, page_count, groq_api_key, EXTRACTION_SYSTEM_MESSAGE, fields, user=client_key(request),
+                timings=timings,
+            ))
 
             if not all_listings:
                 raise ScraperError("Could not extract any data with the specified fields")
 
+            rows = parse_price_fields({'rows': all_listings})['rows']
+            result = await sync_to_async(save_result)(url, rows, user=client_key(request))
             context.update({
-                'rows': parse_price_fields({'rows': all_listings})['rows'],
+                'rows': rows,
+                'result_id': str(result.pk),
                 'show_results': True
             })
 
         except ScraperError as e:
-            # Make the error message more user-friendly
-            error_msg = str(e)
-            if "Rate limit reached" in error_msg:
-                context['error'] = error_msg
-            elif "Service Unavailable" in error_msg:
-                context['error'] = "Groq API servers are currently overwhelmed. Please try again later."
-            else:
-                context['error'] = error_msg
+            context['error'] = _user_error_message(e)
             logger.error(f"Scraping error: {e}")
         except Exception as e:
             context['error'] = f"An unexpected error occurred: {str(e)}"
             logger.error(f"Unexpected error: {e}", exc_info=True)
 
-    return render(request, 'index.html', context)
+        if streaming:
+            return JsonResponse({'event': 'error', 'message': context['error']}, status=400)
+
+    response = render(request, 'index.html', context)
+    if timings.stages:
+        response['Server-Timing'] = timings.server_timing()
+    return response
 
+def _stream_scrape(request, url: str, groq_api_key: str, fields: List[str], page_count: int) -> StreamingHttpResponse:
+    """
+    Stream scrape progress and rows as NDJSON while pages are still being extracted.
+
+    Every line is one JSON event: 'start' with the ID the rows are stored under,
+    then 'page' and 'rows' events as each page is chunked and each chunk is
+    extracted, 'timings' with the time spent per stage, and finally 'done' or 'error'.
+    Closing the connection cancels the scrape, freeing its browser context and
+    pending LLM calls.
+    """
+    events = stream_listings(
+        url, page_count, groq_api_key, EXTRACTION_SYSTEM_MESSAGE, fields, user=client_key(request)
+    )
+    background_loop = get_background_loop()
+
+    def encode(event: dict) -> str:
+        return json.dumps(event) + '\n'
+
+    def start(result_id) -> str:
+        return encode({'event': 'start', 'url': url, 'pages': page_count, 'result_id': str(result_id)})
+
+    def finish(count: int, result_id) -> str:
+        if not count:
+            return encode({'event': 'error', 'message': "Could not extract any data with the specified fields"})
+        return encode({'event': 'done', 'count': count, 'result_id': str(result_id)})
+
+    def fail(e: Exception) -> str:
+        if isinstance(e, ScraperError):
+            logger.error(f"Scraping error: {e}")
+            return encode({'event': 'error', 'message': _user_error_message(e)})
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return encode({'event': 'error', 'message': f"An unexpected error occurred: {str(e)}"})
+
+    def prepare(event: dict) -> dict:
+        if event['event'] == 'rows':
+            event['rows'] = parse_price_fields({'rows': event['rows']})['rows']
+        return event
+
+    # Rows are stored as they arrive, so the result can be downloaded or shared by ID
+    if isinstance(request, ASGIRequest):
+        async def stream():
+            count = 0
+            writer = await sync_to_async(ResultWriter)(url, user=client_key(request))
+            yield start(writer.result.pk)
+            try:
+                async for event in background_loop.iterate(events):
+                    event = prepare(event)
+                    if event.get('rows'):
+                        await sync_to_async(writer.add)(event['rows'])
+                        count += len(event['rows'])
+                    yield encode(event)
+            except Exception as e:
+                if not count:
+                    await sync_to_async(writer.discard)()
+                yield fail(e)
+                return
+            if not count:
+                await sync_to_async(writer.discard)()
+            yield finish(count, writer.result.pk)
+    else:
+        def stream():
+            count = 0
+            writer = ResultWriter(url, user=client_key(request))
+            yield start(writer.result.pk)
+            try:
+                for event in background_loop.iterate_sync(events):
+                    event = prepare(event)
+                    if event.get('rows'):
+                        writer.add(event['rows'])
+                        count += len(event['rows'])
+                    yield encode(event)
+            except Exception as e:
+                if not count:
+                    writer.discard()
+                yield fail(e)
+                return
+            if not count:
+                writer.discard()
+            yield finish(count, writer.result.pk)
+
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+    # Ask reverse proxies not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _export_response(request, export_format: str, rows, columns: dict = None, filename: str = 'scraping_results'):
+    """Stream rows as a file download, gzip-compressed for text formats when the client accepts it"""
+    content_type, extension, columnar = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(iter_export(export_format, rows, columns), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    response['X-Accel-Buffering'] = 'no'
+
+    # Parquet and Arrow are compressed already
+    if not columnar and export_settings()['GZIP']:
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response.streaming_content = compress_sequence(response.streaming_content)
+            response['Content-Encoding'] = 'gzip'
+    return response
+
+@profiled
 @csrf_protect
 @never_cache
-def download_csv(request):
+def download_export(request, export_format):
     """
-    Handle CSV download requests for scraped data.
+    Handle download requests for scraped data in any export format.
     """
     if request.method == 'POST':
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'error': f'Unknown export format: {export_format}'}, status=404)
         try:
             # Parse the JSON data from the request body
             data = parse_price_fields(json.loads(request.body))
             rows = data.get('rows', [])
 
-            # Set up the HTTP response for CSV download
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="scraping_results.csv"'
-
-            if rows:
-                # Create a CSV writer and write the data
-                writer = csv.DictWriter(response, fieldnames=rows[0].keys())
-                writer.writeheader()
-                writer.writerows(rows)
-
-            return response
+            # Rows are serialized batch by batch while the response is sent
+            return _export_response(request, export_format, rows)
         except Exception as e:
             # Return error response if an exception occurs
             return JsonResponse({'error': str(e)}, status=400)
     # Return error for non-POST requests
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
-@csrf_protect
-@never_cache
+def download_csv(request):
+    """
+    Handle CSV download requests for scraped data.
+    """
+    return download_export(request, 'csv')
+
 def download_json(request):
     """
     Handle JSON download requests for scraped data.
     """
-    if request.method == 'POST':
+    return download_export(request, 'json')
+
+def _get_result(result_id):
+    try:
+        return ScrapeResult.objects.get(pk=result_id)
+    except ScrapeResult.DoesNotExist:
+        return None
+
+def _page_url(request, page: int) -> str:
+    query = request.GET.copy()
+    query['page'] = page
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+@never_cache
+def scrape_result(request, result_id):
+    """
+    Page through the stored rows of a scrape.
+
+    Query parameters filter and sort the rows (see results.filter_rows); page
+    and page_size select the page.
+    """
+    result = _get_result(result_id)
+    if result is None:
+        return JsonResponse({'error': 'Result not found'}, status=404)
+    try:
+        rows = filter_rows(result, request.GET)
+        page, page_size = page_bounds(request.GET)
+    except ScraperError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # 'q' is reserved as a parameter name but still filters the rows
+    filtered = any(value != '' and (key == 'q' or key not in RESERVED_PARAMETERS) for key, value in request.GET.items())
+    total = rows.count() if filtered else result.row_count
+    pages = max(1, -(-total // page_size))
+    offset = (page - 1) * page_size
+    return JsonResponse({
+        'id': str(result.pk),
+        'url': result.url,
+        'created_at': result.created_at.isoformat(),
+        'row_count': result.row_count,
+        'columns': list(result.columns),
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'pages': pages,
+        'next': _page_url(request, page + 1) if page < pages else None,
+        'previous': _page_url(request, page - 1) if page > 1 else None,
+        'rows': list(rows.values_list('data', flat=True)[offset:offset + page_size]),
+        'downloads': {
+            export_format: request.build_absolute_uri(reverse('download_result', args=[result.pk, export_format]))
+            for export_format in EXPORT_FORMATS
+        },
+    })
+
+@profiled
+@never_cache
+def download_result(request, result_id, export_format):
+    """Download the stored rows of a scrape, optionally filtered like scrape_result"""
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unknown export format: {export_format}'}, status=404)
+    result = _get_result(result_id)
+    if result is None:
+        return JsonResponse({'error': 'Result not found'}, status=404)
+    try:
+        rows = filter_rows(result, request.GET)
+        # Rows are read from the database batch by batch while the response is sent
+        return _export_response(request, export_format, iter_row_data(rows), columns=result.columns)
+    except (ScraperError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@gzip_page
+@never_cache
+def visualize_result(request, result_id):
+    """Build the visualization dashboard for the stored rows of a scrape"""
+    result = _get_result(result_id)
+    if result is None:
+        return JsonResponse({'status': 'error', 'message': 'Result not found'}, status=404)
+    try:
+        pwbi = Pwbi()
+        pwbi.items = list(iter_row_data(filter_rows(result, request.GET)))
+        return JsonResponse({
+            'status': 'success',
+            'html': pwbi.dashboard()
+        })
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+def _job_status(request, job: ScrapeJob) -> dict:
+    """Public view of a scrape job"""
+    status = {
+        'id': str(job.pk),
+        'status': job.status,
+        'url': job.url,
+        'fields': job.fields,
+        'page_count': job.page_count,
+        'pages_done': job.pages_done,
+        'row_count': job.row_count,
+        'attempts': job.attempts,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': request.build_absolute_uri(reverse('scrape_job_status', args=[job.pk])),
+    }
+    if job.status == ScrapeJob.SUCCEEDED:
+        status['result_url'] = request.build_absolute_uri(reverse('scrape_job_result', args=[job.pk]))
+        result = job_result(job)
+        if result is not None:
+            status['result_id'] = str(result.pk)
+            status['rows_url'] = request.build_absolute_uri(reverse('scrape_result', args=[result.pk]))
+    return status
+
+def _job_rows(job: ScrapeJob) -> list:
+    """Rows of a succeeded job, from the result store or from jobs finished before it existed"""
+    result = job_result(job)
+    if result is not None:
+        return list(iter_row_data(result.rows.order_by('position')))
+    return parse_price_fields({'rows': job.result or []})['rows']
+
+def _job_api_key(request, groq_api_key: str) -> str:
+    """
+    The Groq API key queued jobs run with, empty for the server's key.
+
+    Jobs are billed to the server's key only for logged-in users, or for anyone
+    when SCRAPE_JOBS['SERVER_KEY_FALLBACK'] is on. The workers look the server's
+    key up themselves, so it is never stored on the job.
+
+    Raises:
+        PermissionDenied: if the caller sent no key and may not use the server's
+    """
+    if groq_api_key:
+        return groq_api_key
+    if GROQ_API_KEY and (request.user.is_authenticated or job_settings()['SERVER_KEY_FALLBACK']):
+        return ''
+    raise PermissionDenied("A groq_api_key is required")
+
+@csrf_exempt
+@never_cache
+def submit_scrape_job(request):
+    """
+    Queue a scrape for the worker processes (see the scrape_worker command).
+
+    Accepts the scrape form fields as form data or a JSON object and returns
+    the job status with 202 Accepted.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=405)
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        if not isinstance(data, dict):
+            raise ScraperError("Expected a JSON object")
+        url, groq_api_key, fields, page_count = _scrape_inputs(data)
+        api_key = _job_api_key(request, groq_api_key)
+    except ScraperError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    except PermissionDenied as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    job = submit_job(url, fields, page_count, api_key, user=client_key(request))
+    return JsonResponse(_job_status(request, job), status=202)
+
+@never_cache
+def scrape_job_status(request, job_id):
+    """Report the status and progress of a scrape job"""
+    try:
+        job = ScrapeJob.objects.defer('result').get(pk=job_id)
+    except ScrapeJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse(_job_status(request, job))
+
+@never_cache
+def scrape_job_result(request, job_id):
+    """Return the rows of a finished scrape job"""
+    try:
+        job = ScrapeJob.objects.defer('result').get(pk=job_id)
+    except ScrapeJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    if job.status != ScrapeJob.SUCCEEDED:
+        return JsonResponse({**_job_status(request, job), 'error': job.error or 'Job has not finished'}, status=409)
+    return JsonResponse({'id': str(job.pk), 'rows': _job_rows(job)})
+
+@csrf_exempt
+@never_cache
+def cancel_scrape_job(request, job_id):
+    """Cancel a queued or running scrape job"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=405)
+    if not ScrapeJob.objects.filter(pk=job_id).exists():
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    cancel_job(job_id)
+    return JsonResponse(_job_status(request, ScrapeJob.objects.defer('result').get(pk=job_id)))
+
+@csrf_exempt
+@never_cache
+def submit_scrape_batch(request):
+    """
+    Queue a batch of scrapes, each URL with its own fields and page count.
+
+    Expects a JSON object {"items": [{"url", "fields", "page_count"}, ...]}.
+    Top-level "fields", "page_count" and "groq_api_key" act as defaults for the
+    items. Workers run the jobs with per-host concurrency limits and delays,
+    different hosts in parallel.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+        return JsonResponse({'error': 'Expected a JSON object with a non-empty "items" list'}, status=400)
+    try:
+        api_key = _job_api_key(request, data.get('groq_api_key'))
+    except PermissionDenied as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    max_batch_size = job_settings()['MAX_BATCH_SIZE']
+    if len(data['items']) > max_batch_size:
+        return JsonResponse({'error': f'A batch may contain at most {max_batch_size} URLs'}, status=400)
+
+    defaults = {key: data[key] for key in ('fields', 'page_count') if key in data}
+    items, errors = [], []
+    for index, item in enumerate(data['items']):
+        if isinstance(item, str):
+            item = {'url': item}
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Each item must be a URL or an object'})
+            continue
         try:
-            # Parse the JSON data from the request body
-            data = parse_price_fields(json.loads(request.body))
-            rows = data.get('rows', [])
+            url, _, fields, page_count = _scrape_inputs({**defaults, **item})
+        except ScraperError as e:
+            errors.append({'index': index, 'url': item.get('url'), 'error': str(e)})
+            continue
+        items.append({'url': url, 'fields': fields, 'page_count': page_count})
+    if errors:
+        return JsonResponse({'error': 'Some items are invalid', 'items': errors}, status=400)
+
+    batch = submit_batch(items, api_key, user=client_key(request))
+    return JsonResponse(_batch_status(request, batch), status=202)
+
+def _batch_status(request, batch: ScrapeBatch) -> dict:
+    """Public view of a scrape batch with the status of every URL"""
+    jobs = batch.jobs.order_by('created_at').only(
+        'id', 'url', 'status', 'pages_done', 'row_count', 'error', 'created_at'
+    )
+    counts = dict.fromkeys([choice for choice, _ in ScrapeJob.STATUS_CHOICES], 0)
+    items = []
+    for job in jobs.iterator():
+        counts[job.status] += 1
+        items.append({
+            'id': str(job.pk),
+            'url': job.url,
+            'status': job.status,
+            'pages_done': job.pages_done,
+            'row_count': job.row_count,
+            'error': job.error or None,
+        })
+    return {
+        'id': str(batch.pk),
+        'size': batch.size,
+        'finished': sum(counts[status] for status in ScrapeJob.FINISHED_STATUSES) == batch.size,
+        'counts': counts,
+        'created_at': batch.created_at.isoformat(),
+        'status_url': request.build_absolute_uri(reverse('scrape_batch_status', args=[batch.pk])),
+        'result_url': request.build_absolute_uri(reverse('scrape_batch_result', args=[batch.pk])),
+        'items': items,
+    }
 
-            # Set up the HTTP response for JSON download
-            response = HttpResponse(content_type='application/json')
-            response['Content-Disposition'] = 'attachment; filename="scraping_results.json"'
+@never_cache
+def scrape_batch_status(request, batch_id):
+    """Report the aggregated and per-URL status of a scrape batch"""
+    try:
+        batch = ScrapeBatch.objects.get(pk=batch_id)
+    except ScrapeBatch.DoesNotExist:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+    return JsonResponse(_batch_status(request, batch))
 
-            # Write the JSON data to the response
-            json.dump(rows, response, indent=2)
+@never_cache
+def scrape_batch_result(request, batch_id):
+    """Return the rows of every finished URL in a batch, with per-URL status"""
+    try:
+        batch = ScrapeBatch.objects.get(pk=batch_id)
+    except ScrapeBatch.DoesNotExist:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+
+    items = []
+    for job in batch.jobs.order_by('created_at').iterator():
+        items.append({
+            'id': str(job.pk),
+            'url': job.url,
+            'status': job.status,
+            'error': job.error or None,
+            'rows': _job_rows(job) if job.status == ScrapeJob.SUCCEEDED else [],
+        })
+    finished = all(item['status'] in ScrapeJob.FINISHED_STATUSES for item in items)
+    return JsonResponse({'id': str(batch.pk), 'finished': finished, 'items': items})
 
-            return response
-        except Exception as e:
-            # Return error response if an exception occurs
-            return JsonResponse({'error': str(e)}, status=400)
-    # Return error for non-POST requests
-    return JsonResponse({'error': 'Invalid request'}, status=400)
\ No newline at end of file
+@csrf_exempt
+@never_cache
+def cancel_scrape_batch(request, batch_id):
+    """Cancel every unfinished job of a batch"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=405)
+    try:
+        batch = ScrapeBatch.objects.get(pk=batch_id)
+    except ScrapeBatch.DoesNotExist:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+    cancel_batch(batch.pk)
+    return JsonResponse(_batch_status(request, batch))
+
+def _metric_gauges() -> dict:
+    """Current pool, cache and model router state as Prometheus gauges"""
+    pool = get_browser_pool().stats()
+    gauges = {
+        'unscraper_browsers': {
+            (('state', 'open'),): pool['browsers'],
+            (('state', 'launching'),): pool['launching'],
+        },
+        'unscraper_browser_contexts': {(): pool['active_contexts']},
+        'unscraper_cache_events': {},
+        'unscraper_model_latency_seconds': {},
+        'unscraper_model_error_rate': {},
+        'unscraper_model_circuit_open': {},
+    }
+    for cache, counters in (('extraction', get_extraction_cache().stats()), ('snapshot', get_snapshot_cache().stats())):
+        for event, value in counters.items():
+            if event != 'hit_rate':
+                gauges['unscraper_cache_events'][(('cache', cache), ('event', event))] = value
+    for model, health in get_extraction_engine().router.snapshot().items():
+        for quantile in ('p50', 'p95'):
+            if health[quantile] is not None:
+                gauges['unscraper_model_latency_seconds'][(('model', model), ('quantile', quantile))] = health[quantile]
+        gauges['unscraper_model_error_rate'][(('model', model),)] = health['error_rate']
+        gauges['unscraper_model_circuit_open'][(('model', model),)] = int(health['state'] == 'open')
+    return gauges
+
+@never_cache
+def metrics(request):
+    """
+    Expose stage latencies, LLM call counters and pool/cache state in the Prometheus text format.
+
+    The numbers belong to the worker process that answers, so each worker
+    should be scraped on its own. Only staff users and requests with
+    "Authorization: Bearer <METRICS_TOKEN>" may read them.
+    """
+    options = metrics_settings()
+    if not options['ENABLED']:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(options['TOKEN']) and hmac.compare_digest(
+        authorization.encode(), f"Bearer {options['TOKEN']}".encode()
+    )
+    if not has_token and not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    return HttpResponse(get_metrics().render(_metric_gauges()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@never_cache
+def profile_result(request, profile_id):
+    """
+    Return a stored request profile (see profiling.py) to staff users.
+
+    The JSON summary lists stage spans and the hottest functions;
+    ?format=collapsed returns the sampled stacks for flamegraph.pl or speedscope.
+    """
+    if not may_profile(request, request.user):
+        return JsonResponse({'error': 'Not found'}, status=404)
+    collapsed = request.GET.get('format') == 'collapsed'
+    profile = load_profile(profile_id, collapsed=collapsed)
+    if profile is None:
+        return JsonResponse({'error': 'Profile not found'}, status=404)
+    if collapsed:
+        return HttpResponse(profile, content_type='text/plain; charset=utf-8')
+    return HttpResponse(profile, content_type='application/json')